@@ -0,0 +1,157 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from battle_simulator import override_constants, run_simulation
+from exact_probability import exact_probability_calculation
+from probability_calculator import ProbabilityCalculator
+
+# ===========================================
+# 异步接口配置
+# ===========================================
+
+DEFAULT_MAX_WORKERS = os.cpu_count() or 1    # 执行器的工作进程数上限
+DEFAULT_MONTE_CARLO_TRIALS = 100000
+
+# ===========================================
+#
+# 计算全部放到有上限的进程池中执行，事件循环只负责排队和合并请求。
+# 相同的请求（元素配置、目标组合按多重集归一化后相同）在计算完成前只执行一次，
+# 后到的请求直接等待同一个结果；某个请求被取消不会中断其他请求共享的计算。
+
+def _calculator_worker(element_counts, target_combination, method, num_trials):
+    calculator = ProbabilityCalculator(element_counts, verbose=False)
+    if method == 'exact':
+        return calculator.mathematical_calculation(target_combination)
+    return calculator.monte_carlo_simulation(target_combination, num_trials)
+
+def _exact_worker(element_counts, target_combination):
+    return exact_probability_calculation(element_counts, target_combination, verbose=False)
+
+def _simulation_worker(num_battles, overrides):
+    # 数值覆盖必须在工作进程内生效，调用方进程中的覆盖不会传到这里
+    with override_constants(**overrides):
+        summary = run_simulation(num_battles, verbose=False)
+    stats = summary['stats']
+    return {'battles': stats.battles, 'wins': stats.wins, 'win_rate': stats.win_rate,
+            'mean_turns': stats.mean_turns, 'mean_hp': stats.mean_hp,
+            'winning_turns': summary['turns'], 'winning_hp': summary['hp']}
+
+def _counts_key(element_counts):
+    return tuple(sorted(element_counts.items()))
+
+class AsyncCalculators:
+    """
+    概率计算与战斗模拟的异步接口，所有方法返回字典形式的结果
+
+    用法:
+    async with AsyncCalculators(max_workers=4) as calculators:
+        result = await calculators.exact_probability({'A': 2, ...}, 'AAB')
+    """
+    def __init__(self, max_workers=None, executor=None):
+        """executor: 自定义执行器（如ThreadPoolExecutor）；不指定时创建max_workers个进程的进程池"""
+        self._own_executor = executor is None
+        self.executor = executor or ProcessPoolExecutor(max_workers=max_workers or DEFAULT_MAX_WORKERS)
+        self._in_flight = {}
+        self.requests = 0          # 收到的请求数
+        self.computations = 0      # 实际提交给执行器的计算数
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._own_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _single_flight(self, key, function, *args):
+        """同一key的计算进行中时复用它的结果，否则提交新计算"""
+        self.requests += 1
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+            self._in_flight[key] = future
+            self.computations += 1
+
+            def _release(done, key=key):
+                if self._in_flight.get(key) is done:
+                    del self._in_flight[key]
+            future.add_done_callback(_release)
+        return await asyncio.shield(future)
+
+    async def calculator_probability(self, element_counts, target_combination, method='exact',
+                                     num_trials=DEFAULT_MONTE_CARLO_TRIALS):
+        """
+        ProbabilityCalculator 的异步版本
+
+        参数:
+        method: 'exact'（精确计算，优先查预计算表）或 'monte_carlo'
+        """
+        if method not in ('exact', 'monte_carlo'):
+            raise ValueError(f"未知的计算方法: {method}")
+        target = ''.join(sorted(target_combination))
+        key = ('calculator', _counts_key(element_counts), target, method,
+               num_trials if method == 'monte_carlo' else None)
+        probability = await self._single_flight(key, _calculator_worker, dict(element_counts), target,
+                                                method, num_trials)
+        result = {'element_counts': dict(element_counts), 'target': target_combination,
+                  'method': method, 'probability': probability}
+        if method == 'monte_carlo':
+            result['num_trials'] = num_trials
+        return result
+
+    async def exact_probability(self, element_counts, target_combination):
+        """exact_probability_calculation 的异步版本"""
+        target = ''.join(sorted(target_combination))
+        key = ('exact', _counts_key(element_counts), target)
+        probability = await self._single_flight(key, _exact_worker, dict(element_counts), target)
+        return {'element_counts': dict(element_counts), 'target': target_combination,
+                'method': 'enumeration', 'probability': probability}
+
+    async def simulate(self, num_battles, overrides=None):
+        """
+        run_simulation 的异步版本
+
+        参数:
+        overrides: 数值覆盖，如 {'MONSTER_HP': 30}；在工作进程中生效，不指定时使用默认数值
+
+        返回:
+        {'battles', 'wins', 'win_rate', 'mean_turns', 'mean_hp',
+         'winning_turns': {mean/min/max}, 'winning_hp': {mean/min/max}, 'overrides'}
+        """
+        overrides = dict(overrides or {})
+        key = ('simulate', num_battles, tuple(sorted(overrides.items())))
+        result = await self._single_flight(key, _simulation_worker, num_battles, overrides)
+        return dict(result, overrides=overrides)
+
+async def _demo():
+    element_counts = {'A': 3, 'B': 3, 'C': 2, 'D': 2, 'E': 2}
+    async with AsyncCalculators() as calculators:
+        # 模拟大量客户端同时提问：20个相同的精确计算、10个相同的蒙特卡罗（ABA与AAB视为同一问题）、
+        # 两种数值配置各5个相同的战斗模拟（配置不同的请求不合并）
+        requests = ([calculators.exact_probability(element_counts, 'AAB') for _ in range(20)]
+                    + [calculators.calculator_probability(element_counts, 'ABA', method='monte_carlo')
+                       for _ in range(10)]
+                    + [calculators.calculator_probability(element_counts, 'ABC') for _ in range(10)]
+                    + [calculators.simulate(10000) for _ in range(5)]
+                    + [calculators.simulate(10000, {'MONSTER_HP': 30}) for _ in range(5)])
+        start_time = time.time()
+        results = await asyncio.gather(*requests)
+        elapsed = time.time() - start_time
+
+        seen = set()
+        for result in results:
+            text = repr(result)
+            if text not in seen:
+                seen.add(text)
+                print(result)
+        print(f"\n{calculators.requests} 个请求，实际计算 {calculators.computations} 次，用时 {elapsed:.3f}秒")
+
+def main():
+    asyncio.run(_demo())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import hashlib
+import os
+import pickle
+import re
+import sys
+import time
+
+import battle_simulator
+from battle_simulator import override_constants
+
+# ===========================================
+# 数值表读取配置
+# ===========================================
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BALANCE_WORKBOOK = os.path.join(BASE_DIR, '数值.xlsx')
+CARD_EFFECT_WORKBOOK = os.path.join(BASE_DIR, '牌效果统计.xlsx')
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, '.balance_cache.bin')
+
+CACHE_MAGIC = b'BALCFG01'
+PARSER_VERSION = 1                    # 解析逻辑变化时加一，旧缓存随之失效
+
+# 数值.xlsx「模型」表中的项目与battle_simulator数值的对应关系
+MODEL_SHEET = '模型'
+MODEL_FIELDS = {
+    '玩家生命值': 'PLAYER_MAX_HP',
+    '白板怪': 'MONSTER_HP',
+    '每回合行动点': 'MAX_CARDS_PLAY_PER_TURN',
+    '连击额外加伤': 'AAB_COMBO_BONUS_DAMAGE',
+}
+MONSTER_ACTION_FIELD = '怪物行动'     # 如 "普攻3伤|重击7伤|强化加气力"
+
+# 数值.xlsx「卡牌目录」表中的起始卡牌与模拟器牌型的对应关系
+CARD_SHEET = '卡牌目录'
+STARTING_RARITY = '起始'
+STARTING_CARDS = {'拳打': 'A', '脚踢': 'B', '头槌': 'D', '闪躲': 'E'}
+
+DAMAGE_PATTERN = re.compile(r'造成(\d+)点伤害')
+ARMOR_PATTERN = re.compile(r'获得(\d+)化劲')
+ACTION_DAMAGE_PATTERN = re.compile(r'(\d+)伤')
+
+# ===========================================
+
+def _read_rows(worksheet):
+    """读取工作表中非空的行"""
+    return [row for row in worksheet.iter_rows(values_only=True)
+            if any(value is not None for value in row)]
+
+def _parse_model_sheet(rows):
+    """解析「模型」表，返回数值配置字典"""
+    constants = {}
+    for row in rows:
+        label, value = row[0], row[1] if len(row) > 1 else None
+        # 同名项目只取第一次出现（表下方的攻击档位列表与上方的模型数值同名）
+        if label in MODEL_FIELDS and MODEL_FIELDS[label] not in constants:
+            constants[MODEL_FIELDS[label]] = value
+        elif label == MONSTER_ACTION_FIELD and 'MONSTER_ACTION_COUNT' not in constants:
+            actions = str(value).split('|')
+            damages = [int(match.group(1)) for action in actions
+                       for match in [ACTION_DAMAGE_PATTERN.search(action)] if match]
+            if len(damages) < 2:
+                raise ValueError(f"无法解析怪物行动: {value}")
+            constants['MONSTER_ACTION_COUNT'] = len(actions)
+            constants['MONSTER_LIGHT_ATTACK_DAMAGE'] = damages[0]
+            constants['MONSTER_HEAVY_ATTACK_DAMAGE'] = damages[1]
+    return constants
+
+def _parse_card_sheet(rows):
+    """解析「卡牌目录」表，返回 (起始卡牌对应的数值, 全部卡牌列表)"""
+    header = rows[0]
+    columns = {name: index for index, name in enumerate(header)}
+    cards = []
+    starting = {}
+    for row in rows[1:]:
+        card = {name: row[index] for name, index in columns.items()}
+        cards.append(card)
+        if card['稀有度'] == STARTING_RARITY and card['名字'] in STARTING_CARDS:
+            effect = card['效果'] or ''
+            damage = DAMAGE_PATTERN.search(effect)
+            armor = ARMOR_PATTERN.search(effect)
+            starting[STARTING_CARDS[card['名字']]] = {
+                'damage': int(damage.group(1)) if damage else 0,
+                'armor': int(armor.group(1)) if armor else 0,
+            }
+
+    missing = set(STARTING_CARDS.values()) - set(starting)
+    if missing:
+        raise ValueError(f"卡牌目录缺少起始卡牌: {sorted(missing)}")
+    if starting['A'] != starting['B']:
+        raise ValueError(f"A牌与B牌数值不一致: {starting['A']} / {starting['B']}")
+
+    constants = {
+        'CARD_AB_DAMAGE': starting['A']['damage'],
+        'CARD_AB_ARMOR': starting['A']['armor'],
+        'CARD_D_DAMAGE': starting['D']['damage'],
+        'CARD_E_ARMOR': starting['E']['armor'],
+    }
+    return constants, cards
+
+def _parse_card_effect_workbook(workbook):
+    """解析牌效果统计.xlsx，返回 {职业: {机制: [卡牌名]}}"""
+    catalog = {}
+    for worksheet in workbook.worksheets:
+        current = None
+        for row in _read_rows(worksheet):
+            label = row[0]
+            names = [value for value in row[1:] if value is not None]
+            if label and not names and not str(label).endswith('：'):
+                current = catalog.setdefault(str(label), {})
+            elif label and current is not None:
+                current[str(label).rstrip('：')] = names
+    return catalog
+
+def parse_workbooks(balance_path=BALANCE_WORKBOOK, card_effect_path=CARD_EFFECT_WORKBOOK):
+    """读取并解析两个数值表（需要openpyxl）"""
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError("读取xlsx需要安装openpyxl: pip install openpyxl")
+
+    workbook = openpyxl.load_workbook(balance_path, read_only=True, data_only=True)
+    constants = _parse_model_sheet(_read_rows(workbook[MODEL_SHEET]))
+    card_constants, cards = _parse_card_sheet(_read_rows(workbook[CARD_SHEET]))
+    constants.update(card_constants)
+    workbook.close()
+
+    effect_workbook = openpyxl.load_workbook(card_effect_path, read_only=True, data_only=True)
+    card_effects = _parse_card_effect_workbook(effect_workbook)
+    effect_workbook.close()
+
+    config = {'constants': constants, 'cards': cards, 'card_effects': card_effects}
+    validate_config(config)
+    return config
+
+def validate_config(config):
+    """检查数值配置是否能用于模拟"""
+    for name, value in config['constants'].items():
+        if not hasattr(battle_simulator, name) or not name.isupper():
+            raise ValueError(f"未知的数值配置: {name}")
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f"{name} 不是数值: {value!r}")
+        if value < 0:
+            raise ValueError(f"{name} 不能为负数: {value}")
+
+    constants = config['constants']
+    for name in ('PLAYER_MAX_HP', 'MONSTER_HP', 'MONSTER_ACTION_COUNT', 'MAX_CARDS_PLAY_PER_TURN'):
+        if name in constants and constants[name] < 1:
+            raise ValueError(f"{name} 必须大于0: {constants[name]}")
+    if constants.get('MONSTER_ACTION_COUNT', 3) != 3:
+        raise ValueError("怪物行动目前只支持 轻攻击|重攻击|蓄力 三种")
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _cache_header():
+    """缓存文件头：魔数 + 解析器版本与表项映射的哈希，修改解析逻辑或映射后旧缓存自动失效"""
+    mapping = (PARSER_VERSION, MODEL_SHEET, MODEL_FIELDS, MONSTER_ACTION_FIELD, CARD_SHEET, STARTING_RARITY,
+               STARTING_CARDS, DAMAGE_PATTERN.pattern, ARMOR_PATTERN.pattern, ACTION_DAMAGE_PATTERN.pattern)
+    return CACHE_MAGIC + hashlib.sha256(repr(mapping).encode('utf-8')).digest()
+
+def _read_cache(cache_path):
+    header = _cache_header()
+    try:
+        with open(cache_path, 'rb') as f:
+            if f.read(len(header)) != header:
+                return None
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+def _write_cache(cache_path, entry):
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_cache_header())
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+def load_balance_config(balance_path=BALANCE_WORKBOOK, card_effect_path=CARD_EFFECT_WORKBOOK,
+                        cache_path=DEFAULT_CACHE_PATH, use_cache=True):
+    """
+    读取数值配置，优先使用缓存
+
+    缓存按各工作簿的大小和修改时间判断是否有效；修改时间变化但内容哈希不变时
+    （如重新保存、复制到其他机器）仍然使用缓存，只更新记录的修改时间。
+    缓存文件头记录解析器版本和表项映射，两者变化后缓存失效
+
+    返回:
+    字典 {'constants': 数值配置, 'cards': 卡牌目录, 'card_effects': 牌效果统计}
+    """
+    paths = (balance_path, card_effect_path)
+    signatures = [_file_signature(path) for path in paths]
+
+    if use_cache:
+        entry = _read_cache(cache_path)
+        if entry is not None and len(entry['files']) == len(paths):
+            cached_files = entry['files']
+            if all(cached['path'] == current['path'] and cached['size'] == current['size']
+                   and cached['mtime_ns'] == current['mtime_ns']
+                   for cached, current in zip(cached_files, signatures)):
+                return entry['config']
+
+            hashes = [_file_hash(path) for path in paths]
+            if [cached['sha256'] for cached in cached_files] == hashes:
+                for signature, file_hash in zip(signatures, hashes):
+                    signature['sha256'] = file_hash
+                entry['files'] = signatures
+                _write_cache(cache_path, entry)
+                return entry['config']
+
+    config = parse_workbooks(balance_path, card_effect_path)
+    if use_cache:
+        for signature, path in zip(signatures, paths):
+            signature['sha256'] = _file_hash(path)
+        _write_cache(cache_path, {'files': signatures, 'config': config})
+    return config
+
+def apply_balance_config(config):
+    """在with块内让battle_simulator使用数值表中的配置"""
+    return override_constants(**config['constants'])
+
+def main():
+    use_cache = '--no-cache' not in sys.argv
+
+    start_time = time.time()
+    config = load_balance_config(use_cache=use_cache)
+    elapsed = time.time() - start_time
+
+    print(f"=== 数值表配置 ===")
+    print(f"{'数值':<30}{'数值表':>10}{'当前代码':>10}")
+    for name, value in config['constants'].items():
+        current = getattr(battle_simulator, name)
+        mark = '' if value == current else '  *'
+        print(f"{name:<30}{value:>10}{current:>10}{mark}")
+    print(f"\n卡牌目录: {len(config['cards'])} 张")
+    print(f"牌效果统计: {', '.join(config['card_effects'])}")
+    print(f"读取用时: {elapsed*1000:.2f}毫秒")
+
+    with apply_balance_config(config):
+        battle_simulator.run_simulation(1000)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
-import random
 import copy
-from collections import Counter
+import sys
+from contextlib import contextmanager
+import numpy as np
+from packed_multiset import MultisetLayout
+from rng_backend import default_rng
 
 # ===========================================
 # 游戏数值配置 - 可修改这些数值来调整游戏平衡
@@ -44,44 +47,118 @@ PROGRESS_REPORT_INTERVAL = 1000       # 进度报告间隔
 
 # ===========================================
 
+# 可调整的平衡数值（供灵敏度分析、参数扫描等工具使用）
+BALANCE_CONSTANTS = (
+    'PLAYER_MAX_HP',
+    'PLAYER_LOW_HP_THRESHOLD',
+    'MONSTER_HP',
+    'MONSTER_LIGHT_ATTACK_DAMAGE',
+    'MONSTER_HEAVY_ATTACK_DAMAGE',
+    'MONSTER_POWER_GAIN',
+    'CARD_A_COUNT',
+    'CARD_B_COUNT',
+    'CARD_D_COUNT',
+    'CARD_E_COUNT',
+    'CARD_AB_DAMAGE',
+    'CARD_AB_ARMOR',
+    'CARD_D_DAMAGE',
+    'CARD_D_STUN_CHANCE',
+    'CARD_E_ARMOR',
+    'AAB_COMBO_BONUS_DAMAGE',
+    'AAD_COMBO_BONUS_DAMAGE',
+)
+
+@contextmanager
+def override_constants(**overrides):
+    """
+    临时修改数值配置，退出with块后恢复原值
+    
+    用法:
+    with override_constants(MONSTER_HP=20, CARD_AB_DAMAGE=4):
+        simulate_battle()
+    """
+    module_globals = globals()
+    for name in overrides:
+        if name not in module_globals or not name.isupper():
+            raise ValueError(f"未知的数值配置: {name}")
+    
+    global _constants_generation
+    saved = {name: module_globals[name] for name in overrides}
+    module_globals.update(overrides)
+    _constants_generation += 1
+    try:
+        yield
+    finally:
+        module_globals.update(saved)
+        _constants_generation += 1
+
+# 数值配置每次经 override_constants 修改时加一，BattleState 据此判断贡献统计的模式表是否需要更换
+_constants_generation = 0
+
+# 手牌的打包计数：每种牌占一个位段，判断能否打出组合只需一次整数运算
+CARD_LAYOUT = MultisetLayout('ABDE')
+AAB_COMBO = CARD_LAYOUT.pack('AAB')
+AAD_COMBO = CARD_LAYOUT.pack('AAD')
+
+# 可重用战斗状态（BattleState）中的整数牌编码
+CARD_A, CARD_B, CARD_D, CARD_E = range(4)
+COMBO_AAB, COMBO_AAD = 4, 5          # 贡献统计中两种组合的来源编号
+CARD_CODE_NAMES = 'ABDE'
+
+def default_card_counts():
+    """按当前数值配置返回牌库构成"""
+    return {'A': CARD_A_COUNT, 'B': CARD_B_COUNT, 'D': CARD_D_COUNT, 'E': CARD_E_COUNT}
+
 class Card:
     """卡牌类"""
     def __init__(self, name, damage=0, armor=0, stun_chance=0):
         self.name = name
+        self.code = CARD_CODE_NAMES.index(name)  # 整数牌编码（与BattleState、战斗记录一致）
+        self.unit = CARD_LAYOUT.unit[name]  # 打包计数中对应的位段单位
         self.damage = damage
         self.armor = armor
         self.stun_chance = stun_chance
 
 class Player:
     """玩家类"""
-    def __init__(self):
+    def __init__(self, hp=None, card_counts=None, rng=None):
+        """
+        hp: 初始生命值，默认为满血（用于连续战斗时继承血量）
+        card_counts: 字典，各牌的数量，如 {'A': 3, 'B': 3, 'D': 2, 'E': 2}
+        rng: 随机数源（需提供shuffle和random方法），默认使用rng_backend的共享缓冲随机数源
+        """
+        self.rng = rng if rng is not None else default_rng()
         self.max_hp = PLAYER_MAX_HP
-        self.hp = PLAYER_MAX_HP
+        self.hp = PLAYER_MAX_HP if hp is None else hp
         self.armor = 0
-        self.deck = self._create_deck()
+        self.deck = self._create_deck(card_counts)
         self.hand = []
+        self.hand_bits = 0  # 手牌的打包计数
         self.discard_pile = []
     
-    def _create_deck(self):
+    def _create_deck(self, card_counts=None):
         """创建初始牌库"""
+        if card_counts is None:
+            card_counts = default_card_counts()
+        
         deck = []
         # A牌
-        for _ in range(CARD_A_COUNT):
+        for _ in range(card_counts.get('A', 0)):
             deck.append(Card('A', damage=CARD_AB_DAMAGE, armor=CARD_AB_ARMOR))
         
         # B牌
-        for _ in range(CARD_B_COUNT):
+        for _ in range(card_counts.get('B', 0)):
             deck.append(Card('B', damage=CARD_AB_DAMAGE, armor=CARD_AB_ARMOR))
         
         # D牌若干张，造成指定伤害，指定概率击晕
-        for _ in range(CARD_D_COUNT):
+        for _ in range(card_counts.get('D', 0)):
             deck.append(Card('D', damage=CARD_D_DAMAGE, stun_chance=CARD_D_STUN_CHANCE))
         
         # E牌若干张，获得指定化劲
-        for _ in range(CARD_E_COUNT):
+        for _ in range(card_counts.get('E', 0)):
             deck.append(Card('E', armor=CARD_E_ARMOR))
         
-        random.shuffle(deck)
+        self.rng.shuffle(deck)
         return deck
     
     def draw_cards(self, num=CARDS_DRAW_PER_TURN):
@@ -92,17 +169,20 @@ class Player:
                 if self.discard_pile:
                     self.deck = self.discard_pile[:]
                     self.discard_pile = []
-                    random.shuffle(self.deck)
+                    self.rng.shuffle(self.deck)
                 else:
                     break
             
             if self.deck:
-                self.hand.append(self.deck.pop())
+                card = self.deck.pop()
+                self.hand.append(card)
+                self.hand_bits += card.unit
     
     def discard_hand(self):
         """弃掉手牌"""
         self.discard_pile.extend(self.hand)
         self.hand = []
+        self.hand_bits = 0
     
     def take_damage(self, damage):
         """受到伤害"""
@@ -111,20 +191,17 @@ class Player:
         self.armor = 0  # 化劲在受到伤害后清零
         return actual_damage
     
-    def choose_cards_to_play(self):
-        """选择要打出的牌（AI策略）"""
+    def choose_cards_to_play(self, monster=None):
+        """选择要打出的牌（AI策略，不考虑怪物状态；子类可根据monster决策）"""
         if not self.hand:
             return []
         
-        # 按优先级排序手牌
-        hand_names = [card.name for card in self.hand]
-        hand_counter = Counter(hand_names)
-        
         # 检查是否能打出特殊组合
         cards_to_play = []
+        guard = CARD_LAYOUT.guard
         
         # 优先考虑AAB组合（额外伤害）
-        if hand_counter['A'] >= 2 and hand_counter['B'] >= 1:
+        if ((self.hand_bits | guard) - AAB_COMBO) & guard == guard:
             a_count = 0
             b_count = 0
             for card in self.hand:
@@ -138,7 +215,7 @@ class Player:
                     break
         
         # 其次考虑AAD组合（额外伤害）
-        elif hand_counter['A'] >= 2 and hand_counter['D'] >= 1:
+        elif ((self.hand_bits | guard) - AAD_COMBO) & guard == guard:
             a_count = 0
             d_count = 0
             for card in self.hand:
@@ -168,8 +245,18 @@ class Player:
 
 class Monster:
     """怪物类"""
-    def __init__(self):
-        self.hp = MONSTER_HP
+    def __init__(self, hp=None, light_attack_damage=None, heavy_attack_damage=None,
+                 power_gain=None, action_pattern=None):
+        """
+        各参数默认取模块顶部的数值配置
+        action_pattern: 行动循环序列，如 [0, 1, 2]（0轻攻击/1重攻击/2蓄力），
+                        默认按 action_cycle % MONSTER_ACTION_COUNT 循环
+        """
+        self.hp = MONSTER_HP if hp is None else hp
+        self.light_attack_damage = MONSTER_LIGHT_ATTACK_DAMAGE if light_attack_damage is None else light_attack_damage
+        self.heavy_attack_damage = MONSTER_HEAVY_ATTACK_DAMAGE if heavy_attack_damage is None else heavy_attack_damage
+        self.power_gain = MONSTER_POWER_GAIN if power_gain is None else power_gain
+        self.action_pattern = action_pattern
         self.power = 0  # 气力
         self.action_cycle = 0  # 行动循环计数
         self.stunned = False  # 是否被击晕
@@ -179,7 +266,10 @@ class Monster:
         if self.stunned:
             return None
         
-        action = self.action_cycle % MONSTER_ACTION_COUNT
+        if self.action_pattern:
+            action = self.action_pattern[self.action_cycle % len(self.action_pattern)]
+        else:
+            action = self.action_cycle % MONSTER_ACTION_COUNT
         self.action_cycle += 1
         return action
     
@@ -189,16 +279,16 @@ class Monster:
             return f"怪物被击晕，无法行动"
         
         if action == 0:  # 造成轻攻击伤害
-            damage = MONSTER_LIGHT_ATTACK_DAMAGE + self.power
+            damage = self.light_attack_damage + self.power
             actual_damage = player.take_damage(damage)
             return f"怪物攻击造成{actual_damage}点伤害"
         elif action == 1:  # 造成重攻击伤害
-            damage = MONSTER_HEAVY_ATTACK_DAMAGE + self.power
+            damage = self.heavy_attack_damage + self.power
             actual_damage = player.take_damage(damage)
             return f"怪物重击造成{actual_damage}点伤害"
         elif action == 2:  # 增加气力
-            self.power += MONSTER_POWER_GAIN
-            return f"怪物获得{MONSTER_POWER_GAIN}点气力，当前气力：{self.power}"
+            self.power += self.power_gain
+            return f"怪物获得{self.power_gain}点气力，当前气力：{self.power}"
     
     def take_damage(self, damage):
         """受到伤害"""
@@ -209,10 +299,27 @@ class Monster:
         """清除眩晕状态"""
         self.stunned = False
 
-def simulate_battle():
-    """模拟一场战斗"""
-    player = Player()
-    monster = Monster()
+def simulate_battle(player=None, monster=None, rng=None, trace=None):
+    """
+    模拟一场战斗
+    
+    参数:
+    player: 玩家对象，默认新建满血玩家（连续战斗时可传入继承血量的玩家）
+    monster: 怪物对象，默认按数值配置新建
+    rng: 随机数源，默认使用rng_backend的共享缓冲随机数源
+    trace: 战斗记录器（如battle_trace.BattleTraceWriter），每回合调用一次record_turn
+    
+    返回:
+    (回合数, 玩家剩余血量, 是否胜利)
+    """
+    if rng is None:
+        rng = player.rng if player is not None else default_rng()
+    if player is None:
+        player = Player(rng=rng)
+    if monster is None:
+        monster = Monster()
+    if trace is not None:
+        trace.start_battle()
     turn = 0
     
     while player.hp > 0 and monster.hp > 0:
@@ -223,7 +330,7 @@ def simulate_battle():
         
         # 玩家回合
         player.draw_cards(CARDS_DRAW_PER_TURN)
-        cards_to_play = player.choose_cards_to_play()
+        cards_to_play = player.choose_cards_to_play(monster)
         
         # 计算伤害和效果
         total_damage = 0
@@ -247,7 +354,7 @@ def simulate_battle():
                     total_damage += card.damage
             elif card.name == 'D':
                 total_damage += card.damage
-                if random.random() < card.stun_chance:
+                if rng.random() < card.stun_chance:
                     monster.stunned = True
                     stun_applied = True
             elif card.name == 'E':
@@ -265,15 +372,22 @@ def simulate_battle():
             monster.take_damage(total_damage)
         
         # 弃掉所有手牌
+        hand = player.hand
         player.discard_hand()
         
         # 检查怪物是否死亡
         if monster.hp <= 0:
+            if trace is not None:
+                trace.record_turn(turn, hand, cards_to_play, total_damage, total_armor,
+                                  stun_applied, None, player.hp, monster.hp, monster_acted=False)
             break
         
         # 怪物回合
         action = monster.get_next_action()
         monster.execute_action(action, player)
+        if trace is not None:
+            trace.record_turn(turn, hand, cards_to_play, total_damage, total_armor,
+                              stun_applied, action, player.hp, monster.hp)
         
         # 检查玩家是否死亡
         if player.hp <= 0:
@@ -281,29 +395,533 @@ def simulate_battle():
     
     return turn, player.hp, player.hp > 0
 
-def run_simulation(num_battles=DEFAULT_SIMULATION_BATTLES):
-    """运行多次战斗模拟"""
+class BattleStats:
+    """可合并的战斗统计（只保存计数与累加和，不同进程/机器的结果可直接相加）"""
+    FIELDS = ('battles', 'wins', 'turns_sum', 'turns_sq_sum', 'hp_sum', 'hp_sq_sum')
+
+    def __init__(self, battles=0, wins=0, turns_sum=0, turns_sq_sum=0, hp_sum=0, hp_sq_sum=0):
+        self.battles = battles
+        self.wins = wins
+        self.turns_sum = turns_sum
+        self.turns_sq_sum = turns_sq_sum
+        self.hp_sum = hp_sum
+        self.hp_sq_sum = hp_sq_sum
+
+    def add(self, turns, hp, won):
+        """记录一场战斗的结果（剩余血量按不低于0计）"""
+        hp = max(hp, 0)
+        self.battles += 1
+        self.wins += 1 if won else 0
+        self.turns_sum += turns
+        self.turns_sq_sum += turns * turns
+        self.hp_sum += hp
+        self.hp_sq_sum += hp * hp
+
+    def merge(self, other):
+        """合并另一份统计"""
+        for field in self.FIELDS:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        return self
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{field: data[field] for field in cls.FIELDS})
+
+    @property
+    def win_rate(self):
+        return self.wins / self.battles if self.battles else 0.0
+
+    @property
+    def mean_turns(self):
+        return self.turns_sum / self.battles if self.battles else 0.0
+
+    @property
+    def mean_hp(self):
+        return self.hp_sum / self.battles if self.battles else 0.0
+
+class ContributionStats:
+    """
+    按来源（A、B、D、E四种牌及AAB、AAD组合）拆分的战斗贡献统计，可合并
+
+    counts 为扁平列表，第 指标 * SOURCE_COUNT + 来源 项为该来源的该项指标：
+    plays         打出次数（组合为触发次数）
+    damage        造成的伤害（组合为额外伤害）
+    armor         获得的化劲
+    prevented     化劲抵消的怪物伤害（多个来源的化劲按比例分摊）
+    wasted        受到攻击时超出伤害、被清零的化劲
+    unused        战斗结束时仍未用上的化劲
+    conversions   低血量时A/B牌转为化劲的次数
+    stuns         击晕成功次数
+    stun_avoided  击晕免去的怪物攻击伤害（未扣除化劲）。击晕只让怪物的行动顺延一回合，
+                  被顺延的攻击之后照常执行，所以只计战斗结束时仍因击晕而没来得及执行的攻击
+    battles       打出过该来源的战斗场数
+    wins          其中胜利的场数
+
+    模拟时每回合只给出牌模式计数一次，每场战斗只按用到的来源组合计数，读取counts时再按模式展开成各项指标。
+    出牌模式按是否低血量分两张表，键直接用模拟循环里现成的打包手牌：出牌构成只由手牌构成决定，
+    凑组合的回合再按组合是否成立取正负（每回合不足3张时才用出牌序列元组作键）。模式表在数值配置不变时一直沿用。
+    带化劲的模式在怪物攻击时只累加抵消比例和被攻击次数，读取时再按各来源的化劲换算出抵消、浪费和剩余的化劲；
+    击晕只在发生过击晕的战斗结束时记录一次
+    """
+    SOURCES = ('A', 'B', 'D', 'E', 'AAB', 'AAD')
+    METRICS = ('plays', 'damage', 'armor', 'prevented', 'wasted', 'unused',
+               'conversions', 'stuns', 'stun_avoided', 'battles', 'wins')
+    SOURCE_COUNT = len(SOURCES)
+
+    def __init__(self, counts=None, battles=0, wins=0):
+        self._counts = list(counts) if counts is not None else [0] * (len(self.METRICS) * self.SOURCE_COUNT)
+        self._battles = battles
+        self._wins = wins
+        self._tables = []                 # [(卡牌数值, 常规模式表, 低血量模式表)]
+        self._values = None
+        self._patterns = None
+        self._outcomes = [0] * (2 << self.SOURCE_COUNT)   # 第 来源位掩码*2+是否胜利 项为场数
+
+    def pattern_tables(self, card_damage, card_armor):
+        """
+        数值配置变化后取对应的模式表（卡牌数值与上次相同时沿用）
+
+        返回:
+        (常规模式表, 低血量模式表)，均为 {键: [次数, 来源位掩码, 各来源化劲, 出牌序列, 抵消比例之和, 被攻击次数]}；
+        键为打包手牌（凑成组合时取负）或出牌序列元组，模拟循环直接查表计数，未出现过的模式用 add_pattern 加入
+        """
+        values = (list(card_damage), list(card_armor), AAB_COMBO_BONUS_DAMAGE, AAD_COMBO_BONUS_DAMAGE,
+                  MAX_CARDS_PLAY_PER_TURN)
+        if values != self._values:
+            self._values = values
+            self._patterns = ({}, {})
+            self._tables.append((values, *self._patterns))
+        return self._patterns
+
+    def add_pattern(self, table, key, played, low_hp):
+        """新的出牌模式：计算来源位掩码与各来源获得的化劲（化劲为0的来源不列出）"""
+        played = tuple(played)
+        card_armor = self._values[1]
+        mask = 0
+        armor = {}
+        for card in played:
+            mask |= 1 << card
+            if (card == CARD_E or (low_hp and card != CARD_D)) and card_armor[card] > 0:
+                armor[card] = armor.get(card, 0) + card_armor[card]
+        if len(played) == 3 and played[0] == CARD_A and played[1] == CARD_A:
+            if played[2] == CARD_B:
+                mask |= 1 << COMBO_AAB
+            elif played[2] == CARD_D:
+                mask |= 1 << COMBO_AAD
+        entry = table[key] = [0, mask, list(armor.items()) if armor else None, played, 0.0, 0]
+        return entry
+
+    def finish_battle(self, stuns, stun_avoided=0):
+        """发生过击晕的战斗结束：记录击晕次数和击晕免去的伤害"""
+        offset = CARD_D + 7 * self.SOURCE_COUNT
+        self._counts[offset] += stuns
+        self._counts[offset + self.SOURCE_COUNT] += stun_avoided
+
+    def _flush(self):
+        """把模式计数和来源组合计数展开到counts"""
+        counts = self._counts
+        n = self.SOURCE_COUNT
+        for (card_damage, card_armor, aab_bonus, aad_bonus, _), *tables in self._tables:
+            for low_hp, patterns in enumerate(tables):
+                for times, mask, armor, played, prevented_ratio, attacked in patterns.values():
+                    if not times:
+                        continue
+                    if armor is not None:
+                        # 每次攻击把上次攻击以来获得的化劲按比例抵消，其余清零浪费；没遇到攻击的化劲到战斗结束仍未用上
+                        for source, amount in armor:
+                            counts[3 * n + source] += amount * prevented_ratio
+                            counts[4 * n + source] += amount * (attacked - prevented_ratio)
+                            counts[5 * n + source] += amount * (times - attacked)
+                    for card in played:
+                        counts[card] += times
+                        if card == CARD_E or (low_hp and card != CARD_D):
+                            counts[2 * n + card] += card_armor[card] * times
+                            if card != CARD_E:
+                                counts[6 * n + card] += times
+                        else:
+                            counts[n + card] += card_damage[card] * times
+                    for combo, bonus in ((COMBO_AAB, aab_bonus), (COMBO_AAD, aad_bonus)):
+                        if mask >> combo & 1:
+                            counts[combo] += times
+                            counts[n + combo] += bonus * times
+                for entry in patterns.values():
+                    entry[0] = entry[5] = 0
+                    entry[4] = 0.0
+        outcomes = self._outcomes
+        for index, battles in enumerate(outcomes):
+            if battles:
+                mask, won = index >> 1, index & 1
+                self._battles += battles
+                self._wins += battles * won
+                for source in range(n):
+                    if mask >> source & 1:
+                        counts[9 * n + source] += battles
+                        counts[10 * n + source] += battles * won
+                outcomes[index] = 0
+
+    @property
+    def counts(self):
+        self._flush()
+        return self._counts
+
+    @property
+    def battles(self):
+        self._flush()
+        return self._battles
+
+    @property
+    def wins(self):
+        self._flush()
+        return self._wins
+
+    def merge(self, other):
+        """合并另一份统计（就地累加，模拟中的BattleState可继续使用本统计）"""
+        counts = self.counts
+        for i, value in enumerate(other.counts):
+            counts[i] += value
+        self._battles += other.battles
+        self._wins += other.wins
+        return self
+
+    def as_array(self):
+        """numpy数组，形状为 (指标数, 来源数)"""
+        return np.array(self.counts, dtype=float).reshape(len(self.METRICS), self.SOURCE_COUNT)
+
+    def get(self, metric, source):
+        return self.counts[self.METRICS.index(metric) * self.SOURCE_COUNT + self.SOURCES.index(source)]
+
+    def to_dict(self):
+        return {'counts': self.counts, 'battles': self.battles, 'wins': self.wins}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['counts'], data['battles'], data['wins'])
+
+class BattleState:
+    """
+    可重复使用的战斗状态：牌用整数编码，牌库、手牌、弃牌堆均为预先分配并就地重置的列表，
+    整场战斗不创建Card/Player/Monster对象，也不产生每回合的临时列表和字符串
+
+    规则（含出牌顺序决定组合、打出的牌重复进入弃牌堆等细节）及随机数的使用顺序与
+    simulate_battle 使用默认Player、Monster时完全一致，相同随机数源下结果相同；
+    不支持自定义玩家策略和战斗记录
+
+    contributions 设为 ContributionStats 时，每场战斗按牌型和组合累加贡献统计（不影响随机数的使用顺序）
+    """
+    __slots__ = (
+        'rng', 'card_counts', 'deck', 'hand', 'played', 'discard_pile',
+        'monster_hp_setting', 'light_attack_damage', 'heavy_attack_damage', 'power_gain', 'action_pattern',
+        'hp', 'armor', 'monster_hp', 'monster_power', 'action_cycle',
+        'card_damage', 'card_armor', 'card_units', 'contributions', '_tally_tables',
+    )
+
+    def __init__(self, card_counts=None, rng=None, monster_hp=None, light_attack_damage=None,
+                 heavy_attack_damage=None, power_gain=None, action_pattern=None):
+        """参数含义同Player和Monster，未指定的数值在每次reset时按当前数值配置读取"""
+        self.rng = rng if rng is not None else default_rng()
+        self.card_counts = card_counts
+        self.monster_hp_setting = monster_hp
+        self.light_attack_damage = light_attack_damage
+        self.heavy_attack_damage = heavy_attack_damage
+        self.power_gain = power_gain
+        self.action_pattern = action_pattern
+        self.contributions = None
+        self._tally_tables = (None, -1, None, None)   # (统计, 数值配置代数, 常规模式表, 低血量模式表)
+        self.deck = []
+        self.hand = []
+        self.played = []
+        self.discard_pile = []
+        self.card_damage = [0, 0, 0, 0]
+        self.card_armor = [0, 0, 0, 0]
+        self.card_units = [CARD_LAYOUT.unit[name] for name in CARD_CODE_NAMES]
+        self.hp = self.armor = self.monster_hp = self.monster_power = self.action_cycle = 0
+
+    def reset(self, hp=None):
+        """开始新一场战斗：读取当前数值配置，就地重建并洗混牌库"""
+        card_damage = self.card_damage
+        card_armor = self.card_armor
+        card_damage[CARD_A] = card_damage[CARD_B] = CARD_AB_DAMAGE
+        card_armor[CARD_A] = card_armor[CARD_B] = CARD_AB_ARMOR
+        card_damage[CARD_D] = CARD_D_DAMAGE
+        card_armor[CARD_E] = CARD_E_ARMOR
+
+        card_counts = self.card_counts if self.card_counts is not None else default_card_counts()
+        deck = self.deck
+        deck.clear()
+        for code, name in enumerate(CARD_CODE_NAMES):
+            for _ in range(card_counts.get(name, 0)):
+                deck.append(code)
+        self.rng.shuffle(deck)
+        self.hand.clear()
+        self.played.clear()
+        self.discard_pile.clear()
+
+        self.hp = PLAYER_MAX_HP if hp is None else hp
+        self.armor = 0
+        self.monster_hp = MONSTER_HP if self.monster_hp_setting is None else self.monster_hp_setting
+        self.monster_power = 0
+        self.action_cycle = 0
+
+    def simulate(self, hp=None):
+        """
+        重置并模拟一场战斗
+
+        返回:
+        (回合数, 玩家剩余血量, 是否胜利)
+        """
+        self.reset(hp)
+        rng = self.rng
+        deck = self.deck
+        hand = self.hand
+        played = self.played
+        discard_pile = self.discard_pile
+        card_damage = self.card_damage
+        card_armor = self.card_armor
+        card_units = self.card_units
+
+        guard = CARD_LAYOUT.guard
+        draw_count = CARDS_DRAW_PER_TURN
+        max_play = MAX_CARDS_PLAY_PER_TURN
+        low_hp_threshold = PLAYER_LOW_HP_THRESHOLD
+        stun_chance = CARD_D_STUN_CHANCE
+        light_attack_damage = MONSTER_LIGHT_ATTACK_DAMAGE if self.light_attack_damage is None else self.light_attack_damage
+        heavy_attack_damage = MONSTER_HEAVY_ATTACK_DAMAGE if self.heavy_attack_damage is None else self.heavy_attack_damage
+        power_gain = MONSTER_POWER_GAIN if self.power_gain is None else self.power_gain
+        action_pattern = self.action_pattern
+        action_count = len(action_pattern) if action_pattern else MONSTER_ACTION_COUNT
+
+        hp = self.hp
+        armor = 0
+        monster_hp = self.monster_hp
+        power = 0
+        cycle = 0
+        turn = 0
+        stuns = 0
+        second = None
+        tally = self.contributions
+        if tally is not None:
+            cached_tally, generation, patterns, low_patterns = self._tally_tables
+            if cached_tally is not tally or generation != _constants_generation:
+                patterns, low_patterns = tally.pattern_tables(card_damage, card_armor)
+                self._tally_tables = (tally, _constants_generation, patterns, low_patterns)
+            pending = []       # 上次怪物攻击以来获得化劲的出牌模式（模式表中的条目）
+            used = 0
+            stunned_turns = 0
+            stun_count = 0
+
+        while hp > 0 and monster_hp > 0:
+            turn += 1
+            stuns = 0
+
+            # 抽牌（牌库空时把弃牌堆洗成新牌库）
+            hand.clear()
+            hand_bits = 0
+            for _ in range(draw_count):
+                if not deck:
+                    if discard_pile:
+                        deck.extend(discard_pile)
+                        discard_pile.clear()
+                        rng.shuffle(deck)
+                    else:
+                        break
+                card = deck.pop()
+                hand.append(card)
+                hand_bits += card_units[card]
+
+            # 选牌（与Player.choose_cards_to_play相同，按手牌顺序取牌）
+            played.clear()
+            if hand:
+                if ((hand_bits | guard) - AAB_COMBO) & guard == guard:
+                    second, second_limit = CARD_B, 1
+                elif ((hand_bits | guard) - AAD_COMBO) & guard == guard:
+                    second, second_limit = CARD_D, 1
+                else:
+                    second, second_limit = None, 0
+
+                if second is not None:
+                    a_count = 0
+                    for card in hand:
+                        if card == CARD_A and a_count < 2:
+                            played.append(card)
+                            a_count += 1
+                        elif card == second and second_limit:
+                            played.append(card)
+                            second_limit -= 1
+                        if len(played) == max_play:
+                            break
+                else:
+                    # 优先级：攻击牌 > 击晕牌 > 防御牌，每种最多一张
+                    for card in (CARD_A, CARD_B, CARD_D, CARD_E):
+                        if len(played) < max_play and card in hand:
+                            played.append(card)
+                del played[max_play:]
+
+            # 计算伤害和效果
+            total_damage = 0
+            total_armor = 0
+            if len(played) == 3 and played[0] == CARD_A and played[1] == CARD_A:
+                if played[2] == CARD_B:
+                    total_damage += AAB_COMBO_BONUS_DAMAGE
+                elif played[2] == CARD_D:
+                    total_damage += AAD_COMBO_BONUS_DAMAGE
+
+            for card in played:
+                if card == CARD_A or card == CARD_B:
+                    if hp <= low_hp_threshold:
+                        total_armor += card_armor[card]
+                    else:
+                        total_damage += card_damage[card]
+                elif card == CARD_D:
+                    total_damage += card_damage[card]
+                    if rng.random() < stun_chance:
+                        stuns += 1
+                else:
+                    total_armor += card_armor[card]
+            if tally is not None:
+                # 不凑组合时出牌只由手牌构成决定，直接用打包手牌作键；凑组合时打出的也总是两张A和一张B/D，
+                # 顺序只决定组合是否成立（第三张不是A），成立时键取负。每回合不足3张时出牌构成取决于手牌顺序，用出牌序列作键
+                if second is None:
+                    key = hand_bits
+                elif max_play >= 3:
+                    key = hand_bits if played[2] == CARD_A else -hand_bits
+                else:
+                    key = (*played,)
+                table = low_patterns if hp <= low_hp_threshold else patterns
+                entry = table.get(key)
+                if entry is None:
+                    entry = tally.add_pattern(table, key, played, table is low_patterns)
+                entry[0] += 1
+                used |= entry[1]
+                if entry[2] is not None:
+                    pending.append(entry)
+
+            # 打出的牌和整手牌都进入弃牌堆
+            discard_pile.extend(played)
+            armor += total_armor
+            if total_damage > 0:
+                monster_hp -= total_damage
+            discard_pile.extend(hand)
+
+            if monster_hp <= 0:
+                break
+
+            # 怪物回合
+            if not stuns:
+                action = action_pattern[cycle % action_count] if action_pattern else cycle % action_count
+                cycle += 1
+                if action == 0 or action == 1:
+                    damage = (light_attack_damage if action == 0 else heavy_attack_damage) + power
+                    if tally is not None and pending:
+                        prevented_ratio = (damage if damage < armor else armor) / armor
+                        for entry in pending:
+                            entry[4] += prevented_ratio
+                            entry[5] += 1
+                        pending.clear()
+                    if damage > armor:
+                        hp -= damage - armor
+                    armor = 0
+                elif action == 2:
+                    power += power_gain
+            elif tally is not None:
+                stunned_turns += 1
+                stun_count += stuns
+
+        if tally is not None:
+            tally._outcomes[used << 1 | (hp > 0)] += 1
+            # 最后一回合若打死怪物，本回合的击晕没有经过怪物回合的分支
+            stun_count += stuns
+            if stun_count:
+                # 被击晕时行动循环不前进，之后的行动整体顺延；
+                # 战斗结束时循环中接下来的 stunned_turns 个行动就是因击晕而没有执行的行动
+                stun_avoided = 0
+                skipped_power = power
+                for skipped in range(cycle, cycle + stunned_turns):
+                    action = action_pattern[skipped % action_count] if action_pattern else skipped % action_count
+                    if action == 0 or action == 1:
+                        stun_avoided += (light_attack_damage if action == 0 else heavy_attack_damage) + skipped_power
+                    elif action == 2:
+                        skipped_power += power_gain
+                tally.finish_battle(stun_count, stun_avoided)
+        self.hp = hp
+        self.armor = armor
+        self.monster_hp = monster_hp
+        self.monster_power = power
+        self.action_cycle = cycle
+        return turn, hp, hp > 0
+
+def run_battles(num_battles, rng=None, stats=None, state=None, contributions=None):
+    """
+    用同一个BattleState连续模拟多场战斗
+
+    contributions: ContributionStats，传入时同时累加按牌型和组合拆分的贡献统计
+    随机数源提供 next_point 方法时（如拟蒙特卡罗的逐场随机数源）每场战斗前调用一次
+
+    返回:
+    BattleStats（传入stats时在其上累加）
+    """
+    if stats is None:
+        stats = BattleStats()
+    if state is None:
+        state = BattleState(rng=rng)
+    if contributions is not None:
+        state.contributions = contributions
+    simulate = state.simulate
+    next_point = getattr(state.rng, 'next_point', None)
+    if next_point is None:
+        for _ in range(num_battles):
+            stats.add(*simulate())
+    else:
+        for _ in range(num_battles):
+            next_point()
+            stats.add(*simulate())
+    return stats
+
+def run_simulation(num_battles=DEFAULT_SIMULATION_BATTLES, verbose=True, rng=None):
+    """
+    运行多次战斗模拟（rng: 随机数源，可传入 rng_backend.BufferedRandom(seed) 使结果可复现；
+    提供 next_point 方法的随机数源每场战斗前切换一次）
+
+    返回:
+    字典：全部战斗的BattleStats（'stats'），以及胜利战斗的回合数、剩余血量统计
+    （'turns'、'hp'，各含 mean/min/max；没有胜利时为None）
+    """
     results = []
     wins = 0
     
-    print(f"开始模拟 {num_battles} 场战斗...")
+    if verbose:
+        print(f"开始模拟 {num_battles} 场战斗...")
     
+    stats = BattleStats()
+    state = BattleState(rng=rng)
+    next_point = getattr(state.rng, 'next_point', None)
     for i in range(num_battles):
-        if (i + 1) % PROGRESS_REPORT_INTERVAL == 0:
+        if verbose and (i + 1) % PROGRESS_REPORT_INTERVAL == 0:
             print(f"已完成 {i + 1} 场战斗...")
         
-        turns, remaining_hp, won = simulate_battle()
+        if next_point is not None:
+            next_point()
+        turns, remaining_hp, won = state.simulate()
+        stats.add(turns, remaining_hp, won)
         if won:
             results.append((turns, remaining_hp))
             wins += 1
     
+    summary = {'stats': stats, 'turns': None, 'hp': None}
     if not results:
-        print("所有战斗都失败了！")
-        return
+        if verbose:
+            print("所有战斗都失败了！")
+        return summary
     
     # 统计结果
     turns_data = [result[0] for result in results]
     hp_data = [result[1] for result in results]
+    summary['turns'] = {'mean': sum(turns_data)/len(turns_data), 'min': min(turns_data), 'max': max(turns_data)}
+    summary['hp'] = {'mean': sum(hp_data)/len(hp_data), 'min': min(hp_data), 'max': max(hp_data)}
+    if not verbose:
+        return summary
     
     print(f"\n=== 战斗模拟结果 ===")
     print(f"总战斗次数: {num_battles}")
@@ -311,13 +929,53 @@ def run_simulation(num_battles=DEFAULT_SIMULATION_BATTLES):
     print(f"胜率: {wins/num_battles*100:.2f}%")
     print(f"\n--- 胜利战斗统计 ---")
     print(f"回合数统计:")
-    print(f"  平均值: {sum(turns_data)/len(turns_data):.2f}")
-    print(f"  最小值: {min(turns_data)}")
-    print(f"  最大值: {max(turns_data)}")
+    print(f"  平均值: {summary['turns']['mean']:.2f}")
+    print(f"  最小值: {summary['turns']['min']}")
+    print(f"  最大值: {summary['turns']['max']}")
     print(f"\n剩余血量统计:")
-    print(f"  平均值: {sum(hp_data)/len(hp_data):.2f}")
-    print(f"  最小值: {min(hp_data)}")
-    print(f"  最大值: {max(hp_data)}")
+    print(f"  平均值: {summary['hp']['mean']:.2f}")
+    print(f"  最小值: {summary['hp']['min']}")
+    print(f"  最大值: {summary['hp']['max']}")
+    return summary
+
+# 一致性检查用的数值覆盖和怪物行动循环
+EQUIVALENCE_CHECK_CASES = (
+    ({}, None),
+    ({'PLAYER_MAX_HP': 20, 'MONSTER_HP': 30}, None),
+    ({'MONSTER_HP': 40, 'CARD_E_COUNT': 4, 'PLAYER_LOW_HP_THRESHOLD': 15}, [1, 0, 2, 2]),
+    ({'CARD_D_STUN_CHANCE': 0.8, 'MONSTER_HEAVY_ATTACK_DAMAGE': 12}, [1, 1, 2]),
+)
+
+def check_battle_state(num_battles=2000, seed=0):
+    """
+    检查BattleState与simulate_battle在相同随机数源下逐场结果一致、随机数消耗一致，
+    且开启贡献统计不改变结果
+
+    返回:
+    不一致的场数
+    """
+    import random
+    mismatches = 0
+    for case_index, (overrides, action_pattern) in enumerate(EQUIVALENCE_CHECK_CASES):
+        with override_constants(**overrides):
+            reference_rng = random.Random(seed * 1000003 + case_index)
+            state_rng = random.Random(seed * 1000003 + case_index)
+            tallied_rng = random.Random(seed * 1000003 + case_index)
+            state = BattleState(rng=state_rng, action_pattern=action_pattern)
+            tallied = BattleState(rng=tallied_rng, action_pattern=action_pattern)
+            tallied.contributions = ContributionStats()
+            for _ in range(num_battles):
+                expected = simulate_battle(Player(rng=reference_rng), Monster(action_pattern=action_pattern),
+                                           reference_rng)
+                if state.simulate() != expected or tallied.simulate() != expected:
+                    mismatches += 1
+            if not reference_rng.getstate() == state_rng.getstate() == tallied_rng.getstate():
+                mismatches += 1
+    return mismatches
 
 if __name__ == "__main__":
+    if '--check' in sys.argv:
+        mismatches = check_battle_state()
+        print(f"BattleState一致性检查: {len(EQUIVALENCE_CHECK_CASES)} 组配置，不一致 {mismatches} 处")
+        sys.exit(1 if mismatches else 0)
     run_simulation(DEFAULT_SIMULATION_BATTLES) 
\ No newline at end of file
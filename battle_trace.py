@@ -0,0 +1,214 @@
+import json
+import random
+import struct
+import sys
+import time
+from operator import attrgetter
+
+import numpy as np
+
+import battle_simulator
+from battle_simulator import BALANCE_CONSTANTS, CARD_CODE_NAMES, simulate_battle
+
+# ===========================================
+# 战斗记录文件格式
+# ===========================================
+#
+# 文件头: 8字节魔数 + 4字节小端长度 + JSON（记录格式版本与数值配置），
+#         之后填充到64字节对齐
+# 数据区: 定长记录，每回合一条，可直接用numpy内存映射读取
+
+TRACE_MAGIC = b'BTRACE01'
+TRACE_ALIGNMENT = 64
+TRACE_HAND_SLOTS = 8                  # 手牌槽位数（需不小于每回合抽牌数）
+TRACE_PLAY_SLOTS = 4                  # 出牌槽位数（需不小于每回合最多打牌数）
+TRACE_BUFFER_RECORDS = 65536          # 写入缓冲的记录数
+
+CARD_CODES = {name: code for code, name in enumerate(CARD_CODE_NAMES)}
+CARD_NAMES = {code: name for name, code in CARD_CODES.items()}
+NO_CARD = 255
+_card_code = attrgetter('code')
+_EMPTY_HAND = (NO_CARD,) * TRACE_HAND_SLOTS
+_EMPTY_PLAY = (NO_CARD,) * TRACE_PLAY_SLOTS
+
+ACTION_STUNNED = -1                   # 怪物被击晕
+ACTION_NONE = -2                      # 怪物已死亡，未行动
+ACTION_NAMES = {0: '轻攻击', 1: '重攻击', 2: '蓄力', ACTION_STUNNED: '被击晕', ACTION_NONE: '无'}
+
+TRACE_DTYPE = np.dtype([
+    ('battle', '<u4'),                # 战斗编号
+    ('turn', '<u2'),                  # 回合数
+    ('hand', 'u1', (TRACE_HAND_SLOTS,)),   # 抽到的手牌（按摸牌顺序，空位为255）
+    ('played', 'u1', (TRACE_PLAY_SLOTS,)), # 打出的牌（按出牌顺序）
+    ('damage', '<i2'),                # 对怪物造成的伤害
+    ('armor', '<i2'),                 # 获得的化劲
+    ('stun', 'u1'),                   # 是否击晕
+    ('action', 'i1'),                 # 怪物行动
+    ('player_hp', '<i2'),             # 回合结束时玩家血量
+    ('monster_hp', '<i2'),            # 回合结束时怪物血量
+])
+
+# 与TRACE_DTYPE逐字节一致的打包格式，写入时直接打包进缓冲区，避免逐条构造numpy对象
+TRACE_STRUCT = struct.Struct(f'<IH{TRACE_HAND_SLOTS}B{TRACE_PLAY_SLOTS}BhhBbhh')
+assert TRACE_STRUCT.size == TRACE_DTYPE.itemsize
+
+# ===========================================
+
+class BattleTraceWriter:
+    """
+    战斗记录器：作为simulate_battle的trace参数传入
+
+    每回合把一条定长记录打包进预分配的缓冲区（手牌、出牌直接按整数牌编码逐槽写入，空位补255），
+    缓冲满后整块写入文件
+    """
+    def __init__(self, path, buffer_records=TRACE_BUFFER_RECORDS):
+        if battle_simulator.CARDS_DRAW_PER_TURN > TRACE_HAND_SLOTS:
+            raise ValueError(f"每回合抽牌数超过记录槽位数 {TRACE_HAND_SLOTS}")
+        if battle_simulator.MAX_CARDS_PLAY_PER_TURN > TRACE_PLAY_SLOTS:
+            raise ValueError(f"每回合打牌数超过记录槽位数 {TRACE_PLAY_SLOTS}")
+
+        self.path = path
+        self.buffer = bytearray(buffer_records * TRACE_STRUCT.size)
+        self.buffer_used = 0
+        self.battle = -1
+        self.records_written = 0
+        self.file = open(path, 'wb')
+        self._write_header()
+
+    def _write_header(self):
+        header = {
+            'version': 1,
+            'dtype': TRACE_DTYPE.descr,
+            'cards': CARD_CODES,
+            'constants': {name: getattr(battle_simulator, name) for name in BALANCE_CONSTANTS},
+        }
+        payload = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        prefix_length = len(TRACE_MAGIC) + 4 + len(payload)
+        padding = -prefix_length % TRACE_ALIGNMENT
+        self.file.write(TRACE_MAGIC + struct.pack('<I', len(payload) + padding))
+        self.file.write(payload + b' ' * padding)
+
+    def start_battle(self):
+        self.battle += 1
+
+    def record_turn(self, turn, hand, played, damage, armor, stun, action,
+                    player_hp, monster_hp, monster_acted=True):
+        if not monster_acted:
+            action = ACTION_NONE
+        elif action is None:
+            action = ACTION_STUNNED
+
+        TRACE_STRUCT.pack_into(self.buffer, self.buffer_used, self.battle, turn,
+                               *map(_card_code, hand), *_EMPTY_HAND[len(hand):],
+                               *map(_card_code, played), *_EMPTY_PLAY[len(played):],
+                               damage, armor, stun, action, player_hp, monster_hp)
+        self.buffer_used += TRACE_STRUCT.size
+        if self.buffer_used == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        if self.buffer_used:
+            self.file.write(memoryview(self.buffer)[:self.buffer_used])
+            self.records_written += self.buffer_used // TRACE_STRUCT.size
+            self.buffer_used = 0
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def read_trace_header(path):
+    """读取文件头，返回 (头信息字典, 数据区偏移)"""
+    with open(path, 'rb') as f:
+        magic = f.read(len(TRACE_MAGIC))
+        if magic != TRACE_MAGIC:
+            raise ValueError(f"{path} 不是战斗记录文件")
+        (length,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(length).decode('utf-8'))
+    return header, len(TRACE_MAGIC) + 4 + length
+
+def open_trace(path):
+    """以只读内存映射打开记录文件，返回numpy结构化数组视图（不解析、不复制）"""
+    header, offset = read_trace_header(path)
+    if header['version'] != 1:
+        raise ValueError(f"不支持的记录格式版本: {header['version']}")
+    return np.memmap(path, dtype=TRACE_DTYPE, mode='r', offset=offset)
+
+def battle_bounds(trace):
+    """返回每场战斗在记录中的起止位置 (starts, ends)，空记录返回空数组"""
+    if len(trace) == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    starts = np.flatnonzero(np.r_[True, trace['battle'][1:] != trace['battle'][:-1]])
+    ends = np.r_[starts[1:], len(trace)]
+    return starts, ends
+
+def battle_outcomes(trace):
+    """按战斗汇总，返回 (战斗编号, 回合数, 玩家剩余血量, 是否胜利) 四个数组"""
+    _, ends = battle_bounds(trace)
+    last = trace[ends - 1]
+    return last['battle'], last['turn'], last['player_hp'], last['player_hp'] > 0
+
+def battle_records(trace, battle):
+    """取出某场战斗的全部回合记录"""
+    battles = trace['battle']
+    start = np.searchsorted(battles, battle, side='left')
+    end = np.searchsorted(battles, battle, side='right')
+    return trace[start:end]
+
+def _cards_text(codes):
+    return ''.join(CARD_NAMES[code] for code in codes if code != NO_CARD)
+
+def replay_battle(trace, battle):
+    """逐回合打印一场战斗"""
+    records = battle_records(trace, battle)
+    if len(records) == 0:
+        print(f"记录中没有第 {battle} 场战斗")
+        return
+
+    print(f"\n=== 第 {battle} 场战斗回放 ===")
+    for record in records:
+        stun_text = '，击晕' if record['stun'] else ''
+        print(f"第{record['turn']}回合: 手牌 {_cards_text(record['hand'])}, "
+              f"打出 {_cards_text(record['played']) or '无'}, "
+              f"伤害 {record['damage']}, 化劲 {record['armor']}{stun_text}; "
+              f"怪物{ACTION_NAMES[int(record['action'])]}; "
+              f"玩家血量 {record['player_hp']}, 怪物血量 {record['monster_hp']}")
+
+    result = '胜利' if records[-1]['player_hp'] > 0 else '失败'
+    print(f"结果: {result}")
+
+def record_battles(path, num_battles, seed=None):
+    """模拟并记录多场战斗，返回写入的记录条数"""
+    rng = random.Random(seed)
+    with BattleTraceWriter(path) as writer:
+        for _ in range(num_battles):
+            simulate_battle(rng=rng, trace=writer)
+    return writer.records_written
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else 'battle_trace.bin'
+    num_battles = int(sys.argv[2]) if len(sys.argv) > 2 else battle_simulator.DEFAULT_SIMULATION_BATTLES
+
+    start_time = time.time()
+    records = record_battles(path, num_battles)
+    elapsed = time.time() - start_time
+    print(f"已记录 {num_battles} 场战斗，共 {records} 个回合，写入 {path}")
+    print(f"计算用时: {elapsed:.3f}秒")
+
+    trace = open_trace(path)
+    battles, turns, hp, won = battle_outcomes(trace)
+    print(f"\n胜率: {won.mean()*100:.2f}%")
+    print(f"平均回合数: {turns.mean():.2f}")
+
+    # 回放失败的战斗；全部胜利时回放回合数最多的一场
+    lost = battles[~won]
+    replay_battle(trace, int(lost[0]) if len(lost) else int(battles[np.argmax(turns)]))
+
+if __name__ == "__main__":
+    main()
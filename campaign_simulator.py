@@ -0,0 +1,190 @@
+import random
+import time
+from multiprocessing import Pool, cpu_count
+
+import battle_simulator
+from battle_simulator import BattleState, default_card_counts
+
+# ===========================================
+# 连续战斗（战役）模拟配置
+# ===========================================
+
+DEFAULT_CAMPAIGN_RUNS = 20000         # 默认模拟战役次数
+DEFAULT_CHUNK_SIZE = 2000             # 每个工作进程一次处理的战役数
+
+# ===========================================
+
+class Encounter:
+    """一场遭遇战的配置"""
+    def __init__(self, name, monster_hp=None, light_attack_damage=None,
+                 heavy_attack_damage=None, power_gain=None, action_pattern=None,
+                 heal_before=0, card_changes=None):
+        """
+        name: 遭遇名称
+        monster_hp 等: 怪物数值，默认取battle_simulator中的配置
+        action_pattern: 怪物行动循环，如 [0, 1, 2]
+        heal_before: 本场战斗前恢复的生命值（不超过最大生命值）
+        card_changes: 本场战斗前对牌库的增减，如 {'A': 1, 'E': -1}
+        """
+        self.name = name
+        self.monster_hp = monster_hp
+        self.light_attack_damage = light_attack_damage
+        self.heavy_attack_damage = heavy_attack_damage
+        self.power_gain = power_gain
+        self.action_pattern = action_pattern
+        self.heal_before = heal_before
+        self.card_changes = card_changes or {}
+
+def build_battle_states(encounters, rng):
+    """
+    为每场遭遇建立可重复使用的BattleState，牌库构成按各遭遇战前的增减依次累积
+
+    牌库构成在调用时按当前数值配置读取，同一组状态可连续模拟多次战役
+    """
+    card_counts = default_card_counts()
+    states = []
+    for encounter in encounters:
+        card_counts = dict(card_counts)
+        for card, delta in encounter.card_changes.items():
+            card_counts[card] = max(0, card_counts.get(card, 0) + delta)
+        states.append(BattleState(
+            card_counts=card_counts,
+            rng=rng,
+            monster_hp=encounter.monster_hp,
+            light_attack_damage=encounter.light_attack_damage,
+            heavy_attack_damage=encounter.heavy_attack_damage,
+            power_gain=encounter.power_gain,
+            action_pattern=encounter.action_pattern,
+        ))
+    return states
+
+def simulate_campaign(encounters, rng, states=None):
+    """
+    模拟一次完整战役，血量在战斗之间继承
+
+    states: build_battle_states 建立的状态列表，批量模拟时传入以免每次战役重建
+
+    返回:
+    (通过的遭遇数, 每场战斗后的血量列表, 每场战斗的回合数列表)
+    """
+    if states is None:
+        states = build_battle_states(encounters, rng)
+    max_hp = battle_simulator.PLAYER_MAX_HP
+    hp = max_hp
+    hp_after = []
+    turns_taken = []
+
+    for encounter, state in zip(encounters, states):
+        hp = min(max_hp, hp + encounter.heal_before)
+        turns, hp, won = state.simulate(hp)
+        if not won:
+            break
+        hp_after.append(hp)
+        turns_taken.append(turns)
+
+    return len(hp_after), hp_after, turns_taken
+
+def _run_campaign_chunk(args):
+    """工作进程：模拟一批战役并只返回汇总数据，减少进程间通信"""
+    encounters, num_runs, seed = args
+    rng = random.Random(seed)
+    num_encounters = len(encounters)
+    survived = [0] * num_encounters
+    hp_sum = [0] * num_encounters
+    turns_sum = [0] * num_encounters
+    states = build_battle_states(encounters, rng)
+
+    for _ in range(num_runs):
+        cleared, hp_after, turns_taken = simulate_campaign(encounters, rng, states)
+        for i in range(cleared):
+            survived[i] += 1
+            hp_sum[i] += hp_after[i]
+            turns_sum[i] += turns_taken[i]
+
+    return survived, hp_sum, turns_sum
+
+def run_campaigns(encounters, num_runs=DEFAULT_CAMPAIGN_RUNS, processes=None,
+                  chunk_size=DEFAULT_CHUNK_SIZE, seed=None):
+    """
+    并行批量模拟战役
+
+    参数:
+    encounters: 遭遇列表
+    num_runs: 战役次数
+    processes: 进程数，默认使用全部CPU；为1时在当前进程内运行
+    chunk_size: 每批战役数
+    seed: 随机种子，指定后结果可复现
+
+    返回:
+    字典，包含每场遭遇的存活次数、平均剩余血量和平均回合数
+    """
+    if seed is None:
+        seed = random.randrange(2**32)
+
+    tasks = []
+    remaining = num_runs
+    chunk_index = 0
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        tasks.append((encounters, size, seed * 1000003 + chunk_index))
+        remaining -= size
+        chunk_index += 1
+
+    if processes is None:
+        processes = cpu_count()
+
+    if processes <= 1:
+        results = [_run_campaign_chunk(task) for task in tasks]
+    else:
+        with Pool(processes) as pool:
+            results = list(pool.imap_unordered(_run_campaign_chunk, tasks))
+
+    num_encounters = len(encounters)
+    survived = [0] * num_encounters
+    hp_sum = [0] * num_encounters
+    turns_sum = [0] * num_encounters
+    for chunk_survived, chunk_hp, chunk_turns in results:
+        for i in range(num_encounters):
+            survived[i] += chunk_survived[i]
+            hp_sum[i] += chunk_hp[i]
+            turns_sum[i] += chunk_turns[i]
+
+    return {
+        'num_runs': num_runs,
+        'survived': survived,
+        'survival_rate': [count / num_runs for count in survived],
+        'mean_hp': [hp_sum[i] / survived[i] if survived[i] else 0.0 for i in range(num_encounters)],
+        'mean_turns': [turns_sum[i] / survived[i] if survived[i] else 0.0 for i in range(num_encounters)],
+    }
+
+def print_survival_curve(encounters, results):
+    """打印每场遭遇后的存活曲线"""
+    print(f"\n=== 战役存活曲线 ===")
+    print(f"战役次数: {results['num_runs']}")
+    print(f"{'遭遇':<12}{'存活率':>10}{'平均剩余血量':>14}{'平均回合数':>12}")
+    for i, encounter in enumerate(encounters):
+        print(f"{encounter.name:<12}"
+              f"{results['survival_rate'][i]*100:>9.2f}%"
+              f"{results['mean_hp'][i]:>14.2f}"
+              f"{results['mean_turns'][i]:>12.2f}")
+
+def main():
+    """示例战役：两场普通战斗、一场精英战后迎战首领"""
+    encounters = [
+        Encounter("小怪1"),
+        Encounter("小怪2", monster_hp=20),
+        Encounter("精英", monster_hp=35, heavy_attack_damage=10, heal_before=5),
+        Encounter("首领", monster_hp=60, heavy_attack_damage=12, action_pattern=[2, 0, 1, 1],
+                  heal_before=10, card_changes={'A': 1}),
+    ]
+
+    print(f"开始模拟 {DEFAULT_CAMPAIGN_RUNS} 次战役...")
+    start_time = time.time()
+    results = run_campaigns(encounters, DEFAULT_CAMPAIGN_RUNS)
+    elapsed = time.time() - start_time
+
+    print_survival_curve(encounters, results)
+    print(f"\n计算用时: {elapsed:.3f}秒")
+
+if __name__ == "__main__":
+    main()
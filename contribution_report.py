@@ -0,0 +1,99 @@
+import sys
+import time
+from multiprocessing import Pool, cpu_count
+
+from battle_simulator import BattleStats, ContributionStats, run_battles, override_constants
+from rng_backend import BufferedRandom
+
+# ===========================================
+# 贡献统计配置
+# ===========================================
+
+DEFAULT_REPORT_BATTLES = 1000000      # 默认模拟战斗场数
+DEFAULT_CHUNK_BATTLES = 50000         # 每个工作进程一次模拟的战斗场数
+
+SOURCE_NAMES = {'A': 'A牌', 'B': 'B牌', 'D': 'D牌', 'E': 'E牌', 'AAB': 'AAB组合', 'AAD': 'AAD组合'}
+
+# ===========================================
+
+def _run_chunk(args):
+    """工作进程：模拟一批战斗，返回可合并的统计（字典形式，减少进程间通信）"""
+    num_battles, seed, overrides = args
+    stats = BattleStats()
+    contributions = ContributionStats()
+    with override_constants(**overrides):
+        run_battles(num_battles, rng=BufferedRandom(seed), stats=stats, contributions=contributions)
+    return stats.to_dict(), contributions.to_dict()
+
+def collect_contributions(num_battles=DEFAULT_REPORT_BATTLES, overrides=None, processes=None,
+                          chunk_size=DEFAULT_CHUNK_BATTLES, seed=0):
+    """
+    并行模拟并汇总贡献统计
+
+    参数:
+    overrides: 数值覆盖，如 {'MONSTER_HP': 30}
+    processes: 进程数，默认使用全部CPU；为1时在当前进程内运行
+
+    返回:
+    (BattleStats, ContributionStats)
+    """
+    overrides = overrides or {}
+    tasks = []
+    for chunk_index, first in enumerate(range(0, num_battles, chunk_size)):
+        tasks.append((min(chunk_size, num_battles - first), seed * 1000003 + chunk_index, overrides))
+
+    if processes is None:
+        processes = cpu_count()
+    if processes <= 1:
+        results = [_run_chunk(task) for task in tasks]
+    else:
+        with Pool(processes) as pool:
+            results = list(pool.imap_unordered(_run_chunk, tasks))
+
+    stats = BattleStats()
+    contributions = ContributionStats()
+    for chunk_stats, chunk_contributions in results:
+        stats.merge(BattleStats.from_dict(chunk_stats))
+        contributions.merge(ContributionStats.from_dict(chunk_contributions))
+    return stats, contributions
+
+def print_contributions(stats, contributions):
+    """打印每场平均的贡献表，以及打出/未打出各来源时的胜率"""
+    battles = stats.battles
+    table = contributions.as_array() / battles
+    metric_index = {metric: i for i, metric in enumerate(ContributionStats.METRICS)}
+    total_damage = table[metric_index['damage']].sum()
+
+    print(f"{'来源':<8}{'打出':>8}{'伤害':>8}{'伤害占比':>9}{'化劲':>8}{'抵消伤害':>9}"
+          f"{'化劲浪费':>9}{'未用化劲':>9}{'转化劲':>8}{'击晕':>8}{'击晕免伤':>9}")
+    for source_index, source in enumerate(ContributionStats.SOURCES):
+        row = {metric: table[i][source_index] for metric, i in metric_index.items()}
+        share = row['damage'] / total_damage if total_damage else 0.0
+        print(f"{SOURCE_NAMES[source]:<8}{row['plays']:>8.3f}{row['damage']:>8.3f}{share:>10.1%}"
+              f"{row['armor']:>8.3f}{row['prevented']:>10.3f}{row['wasted']:>10.3f}{row['unused']:>10.3f}"
+              f"{row['conversions']:>8.3f}{row['stuns']:>8.3f}{row['stun_avoided']:>10.3f}")
+    print("（以上均为每场战斗的平均值）")
+
+    print(f"\n总胜率: {stats.win_rate:.2%}")
+    print(f"{'来源':<8}{'出现场次占比':>12}{'出现时胜率':>12}{'未出现时胜率':>12}")
+    for source in ContributionStats.SOURCES:
+        used_battles = contributions.get('battles', source)
+        used_wins = contributions.get('wins', source)
+        other_battles = battles - used_battles
+        used_rate = f"{used_wins / used_battles:.2%}" if used_battles else "-"
+        other_rate = f"{(stats.wins - used_wins) / other_battles:.2%}" if other_battles else "-"
+        print(f"{SOURCE_NAMES[source]:<8}{used_battles / battles:>14.2%}{used_rate:>14}{other_rate:>14}")
+
+def main():
+    num_battles = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REPORT_BATTLES
+    for title, overrides in (("默认数值", {}),
+                             ("强化怪物（怪物血量40，玩家血量20）", {'MONSTER_HP': 40, 'PLAYER_MAX_HP': 20})):
+        print(f"\n=== {title}，{num_battles:,} 场战斗 ===")
+        start_time = time.time()
+        stats, contributions = collect_contributions(num_battles, overrides)
+        elapsed = time.time() - start_time
+        print_contributions(stats, contributions)
+        print(f"用时 {elapsed:.2f}秒")
+
+if __name__ == "__main__":
+    main()
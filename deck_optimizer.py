@@ -0,0 +1,150 @@
+import time
+from math import ceil, sqrt
+
+from battle_simulator import BattleState, BattleStats, CARD_CODE_NAMES
+from sensitivity_analysis import METRIC_NAMES, CommonRandomNumbers
+
+# ===========================================
+# 牌组构成优化配置
+# ===========================================
+
+DEFAULT_INITIAL_BATTLES = 200         # 第一轮每个牌组模拟的战斗场数
+DEFAULT_ETA = 2                       # 每轮保留 1/ETA 的牌组，保留的牌组下一轮模拟场数乘以ETA
+DEFAULT_MAX_BATTLES = 20000           # 单个牌组最多累计的战斗场数
+CONFIDENCE_Z = 1.96                   # 95%置信区间
+
+DEFAULT_MINIMUMS = {'A': 1, 'B': 1, 'D': 1, 'E': 1}   # 每种牌的最少张数
+
+# ===========================================
+#
+# 逐次减半：所有候选牌组先各打少量战斗，按得分保留前 1/ETA，
+# 保留下来的牌组追加 ETA 倍的战斗，如此反复，模拟预算集中在有竞争力的牌组上。
+# 所有牌组的第i场战斗使用同一个公共随机数种子，牌组之间的比较更稳定。
+
+def deck_compositions(deck_size, minimums=None, maximums=None):
+    """满足总张数和每种牌上下限的全部牌组构成"""
+    minimums = DEFAULT_MINIMUMS if minimums is None else minimums
+    maximums = maximums or {}
+    bounds = [(minimums.get(name, 0), maximums.get(name, deck_size)) for name in CARD_CODE_NAMES]
+
+    compositions = []
+    def _extend(index, counts, remaining):
+        low, high = bounds[index]
+        if index == len(bounds) - 1:
+            if low <= remaining <= high:
+                compositions.append(dict(zip(CARD_CODE_NAMES, counts + [remaining])))
+            return
+        for count in range(low, min(high, remaining) + 1):
+            _extend(index + 1, counts + [count], remaining - count)
+
+    _extend(0, [], deck_size)
+    return compositions
+
+def metric_interval(stats, metric):
+    """统计量的均值与95%置信区间半宽"""
+    n = stats.battles
+    if metric == 'win_rate':
+        mean = stats.win_rate
+        variance = mean * (1 - mean)
+    elif metric == 'mean_turns':
+        mean = stats.mean_turns
+        variance = stats.turns_sq_sum / n - mean * mean
+    elif metric == 'mean_hp':
+        mean = stats.mean_hp
+        variance = stats.hp_sq_sum / n - mean * mean
+    else:
+        raise ValueError(f"未知的指标: {metric}")
+    return mean, CONFIDENCE_Z * sqrt(max(variance, 0.0) / n)
+
+def _score(candidate, metric, target):
+    """得分越高越好：有目标值时为与目标的距离取负，否则为指标本身"""
+    mean, _ = metric_interval(candidate['stats'], metric)
+    return -abs(mean - target) if target is not None else mean
+
+def _run_candidate(candidate, first_battle, num_battles, seed, player_hp, monster):
+    """为候选牌组追加第 first_battle 场起的 num_battles 场战斗"""
+    state = BattleState(card_counts=candidate['counts'], **monster)
+    stats = candidate['stats']
+    for battle in range(first_battle, first_battle + num_battles):
+        state.rng = CommonRandomNumbers(seed * 1000003 + battle)
+        stats.add(*state.simulate(player_hp))
+
+def optimize_deck(deck_size, target=None, metric='win_rate', minimums=None, maximums=None,
+                  monster=None, player_hp=None, initial_battles=DEFAULT_INITIAL_BATTLES,
+                  eta=DEFAULT_ETA, max_battles=DEFAULT_MAX_BATTLES, seed=0, verbose=True):
+    """
+    搜索满足约束的牌组构成
+
+    参数:
+    deck_size: 牌组总张数
+    target: 指标的目标值（如目标胜率0.7）；为None时使指标尽量大
+    metric: 'win_rate'、'mean_turns' 或 'mean_hp'
+    minimums / maximums: 每种牌的张数上下限，如 {'A': 2, 'E': 1}
+    monster: 怪物参数，同BattleState（如 {'monster_hp': 30, 'action_pattern': [0, 1, 2]}）
+    player_hp: 玩家初始血量，默认满血
+
+    返回:
+    按排名排序的列表，每项为字典:
+    {'counts': 牌组构成, 'stats': BattleStats, 'mean': 指标均值, 'ci': 置信区间半宽, 'rounds': 保留的轮数}
+    """
+    monster = monster or {}
+    candidates = [{'counts': counts, 'stats': BattleStats(), 'rounds': 0}
+                  for counts in deck_compositions(deck_size, minimums, maximums)]
+    if not candidates:
+        raise ValueError(f"没有满足约束的{deck_size}张牌组")
+
+    alive = candidates
+    battles_done = 0
+    round_battles = initial_battles
+    while True:
+        round_battles = min(round_battles, max_battles - battles_done)
+        for candidate in alive:
+            _run_candidate(candidate, battles_done, round_battles, seed, player_hp, monster)
+            candidate['rounds'] += 1
+        battles_done += round_battles
+
+        alive.sort(key=lambda candidate: _score(candidate, metric, target), reverse=True)
+        if verbose:
+            best_mean, best_ci = metric_interval(alive[0]['stats'], metric)
+            print(f"第{alive[0]['rounds']}轮: {len(alive)} 个牌组各 {battles_done} 场，"
+                  f"当前最佳 {_deck_text(alive[0]['counts'])} {best_mean:.4f}±{best_ci:.4f}")
+        if len(alive) == 1 or battles_done >= max_battles:
+            break
+        alive = alive[:max(1, ceil(len(alive) / eta))]
+        round_battles *= eta
+
+    ranked = sorted(candidates, key=lambda candidate: (candidate['rounds'], _score(candidate, metric, target)),
+                    reverse=True)
+    for candidate in ranked:
+        candidate['mean'], candidate['ci'] = metric_interval(candidate['stats'], metric)
+    return ranked
+
+def _deck_text(counts):
+    return ' '.join(f"{name}{counts[name]}" for name in CARD_CODE_NAMES)
+
+def print_ranking(ranked, metric='win_rate', top=10):
+    """打印排名前top的牌组"""
+    print(f"{'排名':<6}{'牌组':<18}{METRIC_NAMES[metric]:>10}{'95%置信区间':>26}{'战斗场数':>10}")
+    for rank, candidate in enumerate(ranked[:top], 1):
+        mean, ci = candidate['mean'], candidate['ci']
+        print(f"{rank:<6}{_deck_text(candidate['counts']):<18}{mean:>10.4f}"
+              f"   [{mean - ci:>8.4f}, {mean + ci:>8.4f}]{candidate['stats'].battles:>10}")
+
+def main():
+    """为10、12、15张牌组寻找对强化怪物胜率最接近70%的构成"""
+    target = 0.7
+    monster = {'monster_hp': 30}
+    player_hp = 20
+    for deck_size in (10, 12, 15):
+        print(f"\n=== {deck_size}张牌组，目标胜率 {target:.0%}（怪物血量 {monster['monster_hp']}，"
+              f"玩家血量 {player_hp}）===")
+        start_time = time.time()
+        ranked = optimize_deck(deck_size, target=target, monster=monster, player_hp=player_hp)
+        elapsed = time.time() - start_time
+        total_battles = sum(candidate['stats'].battles for candidate in ranked)
+        print()
+        print_ranking(ranked)
+        print(f"共 {len(ranked)} 个牌组，{total_battles:,} 场战斗，用时 {elapsed:.3f}秒")
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,25 @@
 from math import comb, factorial
 from collections import Counter
 import itertools
+from packed_multiset import layout_for
 
-def exact_probability_calculation(element_counts, target_combination):
+def exact_probability_calculation(element_counts, target_combination, verbose=True):
     """
     使用精确数学方法计算概率
     
     参数:
     element_counts: 字典，各元素的数量
     target_combination: 目标组合字符串
+    verbose: 为False时不打印过程和结果
     
     返回:
     精确概率值
     """
     
-    print(f"=== 精确概率计算 ===")
-    print(f"集合配置: {element_counts}")
-    print(f"目标组合: {target_combination}")
+    if verbose:
+        print(f"=== 精确概率计算 ===")
+        print(f"集合配置: {element_counts}")
+        print(f"目标组合: {target_combination}")
     
     # 创建完整元素列表
     elements = []
@@ -26,41 +29,117 @@ def exact_probability_calculation(element_counts, target_combination):
     total_elements = len(elements)
     target_count = Counter(target_combination)
     
-    print(f"总元素数量: {total_elements}")
-    print(f"目标组合需求: {dict(target_count)}")
+    if verbose:
+        print(f"总元素数量: {total_elements}")
+        print(f"目标组合需求: {dict(target_count)}")
     
     # 计算总的可能抽取方式数
     total_ways = comb(total_elements, 5)
     
+    # 打包多重集：选中元素的单位求和即为打包后的手牌
+    layout = layout_for(element_counts, target_combination)
+    element_units = layout.units(elements)
+    target = layout.pack(target_count)
+    guard = layout.guard
+    
     # 计算满足条件的抽取方式数
     success_ways = 0
     
-    # 生成所有可能的5元素组合的索引
-    for combo_indices in itertools.combinations(range(total_elements), 5):
-        selected_elements = [elements[i] for i in combo_indices]
-        selected_count = Counter(selected_elements)
+    # 生成所有可能的5元素组合
+    for combo_units in itertools.combinations(element_units, 5):
+        hand = sum(combo_units)
         
         # 检查是否包含目标组合
-        contains_target = True
-        for element, needed in target_count.items():
-            if selected_count.get(element, 0) < needed:
-                contains_target = False
-                break
-        
-        if contains_target:
+        if ((hand | guard) - target) & guard == guard:
             success_ways += 1
     
     # 计算精确概率
     exact_probability = success_ways / total_ways
     
-    print(f"\n计算结果:")
-    print(f"总的抽取方式数: {total_ways}")
-    print(f"满足条件的方式数: {success_ways}")
-    print(f"精确概率: {exact_probability:.8f}")
-    print(f"百分比: {exact_probability*100:.6f}%")
+    if verbose:
+        print(f"\n计算结果:")
+        print(f"总的抽取方式数: {total_ways}")
+        print(f"满足条件的方式数: {success_ways}")
+        print(f"精确概率: {exact_probability:.8f}")
+        print(f"百分比: {exact_probability*100:.6f}%")
     
     return exact_probability
 
+def _multiply_polynomials(left, right):
+    """多项式乘法（系数列表，下标为次数）"""
+    product = [0] * (len(left) + len(right) - 1)
+    for i, a in enumerate(left):
+        if a:
+            for j, b in enumerate(right):
+                product[i + j] += a * b
+    return product
+
+def containment_ways_by_hand_size(element_counts, target_combination, _factors=None):
+    """
+    一次算出所有手牌数下包含目标组合的抽取方式数
+
+    生成函数：元素e有c个、目标需要t个时，该元素的因子为 Σ_{j≥t} C(c, j)·x^j，
+    所有元素的因子相乘后，x^k 的系数即抽k个元素且包含目标组合的方式数
+
+    返回:
+    列表，第k项为抽k个时的方式数（k = 0 .. 总元素数）
+    """
+    total_elements = sum(element_counts.values())
+    target_count = Counter(target_combination)
+    if any(element not in element_counts for element in target_count):
+        return [0] * (total_elements + 1)
+
+    product = [1]
+    for element, count in element_counts.items():
+        needed = target_count.get(element, 0)
+        if _factors is not None:
+            factor = _factors.get((count, needed))
+            if factor is None:
+                factor = _factors[(count, needed)] = [comb(count, j) if j >= needed else 0 for j in range(count + 1)]
+        else:
+            factor = [comb(count, j) if j >= needed else 0 for j in range(count + 1)]
+        product = _multiply_polynomials(product, factor)
+    return product
+
+def containment_curves(element_counts, target_combinations):
+    """
+    多个目标组合在所有手牌数下的精确包含概率
+
+    参数:
+    element_counts: 字典，各元素的数量
+    target_combinations: 目标组合列表；元素相同、顺序不同的组合只计算一次
+
+    返回:
+    字典 {目标组合: 概率列表}，概率列表第k项为抽k个元素时的概率（k = 0 .. 总元素数）
+    """
+    total_elements = sum(element_counts.values())
+    totals = [comb(total_elements, k) for k in range(total_elements + 1)]
+    factors = {}
+    curves = {}
+    by_multiset = {}
+    for target in target_combinations:
+        key = ''.join(sorted(target))
+        if key not in by_multiset:
+            ways = containment_ways_by_hand_size(element_counts, key, factors)
+            by_multiset[key] = [w / t for w, t in zip(ways, totals)]
+        curves[target] = by_multiset[key]
+    return curves
+
+def all_target_combinations(element_names, size=3):
+    """给定元素的全部size元组合（可重复，如AAB、ABC）"""
+    return [''.join(combo) for combo in itertools.combinations_with_replacement(sorted(element_names), size)]
+
+def print_containment_curves(element_counts, target_combinations, hand_sizes=None):
+    """打印各目标组合随手牌数变化的包含概率"""
+    total_elements = sum(element_counts.values())
+    curves = containment_curves(element_counts, target_combinations)
+    if hand_sizes is None:
+        hand_sizes = range(3, min(total_elements, 10) + 1)
+    print(f"集合配置: {element_counts}")
+    print(f"{'目标':<8}" + ''.join(f"{f'抽{k}个':>9}" for k in hand_sizes))
+    for target, curve in curves.items():
+        print(f"{target:<8}" + ''.join(f"{curve[k]:>10.4f}" for k in hand_sizes))
+
 def hypergeometric_probability(element_counts, target_combination):
     """
     使用超几何分布计算概率（适用于某些特定情况）
@@ -170,6 +249,13 @@ def main():
     # 概率趋势分析
     analyze_probability_trends()
     
+    # 手牌数曲线：一次得到所有手牌数、所有三元素组合的精确概率
+    print(f"\n{'='*60}")
+    print("手牌数-概率曲线（生成函数）")
+    print(f"{'='*60}")
+    curve_counts = {'A': 3, 'B': 3, 'C': 2, 'D': 2, 'E': 2}
+    print_containment_curves(curve_counts, all_target_combinations(curve_counts))
+    
     print(f"\n{'='*60}")
     print("计算完成！")
 
@@ -0,0 +1,474 @@
+import random
+import sys
+import time
+from math import exp, log, sqrt
+
+import battle_simulator
+from battle_simulator import simulate_battle
+from rng_backend import BufferedRandom
+
+# ===========================================
+# 重要性抽样配置
+# ===========================================
+
+CE_SAMPLES_PER_ITERATION = 2000       # 交叉熵每轮迭代的战斗场数
+CE_ELITE_FRACTION = 0.1               # 精英样本比例
+CE_SMOOTHING = 0.5                    # 参数平滑系数（新参数所占比例）
+CE_MAX_STEP = 2.0                     # 每轮迭代牌型权重、击晕概率几率比最多变化的倍数
+CE_MAX_ITERATIONS = 20                # 最大迭代轮数
+CE_REFINE_ITERATIONS = 3              # 阈值到达目标后继续细化参数的最多轮数
+CE_TOLERANCE = 0.05                   # 阈值到达目标后，参数相对变化小于此值即视为收敛
+MAX_TYPE_WEIGHT = 8.0                 # 牌型权重的上下限（相对平均权重 1/8 ~ 8 倍），避免偏置分布收缩到少数路径
+DEFAULT_IS_BATTLES = 5000             # 最终估计使用的战斗场数
+MIN_PROBABILITY = 0.01                # 击晕概率的上下限，避免权重退化
+DEFENSIVE_FRACTION = 0.1              # 按原始分布抽样的战斗比例（防御性混合，似然比不超过其倒数）
+TILT_COMPONENTS = 4                   # 偏置分布的混合成分数（稀有事件常由几种不同的牌序造成，单一偏置只能覆盖其一）
+INITIAL_TILT = 2.0                    # 初始时每个成分偏向的牌型权重
+MIN_COMPONENT_SHARE = 0.05            # 每个混合成分的最低抽样比例
+UNIFORM_SHARE = 0.2                   # 每次洗牌按原始分布抽样的固定比例，偏置成分漏掉的牌序仍能以此比例抽到
+
+MIN_EFFECTIVE_HITS = 50               # 命中样本的有效样本量低于此值时提示估计不可靠
+MAX_WEIGHT_SHARE = 0.2                # 单个样本占估计值的比例超过此值时提示估计不可靠
+
+CARD_TYPES = ('A', 'B', 'D', 'E')
+TILTED_SHUFFLES = 3                   # 前几次洗牌各自使用独立的混合偏置分布，之后共用最后一组
+
+# ===========================================
+
+class RareEvent:
+    """
+    稀有事件：score_fn(回合数, 剩余血量, 是否胜利) >= level 即事件发生
+    score_fn 应在接近事件时取值更高，交叉熵迭代依此逐步逼近事件
+    """
+    def __init__(self, name, score_fn, level):
+        self.name = name
+        self.score_fn = score_fn
+        self.level = level
+
+    def score(self, outcome):
+        return self.score_fn(*outcome)
+
+def long_fight_event(min_turns=10):
+    """怪物存活至少 min_turns 回合"""
+    return RareEvent(f"战斗持续{min_turns}回合以上", lambda turns, hp, won: turns, min_turns)
+
+def early_death_event(max_turns=3):
+    """玩家在第 max_turns 回合及之前死亡；未死亡时剩余血量越低越接近事件"""
+    def score(turns, hp, won):
+        return 100 - turns if not won else -hp
+    return RareEvent(f"玩家在第{max_turns}回合前死亡", score, 100 - max_turns)
+
+class TiltComponent:
+    """一次洗牌的偏置分布的一个混合成分：抽样比例、牌型权重、此后击晕判定的概率"""
+    def __init__(self, share=1.0, type_weights=None, stun_prob=None, fixed=False):
+        self.share = share
+        self.type_weights = type_weights or {card_type: 1.0 for card_type in CARD_TYPES}
+        self.stun_prob = stun_prob
+        self.fixed = fixed                    # 固定成分不参与交叉熵更新
+
+def uniform_mixture():
+    """不偏置的偏置分布：每次洗牌一个均匀成分"""
+    return [[TiltComponent()] for _ in range(TILTED_SHUFFLES)]
+
+class Epoch:
+    """
+    一次洗牌及其后到下一次洗牌前的击晕判定。每个阶段独立地按比例选一个混合成分抽样，
+    因此原始分布相对偏置分布的似然比是各阶段似然比的乘积
+    """
+    def __init__(self, slot, components, component):
+        self.slot = slot
+        self.components = components
+        self.component = component            # 抽样使用的成分，按原始分布抽样时为None
+        self.log_weights = [0.0] * len(components)   # log(原始分布/第k个成分)
+        self.chosen = {card_type: 0 for card_type in CARD_TYPES}
+        self.exposure = [{card_type: 0.0 for card_type in CARD_TYPES} for _ in components]
+        self.stuns = 0
+        self.stun_rolls = 0
+
+    def _log_densities(self):
+        """各成分的 log(抽样比例 × 成分分布/原始分布)"""
+        total = sum(component.share for component in self.components)
+        return [log(component.share / total) - min(log_weight, 700.0)
+                for component, log_weight in zip(self.components, self.log_weights)]
+
+    def log_ratio(self):
+        """log(这一阶段的混合分布/原始分布)"""
+        values = self._log_densities()
+        top = max(values)
+        return top + log(sum(exp(value - top) for value in values))
+
+    def responsibilities(self):
+        """这一阶段来自各成分的后验概率（交叉熵的EM更新使用）"""
+        values = self._log_densities()
+        top = max(values)
+        values = [exp(value - top) for value in values]
+        total = sum(values)
+        return [value / total for value in values]
+
+class TiltedRNG:
+    """
+    偏置随机数源：每次洗牌按比例选一个混合成分，按其牌型权重的Plackett-Luce分布洗牌，
+    到下一次洗牌前按其击晕概率判定击晕，同时累计原始分布（均匀洗牌、原始击晕概率）相对每个成分的对数似然比。
+    每场战斗以 defensive 的概率改按原始分布抽样，最终权重取原始分布相对整个混合分布的似然比
+    """
+    def __init__(self, mixture=None, defensive=DEFENSIVE_FRACTION, seed=None):
+        self.mixture = mixture or uniform_mixture()
+        self.defensive = defensive
+        self._random = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        """开始新一场战斗"""
+        self.sample_nominal = self._random.random() < self.defensive
+        self.epochs = []
+
+    def mixture_weight(self):
+        """原始分布相对混合抽样分布的似然比"""
+        log_ratio = min(sum(epoch.log_ratio() for epoch in self.epochs), 700.0)
+        return 1.0 / (self.defensive + (1 - self.defensive) * exp(log_ratio))
+
+    def _start_epoch(self):
+        components = self.mixture[min(len(self.epochs), TILTED_SHUFFLES - 1)]
+        component = None
+        if not self.sample_nominal:
+            target = self._random.random() * sum(c.share for c in components)
+            for component in components:
+                target -= component.share
+                if target < 0:
+                    break
+        epoch = Epoch(len(self.epochs), components, component)
+        self.epochs.append(epoch)
+        return epoch
+
+    def shuffle(self, cards):
+        """
+        依次抽出下一张被摸到的牌（牌库从末尾摸牌），
+        每步选中牌型t的概率为 n_t·w_t / Σ n·w，同型牌之间均匀
+        """
+        epoch = self._start_epoch()
+        sampling_weights = None if epoch.component is None else epoch.component.type_weights
+        all_weights = [component.type_weights for component in epoch.components]
+        log_weights = epoch.log_weights
+        draw = self._random.random
+
+        by_type = {}
+        for card in cards:
+            by_type.setdefault(card.name, []).append(card)
+        for group in by_type.values():
+            self._random.shuffle(group)
+
+        draw_order = []
+        remaining = len(cards)
+        while remaining > 0:
+            available = [(card_type, len(group)) for card_type, group in by_type.items() if group]
+            if sampling_weights is None:
+                target = draw() * remaining
+            else:
+                target = draw() * sum(n * sampling_weights[t] for t, n in available)
+            chosen_type = available[-1][0]  # 浮点误差兜底
+            for card_type, n in available:
+                target -= n * (1.0 if sampling_weights is None else sampling_weights[card_type])
+                if target < 0:
+                    chosen_type = card_type
+                    break
+
+            for k, type_weights in enumerate(all_weights):
+                total_weight = sum(n * type_weights[t] for t, n in available)
+                # MM算法的充分统计量：Σ n_t / W
+                exposure = epoch.exposure[k]
+                for card_type, n in available:
+                    exposure[card_type] += n / total_weight
+                log_weights[k] += log(total_weight / (remaining * type_weights[chosen_type]))
+
+            epoch.chosen[chosen_type] += 1
+            draw_order.append(by_type[chosen_type].pop())
+            remaining -= 1
+
+        draw_order.reverse()
+        cards[:] = draw_order
+
+    def random(self):
+        """击晕判定：以偏置概率返回落在击晕区间内的随机数"""
+        nominal = battle_simulator.CARD_D_STUN_CHANCE
+        draw = self._random.random
+        if not self.epochs:
+            return draw()
+        epoch = self.epochs[-1]
+        tilted = [nominal if component.stun_prob is None else component.stun_prob
+                  for component in epoch.components]
+        if epoch.component is None or epoch.component.stun_prob is None:
+            sampling = nominal
+        else:
+            sampling = epoch.component.stun_prob
+        epoch.stun_rolls += 1
+        stunned = draw() < sampling
+        for k, probability in enumerate(tilted):
+            if stunned:
+                epoch.log_weights[k] += log(nominal / probability)
+            else:
+                epoch.log_weights[k] += log((1 - nominal) / (1 - probability))
+        if stunned:
+            epoch.stuns += 1
+            return draw() * nominal
+        return nominal + draw() * (1 - nominal)
+
+def _run_tilted_battles(num_battles, rng):
+    """用偏置随机数源模拟，返回每场的(结果, 似然比, 各阶段记录)"""
+    samples = []
+    for _ in range(num_battles):
+        rng.reset()
+        outcome = simulate_battle(rng=rng)
+        samples.append((outcome, rng.mixture_weight(), rng.epochs))
+    return samples
+
+def _bounded_step(old, new):
+    """限制单轮更新的倍数，再与旧值平滑，避免参数在迭代间来回振荡"""
+    new = min(old * CE_MAX_STEP, max(old / CE_MAX_STEP, new))
+    return CE_SMOOTHING * new + (1 - CE_SMOOTHING) * old
+
+def _update_stun_prob(stun_prob, target):
+    """击晕概率在几率比上限制步长并平滑"""
+    odds = _bounded_step(stun_prob / (1 - stun_prob), target / (1 - target))
+    return min(1 - MIN_PROBABILITY, max(MIN_PROBABILITY, odds / (1 + odds)))
+
+def initial_mixture(count=TILT_COMPONENTS):
+    """
+    初始混合成分：一个固定的原始分布成分（比例 UNIFORM_SHARE），其余等比例，
+    第k个成分偏向第k种牌，使各成分在EM更新中分别追踪不同的牌序
+    """
+    mixture = []
+    for _ in range(TILTED_SHUFFLES):
+        components = [TiltComponent(UNIFORM_SHARE, fixed=True)]
+        for k in range(count):
+            component = TiltComponent((1 - UNIFORM_SHARE) / count, stun_prob=battle_simulator.CARD_D_STUN_CHANCE)
+            if count > 1:
+                component.type_weights[CARD_TYPES[k % len(CARD_TYPES)]] = INITIAL_TILT
+            components.append(component)
+        mixture.append(components)
+    return mixture
+
+def _update_slot(components, statistics):
+    """
+    用一个洗牌位置上的加权统计量更新其混合成分（Plackett-Luce的MM更新：w_t = Σ选中次数 / Σ(n_t/W)）
+
+    statistics[k]: [权重和, 各牌型选中次数, 各牌型暴露量, 击晕次数, 击晕判定次数]，均已按似然比×后验概率加权
+
+    返回:
+    参数的最大相对变化
+    """
+    change = 0.0
+    total = sum(stat[0] for stat in statistics)
+    if total <= 0:
+        return change
+    for component, (weight, chosen, exposure, stuns, rolls) in zip(components, statistics):
+        if component.fixed:
+            continue
+        type_weights = component.type_weights
+        new_weights = {}
+        for card_type in CARD_TYPES:
+            if chosen[card_type] > 0 and exposure[card_type] > 0:
+                new_weights[card_type] = chosen[card_type] / exposure[card_type]
+            else:
+                new_weights[card_type] = type_weights[card_type]
+        scale = sum(new_weights.values()) / len(new_weights)
+        updated = {}
+        for card_type in CARD_TYPES:
+            target = min(MAX_TYPE_WEIGHT, max(1 / MAX_TYPE_WEIGHT, new_weights[card_type] / scale))
+            updated[card_type] = _bounded_step(type_weights[card_type], target)
+        scale = sum(updated.values()) / len(updated)
+        for card_type in CARD_TYPES:
+            value = updated[card_type] / scale
+            change = max(change, abs(value / type_weights[card_type] - 1))
+            type_weights[card_type] = value
+
+        if rolls > 0:
+            stun_prob = battle_simulator.CARD_D_STUN_CHANCE if component.stun_prob is None else component.stun_prob
+            target = min(1 - MIN_PROBABILITY, max(MIN_PROBABILITY, stuns / rolls))
+            updated = _update_stun_prob(stun_prob, target)
+            change = max(change, abs(updated / stun_prob - 1))
+            component.stun_prob = updated
+
+        share = _bounded_step(component.share, max(MIN_COMPONENT_SHARE, weight / total))
+        change = max(change, abs(share / component.share - 1))
+        component.share = share
+
+    fixed_share = sum(component.share for component in components if component.fixed)
+    total_share = sum(component.share for component in components if not component.fixed)
+    for component in components:
+        if not component.fixed:
+            component.share *= (1 - fixed_share) / total_share
+    return change
+
+def _slot_statistics(mixture, elite):
+    """按洗牌位置和成分汇总精英样本的加权统计量"""
+    statistics = [[[0.0, {t: 0.0 for t in CARD_TYPES}, {t: 0.0 for t in CARD_TYPES}, 0.0, 0.0]
+                   for _ in components] for components in mixture]
+    for _, weight, epochs in elite:
+        for epoch in epochs:
+            slot = min(epoch.slot, TILTED_SHUFFLES - 1)
+            for k, responsibility in enumerate(epoch.responsibilities()):
+                factor = weight * responsibility
+                stat = statistics[slot][k]
+                stat[0] += factor
+                for card_type in CARD_TYPES:
+                    stat[1][card_type] += factor * epoch.chosen[card_type]
+                    stat[2][card_type] += factor * epoch.exposure[k][card_type]
+                stat[3] += factor * epoch.stuns
+                stat[4] += factor * epoch.stun_rolls
+    return statistics
+
+def cross_entropy_search(event, samples_per_iteration=CE_SAMPLES_PER_ITERATION,
+                         elite_fraction=CE_ELITE_FRACTION, max_iterations=CE_MAX_ITERATIONS,
+                         components=TILT_COMPONENTS, seed=0, verbose=True):
+    """
+    自适应交叉熵：逐轮提高中间阈值，用精英样本（按似然比加权）以EM方式更新每次洗牌的混合偏置分布：
+    每个阶段按其来自各成分的后验概率分摊给各成分，分别更新牌型权重、击晕概率和抽样比例
+
+    每轮的更新限制在 CE_MAX_STEP 倍以内并平滑，牌型权重限制在 MAX_TYPE_WEIGHT 倍范围内；
+    阈值到达事件水平后，参数变化小于 CE_TOLERANCE 或细化轮数用完即停止
+
+    返回:
+    (各洗牌位置的混合成分列表, 使用的战斗场数)
+    """
+    mixture = initial_mixture(components)
+    threshold = None
+    refine_left = CE_REFINE_ITERATIONS
+
+    battles_used = 0
+
+    for iteration in range(max_iterations):
+        rng = TiltedRNG(mixture, seed=seed * 1000003 + iteration)
+        battles_used += samples_per_iteration
+        samples = _run_tilted_battles(samples_per_iteration, rng)
+        scores = sorted(event.score(sample[0]) for sample in samples)
+        quantile = scores[int((1 - elite_fraction) * (len(scores) - 1))]
+        if threshold is not None and quantile <= threshold:
+            # 回合数等离散得分常有大量并列，分位数不动时推进到下一个出现过的得分
+            higher = [score for score in scores if score > threshold]
+            quantile = higher[0] if higher else threshold
+        threshold = min(event.level, quantile)
+        elite = [sample for sample in samples if event.score(sample[0]) >= threshold]
+
+        change = 0.0
+        for slot_components, statistics in zip(mixture, _slot_statistics(mixture, elite)):
+            change = max(change, _update_slot(slot_components, statistics))
+
+        if verbose:
+            print(f"第{iteration + 1}轮: 阈值 {threshold}, 参数变化 {change:.1%}")
+            for slot, slot_components in enumerate(mixture):
+                text = ' | '.join(f"{c.share:.2f}×(" + ' '.join(f"{t}:{w:.2f}" for t, w in c.type_weights.items())
+                                  + f" 晕:{c.stun_prob:.2f})" for c in slot_components if not c.fixed)
+                print(f"    第{slot + 1}次洗牌: {text}")
+
+        if threshold >= event.level:
+            if refine_left == 0 or change < CE_TOLERANCE:
+                break
+            refine_left -= 1
+
+    return mixture, battles_used
+
+def importance_sampling_estimate(event, num_battles=DEFAULT_IS_BATTLES, seed=0, verbose=True):
+    """
+    先用交叉熵寻找偏置分布，再用似然比加权得到事件概率的无偏估计
+
+    返回:
+    字典: probability（概率估计）、relative_error（相对误差）、battles（含交叉熵迭代的总战斗场数）、
+    hits（命中场数）、effective_hits（命中样本按权重计的有效样本量 (Σw)²/Σw²）、
+    max_weight_share（权重最大的单个样本占估计值的比例）、reliable（诊断是否通过）
+    """
+    mixture, search_battles = cross_entropy_search(event, seed=seed, verbose=verbose)
+    rng = TiltedRNG(mixture, seed=seed * 1000003 + CE_MAX_ITERATIONS)
+    samples = _run_tilted_battles(num_battles, rng)
+
+    values = [weight if event.score(outcome) >= event.level else 0.0
+              for outcome, weight, *_ in samples]
+    hit_weights = [v for v in values if v > 0]
+    total = sum(hit_weights)
+    probability = total / num_battles
+    if probability > 0:
+        variance = sum((v - probability) ** 2 for v in values) / (num_battles - 1)
+        relative_error = sqrt(variance / num_battles) / probability
+        effective_hits = total * total / sum(v * v for v in hit_weights)
+        max_weight_share = max(hit_weights) / total
+    else:
+        relative_error = float('inf')
+        effective_hits = 0.0
+        max_weight_share = 1.0
+
+    return {
+        'probability': probability,
+        'relative_error': relative_error,
+        'battles': search_battles + num_battles,
+        'hits': len(hit_weights),
+        'effective_hits': effective_hits,
+        'max_weight_share': max_weight_share,
+        'reliable': effective_hits >= MIN_EFFECTIVE_HITS and max_weight_share <= MAX_WEIGHT_SHARE,
+    }
+
+def naive_estimate(event, num_battles, seed=0):
+    """普通蒙特卡罗估计，用于对比"""
+    rng = BufferedRandom(seed)
+    hits = sum(1 for _ in range(num_battles) if event.score(simulate_battle(rng=rng)) >= event.level)
+    probability = hits / num_battles
+    relative_error = sqrt((1 - probability) / (probability * num_battles)) if hits else float('inf')
+    return probability, relative_error
+
+def print_estimate(result):
+    """打印重要性抽样结果及权重诊断"""
+    print(f"估计概率: {result['probability']:.3e}")
+    print(f"相对误差: {result['relative_error']*100:.2f}%")
+    print(f"命中场数: {result['hits']}，有效命中数: {result['effective_hits']:.1f}，"
+          f"最大单样本占比: {result['max_weight_share']:.1%}")
+    print(f"总战斗场数: {result['battles']}")
+    if not result['reliable']:
+        print(f"警告: 估计只由少数高权重样本决定（有效命中数应不少于{MIN_EFFECTIVE_HITS}、"
+              f"最大单样本占比应不超过{MAX_WEIGHT_SHARE:.0%}），相对误差不可信，"
+              f"请增加战斗场数或换用更接近事件的得分函数")
+
+def check_against_naive(event, naive_battles, num_battles=DEFAULT_IS_BATTLES, seed=0, verbose=True):
+    """
+    在普通蒙特卡罗能算准的事件上检验重要性抽样：两者之差应在合并标准误差的3倍以内
+
+    返回:
+    (是否通过, 重要性抽样结果, 普通蒙特卡罗概率)
+    """
+    result = importance_sampling_estimate(event, num_battles, seed=seed, verbose=False)
+    naive_probability, naive_relative_error = naive_estimate(event, naive_battles, seed=seed + 1)
+    error = sqrt((result['probability'] * result['relative_error']) ** 2 +
+                 (naive_probability * naive_relative_error) ** 2)
+    passed = abs(result['probability'] - naive_probability) <= 3 * error
+    if verbose:
+        print(f"重要性抽样: {result['probability']:.3e} ± {result['probability'] * result['relative_error']:.1e}"
+              f"（{result['battles']}场）")
+        print(f"普通蒙特卡罗: {naive_probability:.3e} ± {naive_probability * naive_relative_error:.1e}"
+              f"（{naive_battles}场）")
+        print(f"差异 {abs(result['probability'] - naive_probability) / error:.2f} 个标准误差，"
+              f"{'通过' if passed else '未通过'}")
+    return passed, result, naive_probability
+
+def main():
+    """估计默认数值下战斗持续4回合以上的概率（--check 时与普通蒙特卡罗对照）"""
+    seed = 0
+    event = long_fight_event(4)
+
+    if '--check' in sys.argv:
+        print(f"=== 对照检验: {event.name} ===")
+        passed, _, _ = check_against_naive(event, naive_battles=1000000, seed=seed)
+        sys.exit(0 if passed else 1)
+
+    print(f"=== 重要性抽样: {event.name} ===")
+    start_time = time.time()
+    result = importance_sampling_estimate(event, seed=seed)
+    elapsed = time.time() - start_time
+
+    print()
+    print_estimate(result)
+    print(f"计算用时: {elapsed:.3f}秒")
+
+    probability, relative_error = result['probability'], result['relative_error']
+    if probability > 0 and result['reliable']:
+        needed = (1 - probability) / (probability * relative_error ** 2)
+        print(f"普通蒙特卡罗达到相同相对误差约需 {needed:,.0f} 场战斗")
+
+if __name__ == "__main__":
+    main()
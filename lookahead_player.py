@@ -0,0 +1,346 @@
+import random
+import time
+from math import comb
+
+import battle_simulator
+from battle_simulator import CARD_LAYOUT, Player, simulate_battle
+from packed_multiset import FIELD_BITS, FIELD_MAX
+
+# ===========================================
+# 前瞻玩家配置
+# ===========================================
+
+LOOKAHEAD_DEPTH = 2                   # 搜索的回合数（1 = 只看本回合结果）
+WIN_HP_BONUS = 0.1                    # 胜利时按剩余血量比例追加的价值（在胜率相同的出牌之间偏向保血）
+LEAF_DISCOUNT = 0.95                  # 搜索末端局面的估值折扣（确定的胜利优于估计的优势）
+HEURISTIC_DAMAGE_PER_TURN = 8         # 估值时假设的每回合输出伤害
+TRANSPOSITION_TABLE_MAX_ENTRIES = 2000000   # 置换表条目上限，超出后清空重建
+DEFAULT_COMPARISON_BATTLES = 2000     # 对比启发式玩家时的战斗场数
+COMPARISON_OVERRIDES = {'PLAYER_MAX_HP': 20, 'MONSTER_HP': 30}   # 对比时使用的数值（数值.xlsx中的生命值）
+
+# ===========================================
+#
+# 期望极大搜索：
+#   局面价值 = Σ 抽牌概率 × max(出牌方案) Σ 击晕概率 × 怪物行动后的局面价值
+# 抽牌按牌库（及洗入的弃牌堆）构成的多元超几何分布展开，怪物行动由行动循环位置确定。
+# 局面用整数元组表示（血量、化劲、怪物血量/气力/循环位置、牌库与弃牌堆的打包计数），
+# 作为置换表的键；同一套数值下的所有战斗共用置换表，因此大量模拟时绝大多数局面只需查表。
+
+_SHIFTS = tuple(CARD_LAYOUT.index[name] * FIELD_BITS for name in 'ABDE')
+_UNITS = tuple(CARD_LAYOUT.unit[name] for name in 'ABDE')
+_FIELD_MASK = (1 << FIELD_BITS) - 1
+
+_draw_cache = {}
+_play_cache = {}
+_searches = {}
+
+def _counts(bits):
+    """打包计数 → (A, B, D, E) 的数量"""
+    return tuple((bits >> shift) & _FIELD_MASK for shift in _SHIFTS)
+
+def _draw_outcomes(deck_bits, num):
+    """从牌库中无放回抽num张的全部结果 [(手牌打包计数, 概率)]"""
+    key = (deck_bits, num)
+    outcomes = _draw_cache.get(key)
+    if outcomes is not None:
+        return outcomes
+
+    na, nb, nd, ne = _counts(deck_bits)
+    num = min(num, na + nb + nd + ne)
+    total_ways = comb(na + nb + nd + ne, num)
+    unit_a, unit_b, unit_d, unit_e = _UNITS
+    outcomes = []
+    for a in range(min(na, num) + 1):
+        for b in range(min(nb, num - a) + 1):
+            for d in range(min(nd, num - a - b) + 1):
+                e = num - a - b - d
+                if e > ne:
+                    continue
+                ways = comb(na, a) * comb(nb, b) * comb(nd, d) * comb(ne, e)
+                outcomes.append((a * unit_a + b * unit_b + d * unit_d + e * unit_e, ways / total_ways))
+
+    _draw_cache[key] = outcomes
+    return outcomes
+
+def _plays(hand_bits, max_cards):
+    """手牌能打出的全部方案 [(A, B, D, E)]，打出张数多的在前（估值相同时优先多打）"""
+    key = (hand_bits, max_cards)
+    plays = _play_cache.get(key)
+    if plays is not None:
+        return plays
+
+    ha, hb, hd, he = _counts(hand_bits)
+    plays = []
+    for a in range(min(ha, max_cards) + 1):
+        for b in range(min(hb, max_cards - a) + 1):
+            for d in range(min(hd, max_cards - a - b) + 1):
+                for e in range(min(he, max_cards - a - b - d) + 1):
+                    plays.append((a, b, d, e))
+    plays.sort(key=sum, reverse=True)
+
+    _play_cache[key] = plays
+    return plays
+
+class LookaheadSearch:
+    """一套数值（卡牌效果、怪物数值与行动循环）下的期望极大搜索，内含置换表"""
+    def __init__(self, action_pattern, light_attack_damage, heavy_attack_damage, power_gain):
+        self.action_pattern = tuple(action_pattern)
+        self.light_attack_damage = light_attack_damage
+        self.heavy_attack_damage = heavy_attack_damage
+        self.power_gain = power_gain
+
+        self.max_hp = battle_simulator.PLAYER_MAX_HP
+        self.low_hp_threshold = battle_simulator.PLAYER_LOW_HP_THRESHOLD
+        self.ab_damage = battle_simulator.CARD_AB_DAMAGE
+        self.ab_armor = battle_simulator.CARD_AB_ARMOR
+        self.d_damage = battle_simulator.CARD_D_DAMAGE
+        self.stun_chance = battle_simulator.CARD_D_STUN_CHANCE
+        self.e_armor = battle_simulator.CARD_E_ARMOR
+        self.aab_bonus = battle_simulator.AAB_COMBO_BONUS_DAMAGE
+        self.aad_bonus = battle_simulator.AAD_COMBO_BONUS_DAMAGE
+        self.cards_per_turn = battle_simulator.CARDS_DRAW_PER_TURN
+        self.max_cards = battle_simulator.MAX_CARDS_PLAY_PER_TURN
+
+        # 估值用：每回合平均的攻击伤害与攻击行动占比
+        attacks = [action for action in self.action_pattern if action in (0, 1)]
+        self.attack_share = len(attacks) / len(self.action_pattern)
+        self.attack_per_turn = sum(light_attack_damage if action == 0 else heavy_attack_damage
+                                   for action in attacks) / len(self.action_pattern)
+
+        self.table = {}
+        self.option_cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def signature(monster):
+        """决定搜索结果的全部数值，用于在战斗之间共用同一个搜索（及置换表）"""
+        pattern = monster.action_pattern or range(battle_simulator.MONSTER_ACTION_COUNT)
+        return (tuple(pattern), monster.light_attack_damage, monster.heavy_attack_damage,
+                monster.power_gain) + tuple(getattr(battle_simulator, name) for name in (
+                    'PLAYER_MAX_HP', 'PLAYER_LOW_HP_THRESHOLD', 'CARD_AB_DAMAGE', 'CARD_AB_ARMOR',
+                    'CARD_D_DAMAGE', 'CARD_D_STUN_CHANCE', 'CARD_E_ARMOR', 'AAB_COMBO_BONUS_DAMAGE',
+                    'AAD_COMBO_BONUS_DAMAGE', 'CARDS_DRAW_PER_TURN', 'MAX_CARDS_PLAY_PER_TURN'))
+
+    def win_value(self, hp):
+        return 1.0 + WIN_HP_BONUS * hp / self.max_hp
+
+    def estimate(self, hp, armor, monster_hp, power):
+        """搜索末端的估值：按剩余回合数估计将受到的伤害，折算为存活余量"""
+        turns_left = monster_hp / HEURISTIC_DAMAGE_PER_TURN
+        incoming = turns_left * (self.attack_per_turn + self.attack_share * power) - armor
+        safety = hp / (hp + incoming) if incoming > 0 else 1.0
+        return LEAF_DISCOUNT * (safety + WIN_HP_BONUS * hp / self.max_hp)
+
+    def value(self, depth, hp, armor, monster_hp, power, position, deck_bits, discard_bits):
+        """回合开始（抽牌前）局面的期望价值"""
+        if depth == 0:
+            return self.estimate(hp, armor, monster_hp, power)
+
+        key = (depth, hp, armor, monster_hp, power, position, deck_bits, discard_bits)
+        cached = self.table.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        # 抽牌：牌库不足时先抽完牌库，再洗入弃牌堆继续抽
+        deck_size = sum(_counts(deck_bits))
+        if deck_size >= self.cards_per_turn:
+            draws = [(hand, deck_bits - hand, discard_bits, probability)
+                     for hand, probability in _draw_outcomes(deck_bits, self.cards_per_turn)]
+        elif discard_bits:
+            draws = [(deck_bits + hand, discard_bits - hand, 0, probability)
+                     for hand, probability in _draw_outcomes(discard_bits, self.cards_per_turn - deck_size)]
+        else:
+            draws = [(deck_bits, 0, 0, 1.0)]
+
+        total = 0.0
+        for hand_bits, deck_after, discard_after, probability in draws:
+            # 打出的牌与整手牌都进入弃牌堆（与simulate_battle一致），此处先加入整手牌
+            discard_after += hand_bits
+            best = -1.0
+            for option in self.options(hand_bits):
+                q = self.play_value(depth, hp, armor, monster_hp, power, position,
+                                    deck_after, discard_after, option)
+                if q > best:
+                    best = q
+            total += probability * best
+
+        if len(self.table) >= TRANSPOSITION_TABLE_MAX_ENTRIES:
+            self.table.clear()
+        self.table[key] = total
+        return total
+
+    def options(self, hand_bits):
+        """
+        手牌的全部出牌方案及其效果：
+        (方案, 打出的牌的打包计数, 伤害, 化劲, 低血量时的伤害, 低血量时的化劲, 不击晕的概率)
+        """
+        options = self.option_cache.get(hand_bits)
+        if options is not None:
+            return options
+
+        a_unit, b_unit, d_unit, e_unit = _UNITS
+        options = []
+        for play in _plays(hand_bits, self.max_cards):
+            a, b, d, e = play
+            damage = d * self.d_damage
+            if a == 2 and a + b + d + e == 3:
+                if b == 1:
+                    damage += self.aab_bonus
+                elif d == 1:
+                    damage += self.aad_bonus
+            armor = e * self.e_armor
+            options.append((play, a * a_unit + b * b_unit + d * d_unit + e * e_unit,
+                            damage + (a + b) * self.ab_damage, armor,
+                            damage, armor + (a + b) * self.ab_armor,
+                            (1 - self.stun_chance) ** d))
+
+        self.option_cache[hand_bits] = options
+        return options
+
+    def play_value(self, depth, hp, armor, monster_hp, power, position, deck_bits, discard_bits, option):
+        """
+        抽牌后按option出牌（组合按A在前的顺序打出）的期望价值，规则与simulate_battle一致
+        discard_bits 需已包含本回合的整手牌
+        """
+        if hp <= self.low_hp_threshold:
+            damage, armor_gain = option[4], option[5]
+        else:
+            damage, armor_gain = option[2], option[3]
+        armor += armor_gain
+        monster_hp -= damage
+        if monster_hp <= 0:
+            return self.win_value(hp)
+        discard_bits += option[1]
+
+        no_stun = option[6]
+        total = 0.0
+        if no_stun < 1.0:
+            # 击晕：怪物本回合不行动，行动循环不推进
+            if depth > 1:
+                stunned_value = self.value(depth - 1, hp, armor, monster_hp, power,
+                                           position, deck_bits, discard_bits)
+            else:
+                stunned_value = self.estimate(hp, armor, monster_hp, power)
+            total += (1 - no_stun) * stunned_value
+        if no_stun > 0.0:
+            action = self.action_pattern[position]
+            next_position = (position + 1) % len(self.action_pattern)
+            if action == 0 or action == 1:
+                attack = (self.light_attack_damage if action == 0 else self.heavy_attack_damage) + power
+                if attack > armor:
+                    hp -= attack - armor
+                    if hp <= 0:
+                        return total
+                armor = 0
+            elif action == 2:
+                power += self.power_gain
+            if depth > 1:
+                total += no_stun * self.value(depth - 1, hp, armor, monster_hp, power,
+                                              next_position, deck_bits, discard_bits)
+            else:
+                total += no_stun * self.estimate(hp, armor, monster_hp, power)
+        return total
+
+def get_search(monster):
+    """取得（或建立）与怪物及当前数值配置对应的共享搜索"""
+    signature = LookaheadSearch.signature(monster)
+    search = _searches.get(signature)
+    if search is None:
+        search = LookaheadSearch(signature[0], monster.light_attack_damage,
+                                 monster.heavy_attack_damage, monster.power_gain)
+        _searches[signature] = search
+    return search
+
+def clear_transposition_tables():
+    """清空所有共享的置换表与抽牌缓存"""
+    _searches.clear()
+    _draw_cache.clear()
+    _play_cache.clear()
+
+class LookaheadPlayer(Player):
+    """
+    前瞻玩家：根据怪物的行动循环、气力和牌库构成，用期望极大搜索选择出牌
+
+    用法与Player相同，由simulate_battle调用choose_cards_to_play(monster)；
+    搜索得到的是该牌组在模拟规则下的出牌上限，可与启发式玩家的结果对比
+    """
+    def __init__(self, hp=None, card_counts=None, rng=None, depth=LOOKAHEAD_DEPTH):
+        super().__init__(hp=hp, card_counts=card_counts, rng=rng)
+        self.depth = depth
+
+    def choose_cards_to_play(self, monster=None):
+        if not self.hand:
+            return []
+        if monster is None:
+            return super().choose_cards_to_play()
+
+        search = get_search(monster)
+        # 搜索中牌库会继续变大（打出的牌重复进入弃牌堆），超出打包位段上限时退回启发式
+        card_total = len(self.deck) + len(self.discard_pile) + len(self.hand)
+        if card_total + self.depth * search.max_cards > FIELD_MAX:
+            return super().choose_cards_to_play(monster)
+
+        deck_bits = sum(card.unit for card in self.deck)
+        discard_bits = sum(card.unit for card in self.discard_pile) + self.hand_bits
+        position = monster.action_cycle % len(search.action_pattern)
+
+        best_play = None
+        best_value = -1.0
+        for option in search.options(self.hand_bits):
+            q = search.play_value(self.depth, self.hp, self.armor, monster.hp, monster.power, position,
+                                  deck_bits, discard_bits, option)
+            if q > best_value:
+                best_play, best_value = option[0], q
+
+        # 按组合顺序（A在前）从手牌中取出对应的牌
+        cards_to_play = []
+        for name, count in zip('ABDE', best_play):
+            for card in self.hand:
+                if count == 0:
+                    break
+                if card.name == name:
+                    cards_to_play.append(card)
+                    count -= 1
+        return cards_to_play
+
+def compare_players(num_battles=DEFAULT_COMPARISON_BATTLES, depth=LOOKAHEAD_DEPTH, seed=0):
+    """
+    用相同的随机数种子分别模拟启发式玩家与前瞻玩家
+
+    返回:
+    {'heuristic': BattleStats, 'lookahead': BattleStats}
+    """
+    results = {}
+    for label, make_player in (('heuristic', lambda rng: Player(rng=rng)),
+                               ('lookahead', lambda rng: LookaheadPlayer(rng=rng, depth=depth))):
+        stats = battle_simulator.BattleStats()
+        for battle in range(num_battles):
+            rng = random.Random(seed * 1000003 + battle)
+            stats.add(*simulate_battle(make_player(rng), rng=rng))
+        results[label] = stats
+    return results
+
+def main():
+    print(f"=== 启发式玩家 vs 前瞻玩家（搜索 {LOOKAHEAD_DEPTH} 回合）===")
+    print(f"数值: {COMPARISON_OVERRIDES}")
+    start_time = time.time()
+    with battle_simulator.override_constants(**COMPARISON_OVERRIDES):
+        results = compare_players()
+    elapsed = time.time() - start_time
+
+    print(f"{'玩家':<12}{'胜率':>10}{'平均回合':>10}{'平均剩余血量':>14}")
+    for label, name in (('heuristic', '启发式'), ('lookahead', '前瞻')):
+        stats = results[label]
+        print(f"{name:<12}{stats.win_rate*100:>9.2f}%{stats.mean_turns:>10.2f}{stats.mean_hp:>14.2f}")
+
+    hits = sum(search.hits for search in _searches.values())
+    misses = sum(search.misses for search in _searches.values())
+    entries = sum(len(search.table) for search in _searches.values())
+    print(f"\n置换表: {entries} 个局面，命中率 {hits / max(hits + misses, 1) * 100:.1f}%")
+    print(f"计算用时: {elapsed:.3f}秒")
+
+if __name__ == "__main__":
+    main()
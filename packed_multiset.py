@@ -0,0 +1,71 @@
+from collections import Counter
+
+import numpy as np
+
+FIELD_BITS = 8                        # 每种元素占用的位数
+FIELD_MAX = (1 << (FIELD_BITS - 1)) - 1   # 单个位段能存放的最大数量
+NUMPY_MAX_ELEMENTS = 64 // FIELD_BITS     # 打包进一个uint64时最多支持的元素种类
+
+# ===========================================
+# 打包整数多重集：把各元素的数量分别放进一个整数的定宽位段
+#
+# 每个位段 FIELD_BITS 位，最高位作为保护位，其余位存放数量。
+# - 向手牌加入一个元素：hand += unit[元素]
+# - 判断手牌是否包含目标：((hand | guard) - target) & guard == guard
+#   每个位段先置保护位再减去目标数量，数量不足的位段会借走自己的保护位，
+#   且不会向相邻位段借位，因此一次整数运算即可同时比较所有元素，无需分支
+# ===========================================
+
+class MultisetLayout:
+    """元素到位段的映射"""
+    def __init__(self, elements):
+        """elements: 元素名的序列，如 "ABCDE" 或 ['A', 'B', 'D', 'E']"""
+        self.elements = tuple(dict.fromkeys(elements))
+        self.index = {element: i for i, element in enumerate(self.elements)}
+        self.unit = {element: 1 << (i * FIELD_BITS) for i, element in enumerate(self.elements)}
+        self.guard = sum(1 << (i * FIELD_BITS + FIELD_BITS - 1) for i in range(len(self.elements)))
+
+    def pack(self, items):
+        """
+        打包多重集
+
+        items: 元素计数字典（如 {'A': 2, 'B': 1}）或元素序列（如 "AAB"）
+        """
+        counts = items if isinstance(items, dict) else Counter(items)
+        packed = 0
+        for element, count in counts.items():
+            if count > FIELD_MAX:
+                raise ValueError(f"元素 {element} 的数量 ({count}) 超过位段上限 {FIELD_MAX}")
+            packed += count * self.unit[element]
+        return packed
+
+    def unpack(self, packed):
+        """还原为元素计数字典"""
+        mask = (1 << FIELD_BITS) - 1
+        return {element: (packed >> (i * FIELD_BITS)) & mask
+                for i, element in enumerate(self.elements)
+                if (packed >> (i * FIELD_BITS)) & mask}
+
+    def units(self, elements):
+        """把元素序列转换为对应的位段单位列表，抽样后直接求和即得打包手牌"""
+        return [self.unit[element] for element in elements]
+
+    def contains(self, hand, target):
+        """手牌是否包含目标多重集"""
+        return ((hand | self.guard) - target) & self.guard == self.guard
+
+    def contains_array(self, hands, target):
+        """对numpy uint64数组中的每个打包手牌做包含判断"""
+        if len(self.elements) > NUMPY_MAX_ELEMENTS:
+            raise ValueError(f"numpy打包最多支持 {NUMPY_MAX_ELEMENTS} 种元素")
+        guard = np.uint64(self.guard)
+        return ((hands | guard) - np.uint64(target)) & guard == guard
+
+def layout_for(element_counts, target_combination=''):
+    """
+    按集合配置和目标组合中出现的元素建立位段映射
+
+    集合中的元素数量不受位段上限限制：只有手牌和目标会被打包，手牌中每种元素不超过手牌张数，
+    目标的数量由 pack() 检查
+    """
+    return MultisetLayout(list(element_counts) + sorted(set(target_combination) - set(element_counts)))
@@ -1,16 +1,19 @@
-import random
-import itertools
-from collections import Counter
 from math import comb
 import numpy as np
+from packed_multiset import layout_for
+from probability_tables import lookup_containment
+from ranked_enumeration import ContainsAny, count_packed_hands
+from rng_backend import default_rng
 
 class ProbabilityCalculator:
-    def __init__(self, element_counts=None):
+    def __init__(self, element_counts=None, verbose=True):
         """
         初始化概率计算器
         element_counts: 字典，键为元素名，值为该元素的数量
         默认每种元素(A,B,C,D,E)各有2个，总共10个元素
+        verbose: 为False时不打印过程和结果，只返回计算值
         """
+        self.verbose = verbose
         if element_counts is None:
             self.element_counts = {'A': 2, 'B': 2, 'C': 2, 'D': 2, 'E': 2}
         else:
@@ -24,9 +27,14 @@ class ProbabilityCalculator:
         for element, count in self.element_counts.items():
             self.elements.extend([element] * count)
         
-        print(f"集合配置: {self.element_counts}")
-        print(f"总元素数量: {len(self.elements)}")
-        print(f"完整集合: {self.elements}")
+        # 打包多重集：每个元素对应一个位段单位，抽出的元素求和即为打包后的手牌
+        self.layout = layout_for(self.element_counts, 'ABCDE')
+        self.element_units = self.layout.units(self.elements)
+        
+        if self.verbose:
+            print(f"集合配置: {self.element_counts}")
+            print(f"总元素数量: {len(self.elements)}")
+            print(f"完整集合: {self.elements}")
     
     def _validate_constraints(self):
         """验证约束条件"""
@@ -40,82 +48,88 @@ class ProbabilityCalculator:
         if total < 10:
             raise ValueError(f"总元素数量 ({total}) 小于10")
     
-    def monte_carlo_simulation(self, target_combination, num_trials=100000):
+    def monte_carlo_simulation(self, target_combination, num_trials=100000, rng=None):
         """
         使用蒙特卡罗模拟计算概率
         target_combination: 目标组合，如 "AAB"
         num_trials: 模拟次数
+        rng: 随机数源（需提供sample方法），默认使用rng_backend的共享缓冲随机数源
         """
-        print(f"\n=== 蒙特卡罗模拟 ===")
-        print(f"目标组合: {target_combination}")
-        print(f"模拟次数: {num_trials}")
-        
-        # 将目标组合转换为计数字典
-        target_count = Counter(target_combination)
+        if self.verbose:
+            print(f"\n=== 蒙特卡罗模拟 ===")
+            print(f"目标组合: {target_combination}")
+            print(f"模拟次数: {num_trials}")
+        
+        # 将目标组合转换为打包计数
+        target = self._pack_target(target_combination)
+        guard = self.layout.guard
+        sample = (rng or default_rng()).sample
         success_count = 0
         
         for _ in range(num_trials):
             # 随机抽取5个元素
-            sample = random.sample(self.elements, 5)
-            sample_count = Counter(sample)
+            hand = sum(sample(self.element_units, 5))
             
             # 检查是否包含目标组合
-            if self._contains_combination(sample_count, target_count):
+            if ((hand | guard) - target) & guard == guard:
                 success_count += 1
         
         probability = success_count / num_trials
-        print(f"成功次数: {success_count}")
-        print(f"模拟概率: {probability:.6f} ({probability*100:.4f}%)")
+        if self.verbose:
+            print(f"成功次数: {success_count}")
+            print(f"模拟概率: {probability:.6f} ({probability*100:.4f}%)")
         
         return probability
     
-    def _contains_combination(self, sample_count, target_count):
-        """检查样本是否包含目标组合"""
-        for element, needed in target_count.items():
-            if sample_count.get(element, 0) < needed:
-                return False
-        return True
+    def _pack_target(self, target_combination):
+        """把目标组合打包；包含集合中没有的元素时重建位段映射"""
+        if any(element not in self.layout.unit for element in target_combination):
+            self.layout = layout_for(self.element_counts, target_combination)
+            self.element_units = self.layout.units(self.elements)
+        return self.layout.pack(target_combination)
+    
+    def _contains_combination(self, hand, target):
+        """检查打包后的样本是否包含打包后的目标组合"""
+        return self.layout.contains(hand, target)
     
     def mathematical_calculation(self, target_combination):
         """
         使用数学方法精确计算概率
         """
-        print(f"\n=== 数学计算方法 ===")
-        print(f"目标组合: {target_combination}")
-        
-        target_count = Counter(target_combination)
-        total_elements = len(self.elements)
-        
-        # 计算总的可能抽取方式数
-        total_ways = comb(total_elements, 5)
-        
-        # 计算包含目标组合的方式数
-        success_ways = self._calculate_success_ways(target_count)
+        if self.verbose:
+            print(f"\n=== 数学计算方法 ===")
+            print(f"目标组合: {target_combination}")
+        
+        # 优先查预计算表，表中没有的配置再实时枚举
+        table_result = lookup_containment(self.element_counts, target_combination)
+        if table_result is not None:
+            success_ways, total_ways = table_result
+            if self.verbose:
+                print(f"（结果来自预计算表）")
+        else:
+            target = self._pack_target(target_combination)
+            total_elements = len(self.elements)
+            
+            # 计算总的可能抽取方式数
+            total_ways = comb(total_elements, 5)
+            
+            # 计算包含目标组合的方式数
+            success_ways = self._calculate_success_ways(target)
         
         probability = success_ways / total_ways
         
-        print(f"总的抽取方式数: {total_ways}")
-        print(f"包含目标组合的方式数: {success_ways}")
-        print(f"精确概率: {probability:.6f} ({probability*100:.4f}%)")
+        if self.verbose:
+            print(f"总的抽取方式数: {total_ways}")
+            print(f"包含目标组合的方式数: {success_ways}")
+            print(f"精确概率: {probability:.6f} ({probability*100:.4f}%)")
         
         return probability
     
-    def _calculate_success_ways(self, target_count):
-        """计算包含目标组合的抽取方式数"""
+    def _calculate_success_ways(self, target):
+        """计算包含目标组合（已打包）的抽取方式数"""
         # 这里使用容斥原理来计算
-        # 但对于复杂情况，我们使用枚举方法
-        success_ways = 0
-        
-        # 生成所有可能的5元素组合
-        all_combinations = list(itertools.combinations(range(len(self.elements)), 5))
-        
-        for combo in all_combinations:
-            selected_elements = [self.elements[i] for i in combo]
-            selected_count = Counter(selected_elements)
-            
-            if self._contains_combination(selected_count, target_count):
-                success_ways += 1
-        
+        # 但对于复杂情况，我们使用枚举方法（逐个生成组合，不在内存中展开全部组合）
+        success_ways, _ = count_packed_hands(self.element_units, 5, ContainsAny(self.layout, [target]))
         return success_ways
     
     def analyze_different_scenarios(self):
@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import struct
+import time
+from math import comb
+
+import numpy as np
+
+# ===========================================
+# 预计算概率表配置
+# ===========================================
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TABLE_PATH = os.path.join(BASE_DIR, 'probability_tables.bin')
+
+TABLE_MAGIC = b'PTABLE01'
+TABLE_ALIGNMENT = 64
+TABLE_KINDS = 5                       # 元素种类数（A、B、C、D、E）
+DEFAULT_MIN_COUNT = 2                 # 每种元素的最少数量
+DEFAULT_MAX_COUNT = 8                 # 每种元素的最多数量
+DEFAULT_HAND_SIZES = (5,)             # 抽取的元素个数
+
+# ===========================================
+#
+# 概率只取决于各元素的数量，与元素名称和顺序无关，因此只为数量非递减排列的配置建表，
+# 查询时把配置和目标按同一顺序重排即可。每个配置、每种抽取数 h 保存两张 (h+1)^5 的表：
+# - 手牌分布：hands[x] = 抽到各元素恰好 x 个的方式数 = Π C(n_i, x_i)（Σx = h）
+# - 包含表：  contains[t] = 抽到的手牌包含目标 t 的方式数 = Σ_{x ≥ t} hands[x]
+#   （沿每一维做反向累加即得）
+# 文件头之后依次存放配置索引网格和各抽取数的两张表，均以numpy视图直接映射，读取时不做计算。
+
+def _aligned(offset):
+    return offset + (-offset % TABLE_ALIGNMENT)
+
+def _sorted_compositions(min_count, max_count):
+    """全部数量非递减的配置"""
+    compositions = [[]]
+    for _ in range(TABLE_KINDS):
+        compositions = [c + [n] for c in compositions
+                        for n in range(c[-1] if c else min_count, max_count + 1)]
+    return [tuple(c) for c in compositions]
+
+def _hand_table(composition, hand_size, index_sum):
+    """某个配置的手牌分布表（各维为每种元素抽到的个数）"""
+    table = np.ones((1,) * TABLE_KINDS, dtype=np.uint64)
+    for axis, count in enumerate(composition):
+        ways = np.array([comb(count, x) for x in range(hand_size + 1)], dtype=np.uint64)
+        shape = [1] * TABLE_KINDS
+        shape[axis] = hand_size + 1
+        table = table * ways.reshape(shape)
+    table[index_sum != hand_size] = 0
+    return table
+
+def _containment_table(hands):
+    """手牌分布表沿每一维反向累加，得到包含表"""
+    table = hands
+    for axis in range(TABLE_KINDS):
+        table = np.flip(np.cumsum(np.flip(table, axis), axis=axis), axis)
+    return table
+
+def build_tables(path=DEFAULT_TABLE_PATH, min_count=DEFAULT_MIN_COUNT, max_count=DEFAULT_MAX_COUNT,
+                 hand_sizes=DEFAULT_HAND_SIZES):
+    """
+    预计算概率表并写入文件
+
+    返回:
+    写入的配置数
+    """
+    compositions = _sorted_compositions(min_count, max_count)
+    radix = max_count - min_count + 1
+    index = np.full((radix,) * TABLE_KINDS, -1, dtype='<i4')
+    for row, composition in enumerate(compositions):
+        index[tuple(n - min_count for n in composition)] = row
+
+    offset = _aligned(index.nbytes)
+    sections = []
+    for hand_size in hand_sizes:
+        # 单元格最大值为总方式数，能放进uint32时用uint32以减小文件
+        largest = comb(TABLE_KINDS * max_count, hand_size)
+        dtype = '<u4' if largest < 2 ** 32 else '<u8'
+        cells = (hand_size + 1) ** TABLE_KINDS
+        size = len(compositions) * cells * np.dtype(dtype).itemsize
+        sections.append({'hand_size': hand_size, 'dtype': dtype, 'cells': cells,
+                         'hands_offset': offset, 'containment_offset': _aligned(offset + size)})
+        offset = _aligned(_aligned(offset + size) + size)
+
+    header = {
+        'version': 1,
+        'kinds': TABLE_KINDS,
+        'min_count': min_count,
+        'max_count': max_count,
+        'rows': len(compositions),
+        'index_offset': 0,
+        'sections': sections,
+    }
+    payload = json.dumps(header).encode('utf-8')
+    padding = -(len(TABLE_MAGIC) + 4 + len(payload)) % TABLE_ALIGNMENT
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(TABLE_MAGIC + struct.pack('<I', len(payload) + padding))
+        f.write(payload + b' ' * padding)
+        data_start = f.tell()
+        f.write(index.tobytes())
+
+        for section in sections:
+            hand_size = section['hand_size']
+            index_sum = np.indices((hand_size + 1,) * TABLE_KINDS).sum(axis=0)
+            hands_tables = [_hand_table(c, hand_size, index_sum) for c in compositions]
+            for key, tables in (('hands_offset', hands_tables),
+                                ('containment_offset', [_containment_table(t) for t in hands_tables])):
+                f.seek(data_start + section[key])
+                for table in tables:
+                    f.write(table.astype(section['dtype']).tobytes())
+    os.replace(tmp_path, path)
+    return len(compositions)
+
+def read_table_header(path):
+    """读取文件头，返回 (头信息字典, 数据区偏移)"""
+    with open(path, 'rb') as f:
+        if f.read(len(TABLE_MAGIC)) != TABLE_MAGIC:
+            raise ValueError(f"{path} 不是预计算概率表文件")
+        (length,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(length).decode('utf-8'))
+    return header, len(TABLE_MAGIC) + 4 + length
+
+class ProbabilityTables:
+    """以只读内存映射打开的预计算概率表"""
+    def __init__(self, path=DEFAULT_TABLE_PATH):
+        header, data_start = read_table_header(path)
+        if header['version'] != 1 or header['kinds'] != TABLE_KINDS:
+            raise ValueError(f"不支持的概率表格式: {header['version']}")
+        self.path = path
+        self.min_count = header['min_count']
+        self.max_count = header['max_count']
+        self.buffer = np.memmap(path, dtype=np.uint8, mode='r')
+
+        radix = self.max_count - self.min_count + 1
+        self.index = np.frombuffer(self.buffer, dtype='<i4', count=radix ** TABLE_KINDS,
+                                   offset=data_start + header['index_offset']).reshape((radix,) * TABLE_KINDS)
+        self.sections = {}
+        for section in header['sections']:
+            shape = (header['rows'],) + (section['hand_size'] + 1,) * TABLE_KINDS
+            count = header['rows'] * section['cells']
+            self.sections[section['hand_size']] = tuple(
+                np.frombuffer(self.buffer, dtype=section['dtype'], count=count,
+                              offset=data_start + section[key]).reshape(shape)
+                for key in ('hands_offset', 'containment_offset'))
+
+    def _locate(self, element_counts, hand_size):
+        """返回 (表所在行, 按数量排序后的元素顺序)；配置不在表中时返回None"""
+        if hand_size not in self.sections or len(element_counts) != TABLE_KINDS:
+            return None
+        order = sorted(element_counts, key=element_counts.get)
+        position = []
+        for element in order:
+            count = element_counts[element]
+            if not self.min_count <= count <= self.max_count:
+                return None
+            position.append(count - self.min_count)
+        row = int(self.index[tuple(position)])
+        return (row, order) if row >= 0 else None
+
+    def hand_distribution(self, element_counts, hand_size=5):
+        """
+        手牌分布表
+
+        返回:
+        (元素顺序, 表视图)，表视图[x1, ..., x5] 为各元素恰好抽到 x 个的方式数；配置不在表中时返回None
+        """
+        located = self._locate(element_counts, hand_size)
+        if located is None:
+            return None
+        row, order = located
+        return order, self.sections[hand_size][0][row]
+
+    def containment_ways(self, element_counts, target_combination, hand_size=5):
+        """
+        包含目标组合的抽取方式数
+
+        返回:
+        (满足条件的方式数, 总方式数)；配置不在表中时返回None
+        """
+        located = self._locate(element_counts, hand_size)
+        if located is None:
+            return None
+        row, order = located
+        total_ways = comb(sum(element_counts.values()), hand_size)
+
+        target = [target_combination.count(element) for element in order]
+        if sum(target) != len(target_combination) or max(target) > hand_size:
+            # 目标中有集合里没有的元素，或需求超过抽取数
+            return 0, total_ways
+        return int(self.sections[hand_size][1][(row, *target)]), total_ways
+
+_loaded_tables = {}
+
+def load_tables(path=DEFAULT_TABLE_PATH):
+    """打开（并缓存）概率表；文件不存在或格式不符时返回None"""
+    if path not in _loaded_tables:
+        try:
+            _loaded_tables[path] = ProbabilityTables(path)
+        except (OSError, ValueError, KeyError):
+            _loaded_tables[path] = None
+    return _loaded_tables[path]
+
+def lookup_containment(element_counts, target_combination, hand_size=5, path=DEFAULT_TABLE_PATH):
+    """
+    查表得到包含目标组合的方式数
+
+    返回:
+    (满足条件的方式数, 总方式数)；没有概率表或查询超出表的范围时返回None，调用方应改为实时计算
+    """
+    tables = load_tables(path)
+    if tables is None:
+        return None
+    return tables.containment_ways(element_counts, target_combination, hand_size)
+
+def main():
+    parser = argparse.ArgumentParser(description="预计算概率表")
+    parser.add_argument('--output', default=DEFAULT_TABLE_PATH)
+    parser.add_argument('--min-count', type=int, default=DEFAULT_MIN_COUNT)
+    parser.add_argument('--max-count', type=int, default=DEFAULT_MAX_COUNT)
+    parser.add_argument('--hand-sizes', type=int, nargs='+', default=list(DEFAULT_HAND_SIZES))
+    args = parser.parse_args()
+
+    start_time = time.time()
+    rows = build_tables(args.output, args.min_count, args.max_count, args.hand_sizes)
+    elapsed = time.time() - start_time
+    print(f"已写入 {args.output}: {rows} 个配置（每种元素 {args.min_count}~{args.max_count} 个），"
+          f"抽取数 {args.hand_sizes}，{os.path.getsize(args.output) / 1e6:.1f}MB")
+    print(f"生成用时: {elapsed:.3f}秒")
+
+    start_time = time.time()
+    success_ways, total_ways = lookup_containment({'A': 3, 'B': 3, 'C': 2, 'D': 2, 'E': 2}, "AAB",
+                                                  args.hand_sizes[0], args.output)
+    elapsed = time.time() - start_time
+    print(f"\n示例查询 A:3 B:3 C:2 D:2 E:2 包含AAB: {success_ways} / {total_ways} = "
+          f"{success_ways / total_ways:.6f}（{elapsed * 1000:.3f}毫秒，含打开文件）")
+
+if __name__ == "__main__":
+    main()
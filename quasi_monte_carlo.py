@@ -0,0 +1,239 @@
+import sys
+import time
+from math import comb, sqrt
+
+import numpy as np
+
+from battle_simulator import BattleStats, override_constants, run_battles
+from exact_probability import containment_ways_by_hand_size
+from probability_calculator import ProbabilityCalculator
+from rng_backend import BufferedRandom
+
+# ===========================================
+# 拟蒙特卡罗配置
+# ===========================================
+
+DEFAULT_REPLICATES = 16               # 独立随机化（重新加扰）的次数，用于估计误差
+BATTLE_DIMENSIONS = 16                # 每场战斗使用低差异点的前多少个随机数，之后改用伪随机数
+POINT_BLOCK_SIZE = 4096               # 每次批量生成的低差异点数
+DIGIT_BITS = 32                       # 每个坐标展开的精度（二进制位数）
+
+PROBABILITY_SAMPLE_SIZES = (500, 2000, 8000, 32000)
+BATTLE_SAMPLE_SIZES = (1000, 4000, 16000)
+
+# ===========================================
+#
+# 加扰Halton序列：第d维以第d个素数b为基数，把点的编号n写成b进制，
+# 每一位数字经过该位专属的随机排列后再反转到小数点之后。
+# 排列随种子变化，每个种子都是一个独立的随机化副本：单个副本内的点低差异、均匀铺满单位立方体，
+# 副本之间相互独立、各自无偏，副本估计值的样本标准差即可给出误差。
+#
+# 抽样与洗牌都是逐位使用均匀数的 Fisher-Yates（第i步取 int(u·剩余个数)），
+# 所以一个低差异点的各坐标就依次决定了抽到的元素或洗牌结果。
+
+def _primes(count):
+    primes = []
+    candidate = 2
+    while len(primes) < count:
+        if all(candidate % p for p in primes if p * p <= candidate):
+            primes.append(candidate)
+        candidate += 1
+    return primes
+
+class ScrambledHalton:
+    """随机数字排列加扰的Halton序列"""
+    def __init__(self, dimensions, seed=None):
+        self.dimensions = dimensions
+        self.bases = _primes(dimensions)
+        generator = np.random.default_rng(seed)
+        self.permutations = []
+        for base in self.bases:
+            digits = int(np.ceil(DIGIT_BITS / np.log2(base)))
+            self.permutations.append(np.array([generator.permutation(base) for _ in range(digits)]))
+
+    def points(self, start, count):
+        """第 start .. start+count-1 个点，形状为 (count, dimensions)"""
+        result = np.empty((count, self.dimensions))
+        for dim, (base, permutations) in enumerate(zip(self.bases, self.permutations)):
+            index = np.arange(start, start + count, dtype=np.int64)
+            value = np.zeros(count)
+            scale = 1.0 / base
+            for permutation in permutations:
+                index, digit = np.divmod(index, base)
+                value += permutation[digit] * scale
+                scale /= base
+            result[:, dim] = value
+        return result
+
+class QuasiRandomSource:
+    """
+    以低差异点为随机数的随机数源（提供random、shuffle、sample，可直接作为各模拟函数的rng参数）
+
+    per_call=True 时每次sample调用使用一个新的点（用于蒙特卡罗抽样函数）；
+    否则由调用方在每场战斗前调用 next_point()（battle_simulator 的 run_battles、run_simulation 会自动调用），
+    未调用过 next_point 就取随机数时报错，避免不知不觉退化为伪随机数。一个点的坐标用完后改用伪随机数补足
+    """
+    def __init__(self, dimensions, seed=None, per_call=True):
+        self.sequence = ScrambledHalton(dimensions, seed)
+        self.dimensions = dimensions
+        self.per_call = per_call
+        self.fallback = BufferedRandom(seed)
+        self._generated = 0
+        self._rows = iter(())
+        self._point = []
+        self._index = dimensions
+
+    def next_point(self):
+        """切换到序列中的下一个点"""
+        row = next(self._rows, None)
+        if row is None:
+            self._rows = iter(self.sequence.points(self._generated, POINT_BLOCK_SIZE).tolist())
+            self._generated += POINT_BLOCK_SIZE
+            row = next(self._rows)
+        self._point = row
+        self._index = 0
+
+    def random(self):
+        index = self._index
+        if index < self.dimensions:
+            self._index = index + 1
+            return self._point[index]
+        if not self._point and not self.per_call:
+            raise RuntimeError("per_call=False 时需在每场战斗前调用 next_point()，"
+                               "请使用 run_battles/run_simulation 或自行调用")
+        return self.fallback.random()
+
+    def shuffle(self, x):
+        """Fisher-Yates：从最后一张牌开始依次确定每个位置"""
+        draw = self.random
+        for i in range(len(x) - 1, 0, -1):
+            j = int(draw() * (i + 1))
+            x[i], x[j] = x[j], x[i]
+
+    def sample(self, population, k):
+        if self.per_call:
+            self.next_point()
+        pool = list(population)
+        n = len(pool)
+        if not 0 <= k <= n:
+            raise ValueError("抽取数量超出总体大小")
+        draw = self.random
+        for i in range(k):
+            j = i + int(draw() * (n - i))
+            pool[i], pool[j] = pool[j], pool[i]
+        return pool[:k]
+
+def _replicate_summary(estimates):
+    """副本估计值的均值与标准误差"""
+    estimates = np.asarray(estimates, dtype=float)
+    return float(estimates.mean()), float(estimates.std(ddof=1) / sqrt(len(estimates)))
+
+def containment_probability(element_counts, target_combination, num_samples, replicates=DEFAULT_REPLICATES,
+                            seed=0, quasi=True):
+    """
+    用拟蒙特卡罗（quasi=False时为普通蒙特卡罗）估计抽5个元素包含目标组合的概率
+
+    总样本数num_samples平均分给replicates个独立副本
+
+    返回:
+    (估计值, 标准误差, 各副本估计值列表)
+    """
+    calculator = ProbabilityCalculator(element_counts, verbose=False)
+    per_replicate = max(1, num_samples // replicates)
+    estimates = []
+    for replicate in range(replicates):
+        replicate_seed = seed * 1000003 + replicate
+        rng = QuasiRandomSource(5, replicate_seed) if quasi else BufferedRandom(replicate_seed)
+        estimates.append(calculator.monte_carlo_simulation(target_combination, per_replicate, rng=rng))
+    mean, error = _replicate_summary(estimates)
+    return mean, error, estimates
+
+def battle_statistics(num_battles, replicates=DEFAULT_REPLICATES, seed=0, quasi=True,
+                      dimensions=BATTLE_DIMENSIONS, overrides=None):
+    """
+    用拟蒙特卡罗（quasi=False时为普通蒙特卡罗）模拟战斗，每场战斗使用一个低差异点
+
+    返回:
+    (合并的BattleStats, {指标: (估计值, 标准误差)})
+    """
+    per_replicate = max(1, num_battles // replicates)
+    total = BattleStats()
+    estimates = {'win_rate': [], 'mean_turns': [], 'mean_hp': []}
+    with override_constants(**(overrides or {})):
+        for replicate in range(replicates):
+            replicate_seed = seed * 1000003 + replicate
+            if quasi:
+                rng = QuasiRandomSource(dimensions, replicate_seed, per_call=False)
+            else:
+                rng = BufferedRandom(replicate_seed)
+            # run_battles 在每场战斗前调用 rng.next_point()
+            stats = run_battles(per_replicate, rng)
+            total.merge(stats)
+            for metric, values in estimates.items():
+                values.append(getattr(stats, metric))
+    return total, {metric: _replicate_summary(values) for metric, values in estimates.items()}
+
+def probability_convergence(element_counts, target_combination, sample_sizes=PROBABILITY_SAMPLE_SIZES,
+                            replicates=DEFAULT_REPLICATES, seed=0):
+    """
+    概率估计的经验收敛：各样本量下普通蒙特卡罗与拟蒙特卡罗相对精确值的均方根误差
+
+    返回:
+    (精确值, [(样本量, 蒙特卡罗RMSE, 拟蒙特卡罗RMSE)])
+    """
+    total_elements = sum(element_counts.values())
+    exact = containment_ways_by_hand_size(element_counts, target_combination)[5] / comb(total_elements, 5)
+    rows = []
+    for size in sample_sizes:
+        errors = []
+        for quasi in (False, True):
+            # 每个副本就是一次完整的size样本估计，副本间的误差即该样本量下的误差
+            _, _, estimates = containment_probability(element_counts, target_combination, size * replicates,
+                                                      replicates, seed, quasi)
+            errors.append(sqrt(np.mean((np.asarray(estimates) - exact) ** 2)))
+        rows.append((size, errors[0], errors[1]))
+    return exact, rows
+
+def battle_convergence(sample_sizes=BATTLE_SAMPLE_SIZES, replicates=DEFAULT_REPLICATES, seed=0, overrides=None,
+                       metric='win_rate'):
+    """
+    战斗统计的经验收敛：各样本量下两种方法的单次估计标准差（由副本间离散度估计）
+
+    返回:
+    [(样本量, 蒙特卡罗标准差, 拟蒙特卡罗标准差)]
+    """
+    rows = []
+    for size in sample_sizes:
+        spreads = []
+        for quasi in (False, True):
+            _, summary = battle_statistics(size * replicates, replicates, seed, quasi, overrides=overrides)
+            spreads.append(summary[metric][1] * sqrt(replicates))
+        rows.append((size, spreads[0], spreads[1]))
+    return rows
+
+def _print_convergence(rows, label):
+    print(f"{'样本量':>8}{'蒙特卡罗' + label:>16}{'拟蒙特卡罗' + label:>16}{'误差比':>10}{'等效样本倍数':>14}")
+    for size, plain, quasi in rows:
+        ratio = plain / quasi if quasi else float('inf')
+        print(f"{size:>10}{plain:>18.6f}{quasi:>18.6f}{ratio:>12.2f}{ratio * ratio:>16.1f}")
+
+def main():
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    element_counts = {'A': 3, 'B': 3, 'C': 2, 'D': 2, 'E': 2}
+    for target in ("AAB", "ABC"):
+        print(f"\n=== 概率估计收敛：{element_counts} 包含 {target}（{DEFAULT_REPLICATES}个副本）===")
+        start_time = time.time()
+        exact, rows = probability_convergence(element_counts, target, seed=seed)
+        print(f"精确值: {exact:.6f}")
+        _print_convergence(rows, "RMSE")
+        print(f"用时 {time.time() - start_time:.2f}秒")
+
+    overrides = {'MONSTER_HP': 40, 'PLAYER_MAX_HP': 20}
+    print(f"\n=== 战斗胜率收敛：{overrides}（{DEFAULT_REPLICATES}个副本，每场前{BATTLE_DIMENSIONS}个随机数取自低差异点）===")
+    start_time = time.time()
+    _print_convergence(battle_convergence(seed=seed, overrides=overrides), "标准差")
+    print(f"用时 {time.time() - start_time:.2f}秒")
+    print("\n等效样本倍数 = 误差比的平方，即普通蒙特卡罗达到相同精度所需的样本量倍数")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import itertools
+import time
+from math import comb
+from multiprocessing import Pool, cpu_count
+
+import battle_simulator
+from packed_multiset import layout_for
+
+# ===========================================
+# 并行排名枚举配置
+# ===========================================
+
+DEFAULT_CHUNK_SIZE = 200000           # 每个工作单元枚举的组合数
+PARALLEL_THRESHOLD = 500000           # 组合总数低于此值时直接在当前进程枚举
+
+# ===========================================
+#
+# 把 C(n, k) 个组合按字典序编号为 0 .. C(n, k)-1，按编号区间切分成工作单元。
+# 工作进程由区间起点的编号还原出组合（unrank），再逐个求后继组合，
+# 每个进程只保存当前组合，内存占用与组合总数无关；各单元返回的整数计数相加即为精确结果。
+
+def rank_combination(n, combination):
+    """组合（递增的下标序列）在字典序中的编号"""
+    k = len(combination)
+    rank = 0
+    previous = -1
+    for i, value in enumerate(combination):
+        for skipped in range(previous + 1, value):
+            rank += comb(n - skipped - 1, k - i - 1)
+        previous = value
+    return rank
+
+def unrank_combination(n, k, rank):
+    """由字典序编号还原组合"""
+    combination = []
+    value = 0
+    for i in range(k):
+        while True:
+            block = comb(n - value - 1, k - i - 1)
+            if rank < block:
+                break
+            rank -= block
+            value += 1
+        combination.append(value)
+        value += 1
+    return combination
+
+class ContainsAny:
+    """手牌包含任意一个目标组合，如 ContainsAny(layout, ["AAB", "AAD"])；目标也可以是已打包的整数"""
+    def __init__(self, layout, targets):
+        self.guard = layout.guard
+        self.targets = [target if isinstance(target, int) else layout.pack(target) for target in targets]
+
+    def __call__(self, hand):
+        guard = self.guard
+        for target in self.targets:
+            if ((hand | guard) - target) & guard == guard:
+                return True
+        return False
+
+class DamageAtLeast:
+    """
+    本回合最多打出 max_cards 张牌时，可造成的伤害不低于 threshold
+
+    默认按battle_simulator的数值：A、B造成CARD_AB_DAMAGE，D造成CARD_D_DAMAGE，
+    打出AAB、AAD组合时额外加上组合伤害
+    """
+    def __init__(self, layout, threshold, damage=None, combos=None, max_cards=None):
+        if damage is None:
+            damage = {'A': battle_simulator.CARD_AB_DAMAGE, 'B': battle_simulator.CARD_AB_DAMAGE,
+                      'D': battle_simulator.CARD_D_DAMAGE}
+        if combos is None:
+            combos = {'AAB': battle_simulator.AAB_COMBO_BONUS_DAMAGE,
+                      'AAD': battle_simulator.AAD_COMBO_BONUS_DAMAGE}
+        self.layout = layout
+        self.threshold = threshold
+        self.damage = damage
+        self.max_cards = battle_simulator.MAX_CARDS_PLAY_PER_TURN if max_cards is None else max_cards
+        self.combos = [(layout.pack(combo), sum(damage.get(card, 0) for card in combo) + bonus)
+                       for combo, bonus in combos.items() if len(combo) <= self.max_cards]
+
+    def __call__(self, hand):
+        guard = self.layout.guard
+        for target, combo_damage in self.combos:
+            if combo_damage >= self.threshold and ((hand | guard) - target) & guard == guard:
+                return True
+
+        values = []
+        for element, count in self.layout.unpack(hand).items():
+            values.extend([self.damage.get(element, 0)] * count)
+        values.sort(reverse=True)
+        return sum(values[:self.max_cards]) >= self.threshold
+
+class CountsPredicate:
+    """把接收计数字典的函数包装成接收打包手牌的条件（函数需可被pickle，即定义在模块顶层）"""
+    def __init__(self, layout, function):
+        self.layout = layout
+        self.function = function
+
+    def __call__(self, hand):
+        return self.function(self.layout.unpack(hand))
+
+# 工作进程内的全局状态，由进程池初始化函数设置，避免每个单元重复传输
+_worker_units = None
+_worker_predicate = None
+
+def _init_worker(units, predicate):
+    global _worker_units, _worker_predicate
+    _worker_units = units
+    _worker_predicate = predicate
+
+def _count_chunk(args):
+    """枚举编号区间 [start, end) 内的组合，返回满足条件的个数"""
+    hand_size, start, end = args
+    units = _worker_units
+    predicate = _worker_predicate
+    n = len(units)
+    combination = unrank_combination(n, hand_size, start)
+    hits = 0
+
+    for _ in range(end - start):
+        hand = 0
+        for index in combination:
+            hand += units[index]
+        if predicate(hand):
+            hits += 1
+
+        # 字典序的后继组合
+        i = hand_size - 1
+        while i >= 0 and combination[i] == n - hand_size + i:
+            i -= 1
+        if i < 0:
+            break
+        combination[i] += 1
+        for j in range(i + 1, hand_size):
+            combination[j] = combination[j - 1] + 1
+
+    return hits
+
+def count_hands(element_counts, hand_size, predicate, layout=None, processes=None,
+                chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    精确统计满足条件的手牌数
+
+    参数:
+    element_counts: 字典，各元素的数量
+    hand_size: 抽取的元素个数
+    predicate: 条件，接收打包后的手牌（整数），返回是否满足
+    layout: 位段映射，默认按element_counts建立（predicate需使用同一映射）
+    processes: 进程数，默认使用全部CPU；组合总数较少时自动在当前进程枚举
+
+    返回:
+    (满足条件的方式数, 总方式数)
+    """
+    if layout is None:
+        layout = layout_for(element_counts)
+    elements = []
+    for element, count in element_counts.items():
+        elements.extend([element] * count)
+    return count_packed_hands(layout.units(elements), hand_size, predicate, processes, chunk_size)
+
+def count_packed_hands(units, hand_size, predicate, processes=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    按每个元素的位段单位精确统计满足条件的手牌数
+
+    返回:
+    (满足条件的方式数, 总方式数)
+    """
+    total_ways = comb(len(units), hand_size)
+
+    if processes is None:
+        processes = cpu_count()
+
+    if processes <= 1 or total_ways < PARALLEL_THRESHOLD:
+        success_ways = 0
+        for combination in itertools.combinations(units, hand_size):
+            if predicate(sum(combination)):
+                success_ways += 1
+        return success_ways, total_ways
+
+    chunks = [(hand_size, start, min(start + chunk_size, total_ways))
+              for start in range(0, total_ways, chunk_size)]
+    with Pool(processes, initializer=_init_worker, initargs=(units, predicate)) as pool:
+        success_ways = sum(pool.imap_unordered(_count_chunk, chunks))
+    return success_ways, total_ways
+
+def main():
+    """示例：大牌库中AAB或AAD可打出、以及本回合伤害不低于6的概率"""
+    element_counts = {'A': 6, 'B': 6, 'C': 5, 'D': 5, 'E': 5}
+    hand_size = 7
+    layout = layout_for(element_counts)
+
+    queries = [
+        ("AAB或AAD可打出", ContainsAny(layout, ["AAB", "AAD"])),
+        ("可造成至少6点伤害", DamageAtLeast(layout, 6)),
+        ("可造成至少10点伤害", DamageAtLeast(layout, 10)),
+    ]
+
+    print(f"集合配置: {element_counts}，抽取 {hand_size} 个元素")
+    for description, predicate in queries:
+        start_time = time.time()
+        success_ways, total_ways = count_hands(element_counts, hand_size, predicate, layout)
+        elapsed = time.time() - start_time
+        print(f"\n{description}")
+        print(f"  满足条件的方式数: {success_ways:,} / {total_ways:,}")
+        print(f"  精确概率: {success_ways / total_ways:.8f}")
+        print(f"  计算用时: {elapsed:.3f}秒")
+
+if __name__ == "__main__":
+    main()
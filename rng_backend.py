@@ -0,0 +1,156 @@
+import os
+import random
+import threading
+import time
+from itertools import chain, islice
+
+import numpy as np
+
+# ===========================================
+# 随机数后端配置
+# ===========================================
+
+DEFAULT_BLOCK_SIZE = 16384            # 每次批量生成的随机数个数
+REPLAY_BLOCK_SIZE = 512               # 按场次回放时的批量大小（一场战斗通常只用几十到几百个随机数）
+
+# ===========================================
+#
+# 模拟器只需要随机数源提供 random()、shuffle(x)、sample(population, k) 三个方法。
+# BufferedRandom 用numpy Generator一次生成一整块[0,1)均匀数并转换成Python列表，串成一个不断续块的迭代器，
+# random() 直接是这个迭代器的 __next__。它没有Python函数开销，但每个数都要经 chain 转发到当前块的列表迭代器，
+# 单次调用比 random.random 慢一倍左右（实测约80纳秒对40纳秒）；在Python层捕获块用完再换块只会更慢。
+# 速度优势来自洗牌和抽样：洗牌时给每个元素取一个均匀数作为排序键（独立连续随机键的排序即均匀随机排列），
+# 抽样为取数有限的 Fisher-Yates。random 模块的 shuffle/sample 在Python层逐个元素调用 _randbelow，
+# 是热循环中最慢的部分。
+#
+# 三种用法：
+#   BufferedRandom(seed)                  可复现的单一随机流
+#   rng.spawn(n)                          n条相互独立的子随机流（SeedSequence派生），用于多进程；
+#                                         battle_rng 的随机流也可派生（以密钥和计数器为熵）
+#   battle_rng(seed, battle_index)        基于计数器的Philox随机流，第i场战斗的随机数只由(seed, i)决定，
+#                                         任意一场战斗都可单独重放，与其他战斗的执行顺序、所在进程无关
+
+class BufferedRandom:
+    """批量生成、缓冲读取的随机数源"""
+    def __init__(self, seed=None, block_size=DEFAULT_BLOCK_SIZE, bit_generator=None):
+        """
+        seed: 整数、SeedSequence 或 None（使用系统熵）
+        bit_generator: 直接指定numpy的位生成器（指定时忽略seed）
+        """
+        if bit_generator is None:
+            seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+            bit_generator = np.random.PCG64(seed_sequence)
+        self.generator = np.random.Generator(bit_generator)
+        self.block_size = block_size
+        self._seed_sequence = bit_generator.seed_seq
+        self._stream = chain.from_iterable(self._blocks())
+        # [0, 1) 均匀随机数
+        self.random = self._stream.__next__
+        self._sort_key = lambda _, draw=self.random: draw()
+
+    def _blocks(self):
+        generate, size = self.generator.random, self.block_size
+        while True:
+            yield generate(size).tolist()
+
+    def shuffle(self, x):
+        """就地打乱列表"""
+        x.sort(key=self._sort_key)
+
+    def sample(self, population, k):
+        """不放回抽取k个元素"""
+        pool = list(population)
+        n = len(pool)
+        if not 0 <= k <= n:
+            raise ValueError("抽取数量超出总体大小")
+        for i, u in zip(range(k), islice(self._stream, k)):
+            j = i + int(u * (n - i))
+            pool[i], pool[j] = pool[j], pool[i]
+        return pool[:k]
+
+    def spawn(self, count):
+        """
+        派生count条相互独立的子随机流
+
+        按密钥和计数器直接构造的位生成器（如battle_rng的Philox）没有SeedSequence，
+        此时以首次派生时的密钥和计数器作为熵建立SeedSequence，同一随机流多次派生得到的子流互不相同
+        """
+        if self._seed_sequence is None:
+            state = self.generator.bit_generator.state['state']
+            if not isinstance(state, dict) or 'key' not in state:
+                raise ValueError("该位生成器既没有SeedSequence也没有密钥，无法派生子随机流")
+            entropy = [*np.ravel(state['key']).tolist(), *np.ravel(state['counter']).tolist()]
+            self._seed_sequence = np.random.SeedSequence(entropy)
+        return [BufferedRandom(seed_sequence, self.block_size)
+                for seed_sequence in self._seed_sequence.spawn(count)]
+
+def battle_rng(seed, battle_index, block_size=REPLAY_BLOCK_SIZE):
+    """
+    第battle_index场战斗专用的随机数源（Philox计数器模式）
+
+    密钥由seed决定，计数器的高位为场次编号，各场次的随机流互不重叠；
+    用相同的(seed, battle_index)即可单独重放这场战斗
+    """
+    bit_generator = np.random.Philox(key=seed, counter=[0, 0, 0, battle_index])
+    return BufferedRandom(bit_generator=bit_generator, block_size=block_size)
+
+# 每个线程各用一个默认随机数源（缓冲迭代器不能被多个线程同时推进）
+_default = threading.local()
+
+def default_rng():
+    """当前线程的默认随机数源（未指定rng的模拟和抽样都使用它）"""
+    rng = getattr(_default, 'rng', None)
+    if rng is None:
+        rng = _default.rng = BufferedRandom()
+    return rng
+
+def seed_default_rng(seed=None):
+    """为当前线程的默认随机数源设定种子，使未指定rng的模拟可复现"""
+    _default.rng = BufferedRandom(seed)
+
+def _reset_after_fork():
+    # 子进程继承了父进程的缓冲区，不重新初始化的话各工作进程会产生相同的随机数
+    global _default
+    _default = threading.local()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def main():
+    """与random模块对比洗牌、抽样和单个随机数的速度"""
+    rng = BufferedRandom(2024)
+    deck = list(range(10))
+    units = [1 << (8 * (i % 5)) for i in range(12)]
+    count = 200000
+
+    print(f"=== 速度对比（各 {count} 次）===")
+    for name, source in (("random模块", random), ("BufferedRandom", rng)):
+        start_time = time.perf_counter()
+        for _ in range(count):
+            source.shuffle(deck)
+        shuffle_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for _ in range(count):
+            source.sample(units, 5)
+        sample_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for _ in range(count):
+            source.random()
+        random_time = time.perf_counter() - start_time
+        print(f"{name:<16} 洗10张牌 {shuffle_time / count * 1e9:>6.0f}纳秒  "
+              f"抽5个 {sample_time / count * 1e9:>6.0f}纳秒  random() {random_time / count * 1e9:>5.0f}纳秒")
+
+    # 按场次回放：先顺序跑完，再单独重放其中一场
+    from battle_simulator import BattleState
+    state = BattleState()
+    outcomes = []
+    for battle in range(1000):
+        state.rng = battle_rng(7, battle)
+        outcomes.append(state.simulate())
+    state.rng = battle_rng(7, 731)
+    print(f"\n第731场战斗: 顺序模拟 {outcomes[731]}，单独重放 {state.simulate()}")
+
+if __name__ == "__main__":
+    main()
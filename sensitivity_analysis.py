@@ -0,0 +1,156 @@
+import random
+import time
+from math import sqrt
+
+import battle_simulator
+from battle_simulator import BALANCE_CONSTANTS, BattleState, override_constants
+
+# ===========================================
+# 灵敏度分析配置
+# ===========================================
+
+DEFAULT_SENSITIVITY_BATTLES = 2000    # 每个数值变体模拟的战斗场数
+DEFAULT_RELATIVE_STEP = 0.1           # 数值扰动的相对幅度（整数数值至少扰动1）
+CONFIDENCE_Z = 1.96                   # 95%置信区间
+
+METRICS = ('win_rate', 'mean_turns', 'mean_hp')
+METRIC_NAMES = {'win_rate': '胜率', 'mean_turns': '平均回合数', 'mean_hp': '平均剩余血量'}
+
+# ===========================================
+
+class CommonRandomNumbers:
+    """
+    公共随机数源：洗牌和击晕判定使用两条独立的随机流，
+    这样修改数值后，同一场战斗中第k次洗牌、第k次击晕判定仍然使用相同的随机数
+    """
+    def __init__(self, seed):
+        self.shuffle_stream = random.Random(seed * 2)
+        self.stun_stream = random.Random(seed * 2 + 1)
+
+    def shuffle(self, cards):
+        self.shuffle_stream.shuffle(cards)
+
+    def random(self):
+        return self.stun_stream.random()
+
+def _perturbed_values(name, relative_step):
+    """返回数值的下扰动值和上扰动值"""
+    value = getattr(battle_simulator, name)
+    if isinstance(value, int):
+        step = max(1, round(value * relative_step))
+        return max(0, value - step), value + step
+    step = value * relative_step
+    return value - step, value + step
+
+def _run_battles(num_battles, seed, overrides):
+    """用公共随机数模拟一组战斗，返回每场的(是否胜利, 回合数, 剩余血量)"""
+    outcomes = []
+    state = BattleState()
+    with override_constants(**overrides):
+        for i in range(num_battles):
+            state.rng = CommonRandomNumbers(seed + i)
+            turns, hp, won = state.simulate()
+            outcomes.append((1 if won else 0, turns, max(hp, 0)))
+    return outcomes
+
+def _elasticity(base_values, low_values, high_values, base_param, low_param, high_param):
+    """
+    中心差分弹性 (dY/dθ)·θ/Y，以及基于delta方法的标准误差
+
+    返回:
+    (弹性, 标准误差, 方差缩减倍数)
+    """
+    n = len(base_values)
+    delta_param = high_param - low_param
+    diffs = [(high - low) / delta_param for high, low in zip(high_values, low_values)]
+    mean_diff = sum(diffs) / n
+    mean_base = sum(base_values) / n
+    if mean_base == 0:
+        return float('nan'), float('nan'), float('nan')
+
+    elasticity = mean_diff * base_param / mean_base
+
+    # delta方法：E = θ·mean(d)/mean(y)，线性化后对每场战斗求影响值
+    ratio = mean_diff / mean_base
+    influence = [base_param / mean_base * (d - ratio * y) for d, y in zip(diffs, base_values)]
+    mean_influence = sum(influence) / n
+    variance = sum((v - mean_influence) ** 2 for v in influence) / (n - 1)
+    std_error = sqrt(variance / n)
+
+    # 与独立抽样差分比较：独立时差分方差为两组方差之和
+    def _var(values):
+        mean = sum(values) / n
+        return sum((v - mean) ** 2 for v in values) / (n - 1)
+    paired_var = _var([high - low for high, low in zip(high_values, low_values)])
+    independent_var = _var(high_values) + _var(low_values)
+    if independent_var == 0:
+        reduction = float('nan')
+    else:
+        reduction = independent_var / paired_var if paired_var > 0 else float('inf')
+
+    return elasticity, std_error, reduction
+
+def sensitivity_analysis(constants=BALANCE_CONSTANTS, num_battles=DEFAULT_SENSITIVITY_BATTLES,
+                         relative_step=DEFAULT_RELATIVE_STEP, seed=None):
+    """
+    使用公共随机数对每个数值做中心差分，计算胜率、平均回合数、平均剩余血量的弹性
+
+    参数:
+    constants: 要分析的数值名称列表
+    num_battles: 每个变体的战斗场数（所有变体使用相同的随机数序列）
+    relative_step: 扰动的相对幅度
+    seed: 随机种子
+
+    返回:
+    字典 {数值名称: {指标: (弹性, 置信区间下限, 置信区间上限, 方差缩减倍数)}}
+    """
+    if seed is None:
+        seed = random.randrange(2**31)
+
+    base_outcomes = _run_battles(num_battles, seed, {})
+    results = {}
+
+    for name in constants:
+        base_param = getattr(battle_simulator, name)
+        low_param, high_param = _perturbed_values(name, relative_step)
+        low_outcomes = _run_battles(num_battles, seed, {name: low_param})
+        high_outcomes = _run_battles(num_battles, seed, {name: high_param})
+
+        results[name] = {}
+        for index, metric in enumerate(METRICS):
+            elasticity, std_error, reduction = _elasticity(
+                [o[index] for o in base_outcomes],
+                [o[index] for o in low_outcomes],
+                [o[index] for o in high_outcomes],
+                base_param, low_param, high_param,
+            )
+            margin = CONFIDENCE_Z * std_error
+            results[name][metric] = (elasticity, elasticity - margin, elasticity + margin, reduction)
+
+    return results
+
+def print_sensitivity_report(results):
+    """按弹性的绝对值从大到小打印报告"""
+    for metric in METRICS:
+        def _sort_key(item):
+            value = item[1][metric][0]
+            return -abs(value) if value == value else 0
+
+        print(f"\n=== {METRIC_NAMES[metric]}弹性 ===")
+        print(f"{'数值':<30}{'弹性':>10}{'95%置信区间':>24}{'方差缩减':>10}")
+        for name, metrics in sorted(results.items(), key=_sort_key):
+            elasticity, low, high, reduction = metrics[metric]
+            print(f"{name:<30}{elasticity:>10.4f}   [{low:>8.4f}, {high:>8.4f}]{reduction:>10.1f}x")
+
+def main():
+    """对全部平衡数值进行灵敏度分析"""
+    print(f"灵敏度分析：{len(BALANCE_CONSTANTS)} 个数值，每个变体 {DEFAULT_SENSITIVITY_BATTLES} 场战斗")
+    start_time = time.time()
+    results = sensitivity_analysis()
+    elapsed = time.time() - start_time
+    print_sensitivity_report(results)
+    print(f"\n方差缩减：公共随机数差分相对独立抽样差分的方差缩减倍数，即节省的战斗场数倍数")
+    print(f"计算用时: {elapsed:.3f}秒")
+
+if __name__ == "__main__":
+    main()
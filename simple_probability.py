@@ -1,8 +1,10 @@
-import random
 from collections import Counter
 from math import comb
+from packed_multiset import layout_for
+from probability_tables import lookup_containment
+from rng_backend import default_rng
 
-def calculate_probability(element_counts, target_combination, simulation_count=100000):
+def calculate_probability(element_counts, target_combination, simulation_count=100000, use_table=True, rng=None):
     """
     计算从集合中抽取5个元素包含指定组合的概率
     
@@ -10,6 +12,8 @@ def calculate_probability(element_counts, target_combination, simulation_count=1
     element_counts: 字典，例如 {'A': 2, 'B': 2, 'C': 2, 'D': 2, 'E': 2}
     target_combination: 字符串，例如 "AAB"
     simulation_count: 模拟次数
+    use_table: 配置在预计算概率表中时直接查表返回精确概率，不再模拟
+    rng: 随机数源（需提供sample方法），默认使用rng_backend的共享缓冲随机数源
     
     返回:
     概率值 (0-1之间的浮点数)
@@ -37,21 +41,31 @@ def calculate_probability(element_counts, target_combination, simulation_count=1
     print(f"目标组合: {target_combination}")
     print(f"目标组合计数: {dict(target_count)}")
     
+    table_result = lookup_containment(element_counts, target_combination) if use_table else None
+    if table_result is not None:
+        success_ways, total_ways = table_result
+        probability = success_ways / total_ways
+        print(f"\n查表结果（精确）:")
+        print(f"满足条件的方式数: {success_ways} / {total_ways}")
+        print(f"概率: {probability:.6f}")
+        print(f"百分比: {probability*100:.4f}%")
+        return probability
+    
+    # 打包多重集：抽出的元素单位求和即为打包后的手牌
+    layout = layout_for(element_counts, target_combination)
+    element_units = layout.units(elements)
+    target = layout.pack(target_count)
+    guard = layout.guard
+    
     # 蒙特卡罗模拟
+    sample = (rng or default_rng()).sample
     success_count = 0
     for _ in range(simulation_count):
         # 随机抽取5个元素
-        sample = random.sample(elements, 5)
-        sample_count = Counter(sample)
+        hand = sum(sample(element_units, 5))
         
         # 检查是否包含目标组合
-        contains_target = True
-        for element, needed in target_count.items():
-            if sample_count.get(element, 0) < needed:
-                contains_target = False
-                break
-        
-        if contains_target:
+        if ((hand | guard) - target) & guard == guard:
             success_count += 1
     
     probability = success_count / simulation_count
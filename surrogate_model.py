@@ -0,0 +1,383 @@
+import json
+import os
+import random
+import sys
+import time
+from math import sqrt
+
+import numpy as np
+
+from battle_simulator import BattleState, BattleStats, override_constants
+from sensitivity_analysis import METRIC_NAMES
+
+# ===========================================
+# 代理模型配置
+# ===========================================
+
+# 参数空间：数值名 → (最小值, 最大值)，均为整数
+DEFAULT_PARAMETER_SPACE = {
+    'PLAYER_MAX_HP': (10, 40),
+    'MONSTER_HP': (10, 40),
+    'MONSTER_HEAVY_ATTACK_DAMAGE': (3, 12),
+    'CARD_AB_DAMAGE': (2, 5),
+}
+SURROGATE_METRICS = ('win_rate', 'mean_turns')
+TOLERANCE_NOISE_MULTIPLE = 2.0        # 预测标准差超过模型噪声下限的这一倍数视为不确定
+
+BATTLES_PER_POINT = 1000              # 每个采样点模拟的战斗场数
+INITIAL_POINTS = 16                   # 主动学习前的随机采样点数
+ACTIVE_LEARNING_ITERATIONS = 40       # 主动学习最多追加的采样点数
+CANDIDATE_POOL_SIZE = 2000            # 每轮评估不确定度的候选点数
+CALIBRATION_COVERAGE = 0.95           # 留一校准：标准差放大到这一比例的采样点落在留一预测±2σ以内
+CALIBRATION_POINTS = 20               # 停止前留出检验随机模拟的点数
+CALIBRATION_MAX_OUTSIDE = 0.1         # 留出点落在预测±2σ以外的比例超过此值时继续主动学习
+LENGTH_SCALE_GRID = (0.1, 0.15, 0.25, 0.4, 0.6, 1.0, 1.6, 2.5)   # 核长度尺度的候选值（参数归一化到[0,1]后）
+SIGNAL_VARIANCE_GRID = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0)             # 信号方差的候选值（观测值标准化后）
+NOISE_MULTIPLIER_GRID = (1, 2, 4, 8, 16, 32, 64, 128, 256)        # 模拟噪声方差放大倍数的候选值
+FIT_SWEEPS = 2                        # 超参数逐个坐标搜索的轮数
+JITTER = 1e-8                         # 协方差矩阵对角线的数值稳定项
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA_PATH = os.path.join(BASE_DIR, 'surrogate_data.json')
+
+# ===========================================
+#
+# 每个指标一个高斯过程回归（各向异性RBF核）：
+#   预测均值 = k(x)ᵀ α，预测方差 = k(x, x) - k(x)ᵀ K⁻¹ k(x)
+# 每个采样点的模拟噪声（胜率的二项方差、回合数的样本方差除以场数）乘以一个放大倍数放在对角线上，
+# 模型因此不会强行穿过噪声大的点。长度尺度、信号方差和放大倍数都按边际似然估计；
+# 拟合后再用留一交叉验证的残差把预测标准差放大到实际覆盖率，主动学习结束前还要通过一次留出检验。
+# 拟合时预先求好 α 和 K⁻¹，单次查询只需一次核向量和矩阵-向量乘法。
+# 噪声下限是放大后的单点观测噪声（取中位数，乘以校准倍数）：采样点再密，预测标准差也降不到它以下，
+# 不确定的判定标准因此按它的倍数设定，而不是一个固定值。追加单个采样点时沿用已有超参数重新求解，
+# 只做一次矩阵求逆，不重新搜索。
+
+class GaussianProcess:
+    """
+    带观测噪声的高斯过程回归
+
+    模拟噪声只是观测误差的下限：平稳核描述不了的局部起伏（如胜率从0到1的陡峭过渡）
+    由放大的噪声吸收，倍数和长度尺度、信号方差一样从数据中估计
+    """
+    def __init__(self):
+        self.length_scales = None
+        self.signal_variance = 1.0
+        self.noise_multiplier = 1.0
+        self.calibration = 1.0        # 留一交叉验证得到的标准差放大倍数
+        self.noise_floor = 0.0        # 预测标准差能达到的下限（原始单位）
+
+    def _kernel(self, A, B, length_scales):
+        diff = (A[:, None, :] - B[None, :, :]) / length_scales
+        return np.exp(-0.5 * np.einsum('ijk,ijk->ij', diff, diff))
+
+    def _log_likelihood(self, X, y, noise, hyper):
+        length_scales, signal_variance, noise_multiplier = hyper
+        K = signal_variance * self._kernel(X, X, length_scales) + np.diag(noise * noise_multiplier + JITTER)
+        try:
+            L = np.linalg.cholesky(K)
+        except np.linalg.LinAlgError:
+            return -np.inf
+        alpha = np.linalg.solve(L.T, np.linalg.solve(L, y))
+        return -0.5 * y @ alpha - np.log(np.diag(L)).sum()
+
+    def fit(self, X, y, noise, optimize=True):
+        """
+        X: (n, d) 归一化参数，y: (n,) 观测值，noise: (n,) 模拟噪声方差
+        长度尺度、信号方差、噪声倍数按边际似然在网格上逐个坐标搜索；
+        optimize=False 时沿用已有超参数（尚未拟合过时仍然搜索）
+        """
+        self.offset = y.mean()
+        self.scale = y.std() or 1.0
+        y = (y - self.offset) / self.scale
+        noise = noise / self.scale ** 2
+
+        if optimize or self.length_scales is None:
+            self._search_hyperparameters(X, y, noise)
+        self.X = X
+        K = (self.signal_variance * self._kernel(X, X, self.length_scales)
+             + np.diag(noise * self.noise_multiplier + JITTER))
+        self.K_inv = np.linalg.inv(K)
+        self.alpha = self.K_inv @ y
+        self.calibration = self._loo_calibration(noise)
+        self.noise_floor = sqrt(float(np.median(noise)) * self.noise_multiplier) * self.scale * self.calibration
+        return self
+
+    def _search_hyperparameters(self, X, y, noise):
+        length_scales = np.full(X.shape[1], 0.5) if self.length_scales is None else self.length_scales.copy()
+        hyper = (length_scales, self.signal_variance, self.noise_multiplier)
+        best = self._log_likelihood(X, y, noise, hyper)
+
+        def consider(trial):
+            nonlocal best, hyper
+            likelihood = self._log_likelihood(X, y, noise, trial)
+            if likelihood > best:
+                best, hyper = likelihood, trial
+
+        for _ in range(FIT_SWEEPS):
+            for dim in range(X.shape[1]):
+                for value in LENGTH_SCALE_GRID:
+                    trial = hyper[0].copy()
+                    trial[dim] = value
+                    consider((trial, hyper[1], hyper[2]))
+            for value in SIGNAL_VARIANCE_GRID:
+                consider((hyper[0], value, hyper[2]))
+            for value in NOISE_MULTIPLIER_GRID:
+                consider((hyper[0], hyper[1], value))
+
+        self.length_scales, self.signal_variance, self.noise_multiplier = hyper
+
+    def _loo_calibration(self, noise):
+        """留一交叉验证：每个采样点被去掉后的预测残差与预测方差有闭式解，据此求标准差放大倍数"""
+        diagonal = np.diag(self.K_inv)
+        residual_sq = (self.alpha / diagonal) ** 2
+        latent_variance = np.maximum(1 / diagonal - noise * self.noise_multiplier, 1e-12)
+        needed = np.sqrt(np.maximum(residual_sq / 4 - noise, 0.0) / latent_variance)
+        return max(1.0, float(np.quantile(needed, CALIBRATION_COVERAGE)))
+
+    def predict(self, X):
+        """返回 (均值, 标准差) 两个数组；标准差已乘以校准倍数"""
+        k = self.signal_variance * self._kernel(X, self.X, self.length_scales)
+        mean = k @ self.alpha
+        variance = self.signal_variance - np.einsum('ij,ij->i', k @ self.K_inv, k)
+        std = np.sqrt(np.maximum(variance, 0.0)) * self.scale * self.calibration
+        return mean * self.scale + self.offset, std
+
+    def predict_one(self, x):
+        """单点查询（x为归一化参数向量），返回 (均值, 标准差)"""
+        diff = (self.X - x) / self.length_scales
+        k = self.signal_variance * np.exp(-0.5 * (diff * diff).sum(axis=1))
+        variance = self.signal_variance - k @ (self.K_inv @ k)
+        return ((k @ self.alpha) * self.scale + self.offset,
+                sqrt(max(variance, 0.0)) * self.scale * self.calibration)
+
+def simulate_point(params, num_battles=BATTLES_PER_POINT, seed=0):
+    """在给定数值下模拟，返回BattleStats"""
+    state = BattleState(rng=random.Random(seed))
+    stats = BattleStats()
+    with override_constants(**params):
+        for _ in range(num_battles):
+            stats.add(*state.simulate())
+    return stats
+
+def _observation(stats, metric):
+    """指标的观测值与观测方差"""
+    n = stats.battles
+    if metric == 'win_rate':
+        p = stats.win_rate
+        # 胜率为0或1时二项方差为0，加上1/n避免模型把这些点当作精确值
+        return p, (p * (1 - p) + 1 / n) / n
+    mean = stats.mean_turns
+    return mean, max(stats.turns_sq_sum / n - mean * mean, 1.0 / n) / n
+
+class BalanceSurrogate:
+    """
+    平衡数值的代理模型：累积各采样点的模拟结果，拟合胜率和平均回合数的高斯过程，
+    查询时给出预测值和不确定度，不确定度高的点可按需追加模拟
+    """
+    def __init__(self, space=None):
+        self.space = dict(space or DEFAULT_PARAMETER_SPACE)
+        self.names = list(self.space)
+        self.lows = np.array([self.space[name][0] for name in self.names], dtype=float)
+        self.spans = np.array([max(self.space[name][1] - self.space[name][0], 1) for name in self.names],
+                              dtype=float)
+        self.observations = []        # [(参数字典, BattleStats)]
+        self.models = {}
+
+    def _normalize(self, params_list):
+        return (np.array([[params[name] for name in self.names] for params in params_list], dtype=float)
+                - self.lows) / self.spans
+
+    def add_observation(self, params, stats):
+        """加入一个采样点；同一参数的结果合并"""
+        for existing, existing_stats in self.observations:
+            if existing == params:
+                existing_stats.merge(stats)
+                return
+        self.observations.append((dict(params), stats))
+
+    def simulate(self, params, num_battles=BATTLES_PER_POINT, refit=True):
+        """在给定参数下追加模拟并（可选）重新拟合；重新拟合沿用已有超参数"""
+        seed = len(self.observations) * 1000003 + sum(stats.battles for _, stats in self.observations)
+        self.add_observation(params, simulate_point(params, num_battles, seed))
+        if refit:
+            self.fit(optimize=False)
+
+    def fit(self, optimize=True):
+        """拟合各指标的高斯过程；optimize=False 时只按已有超参数重新求解"""
+        X = self._normalize([params for params, _ in self.observations])
+        for metric in SURROGATE_METRICS:
+            values = np.array([_observation(stats, metric) for _, stats in self.observations])
+            model = self.models.get(metric) or GaussianProcess()
+            self.models[metric] = model.fit(X, values[:, 0], values[:, 1], optimize)
+        return self
+
+    def tolerance(self, metric):
+        """指标的不确定容忍值：模型噪声下限的 TOLERANCE_NOISE_MULTIPLE 倍"""
+        return TOLERANCE_NOISE_MULTIPLE * self.models[metric].noise_floor
+
+    def predict(self, params):
+        """
+        查询一组数值（未列出的参数不可省略）
+
+        返回:
+        {指标: (预测值, 标准差)}
+        """
+        if not self.models:
+            raise ValueError("代理模型尚未拟合：先模拟采样点或运行主动学习")
+        x = (np.array([params[name] for name in self.names], dtype=float) - self.lows) / self.spans
+        result = {}
+        for metric, model in self.models.items():
+            mean, std = model.predict_one(x)
+            value = float(mean)
+            if metric == 'win_rate':
+                value = min(1.0, max(0.0, value))
+            result[metric] = (value, float(std))
+        return result
+
+    def uncertainty(self, params_list):
+        """各点的不确定度：各指标标准差相对容忍值的最大比值"""
+        if not self.models:
+            raise ValueError("代理模型尚未拟合：先模拟采样点或运行主动学习")
+        X = self._normalize(params_list)
+        ratios = [model.predict(X)[1] / self.tolerance(metric) for metric, model in self.models.items()]
+        return np.max(ratios, axis=0)
+
+    def query(self, params, simulate_if_uncertain=False, num_battles=BATTLES_PER_POINT):
+        """
+        查询；默认只用模型回答，不确定度超过容忍值时只标记出来。
+        simulate_if_uncertain=True 时，模型尚未拟合或预测不确定就先在该点模拟（沿用已有超参数重新拟合）再回答
+
+        返回:
+        ({指标: (预测值, 标准差)}, 是否不确定)
+        """
+        if not self.models:
+            if not simulate_if_uncertain:
+                raise ValueError("代理模型尚未拟合，且未允许模拟")
+            self.simulate(params, num_battles)
+        prediction = self.predict(params)
+        uncertain = any(std > self.tolerance(metric) for metric, (_, std) in prediction.items())
+        if uncertain and simulate_if_uncertain:
+            self.simulate(params, num_battles)
+            prediction = self.predict(params)
+            uncertain = any(std > self.tolerance(metric) for metric, (_, std) in prediction.items())
+        return prediction, uncertain
+
+    def check_calibration(self, params_list, num_battles=BATTLES_PER_POINT):
+        """
+        留出检验：在未参与拟合的点上模拟，统计实际值落在预测±2σ以外的比例
+        （比较时计入实际值自身的模拟噪声）。检验完这些点并入采样集重新拟合
+
+        返回:
+        {指标: 落在±2σ以外的比例}
+        """
+        if not self.models:
+            raise ValueError("代理模型尚未拟合，无法检验")
+        X = self._normalize(params_list)
+        predictions = {metric: model.predict(X) for metric, model in self.models.items()}
+        seed = len(self.observations) * 1000003 + sum(stats.battles for _, stats in self.observations)
+        actual = [simulate_point(params, num_battles, seed + i) for i, params in enumerate(params_list)]
+
+        report = {}
+        for metric, (means, stds) in predictions.items():
+            values = np.array([_observation(stats, metric) for stats in actual])
+            residual_sq = (values[:, 0] - means) ** 2
+            report[metric] = float(np.mean(residual_sq > 4 * (stds ** 2 + values[:, 1])))
+
+        for params, stats in zip(params_list, actual):
+            self.add_observation(params, stats)
+        self.fit()
+        return report
+
+    def random_points(self, count, rng):
+        return [{name: int(rng.integers(low, high + 1)) for name, (low, high) in self.space.items()}
+                for _ in range(count)]
+
+    def save(self, path=DEFAULT_DATA_PATH):
+        data = {'space': self.space,
+                'observations': [[params, stats.to_dict()] for params, stats in self.observations]}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path=DEFAULT_DATA_PATH):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        surrogate = cls({name: tuple(bounds) for name, bounds in data['space'].items()})
+        for params, stats in data['observations']:
+            surrogate.add_observation(params, BattleStats.from_dict(stats))
+        return surrogate.fit()
+
+def active_learning(surrogate, iterations=ACTIVE_LEARNING_ITERATIONS, initial_points=INITIAL_POINTS,
+                    pool_size=CANDIDATE_POOL_SIZE, num_battles=BATTLES_PER_POINT,
+                    calibration_points=CALIBRATION_POINTS, seed=0, verbose=True):
+    """
+    主动学习：先随机采样，之后每轮在候选点中选不确定度最高的一个追加模拟并重新搜索超参数。
+    全部候选点都在容忍值以内时不直接相信标准差，先做一次留出检验，通过才结束；
+    轮数用完时也做一次留出检验，报告标准差的实际覆盖情况
+
+    返回:
+    进行的轮数
+    """
+    rng = np.random.default_rng(seed)
+    if len(surrogate.observations) < initial_points:
+        for params in surrogate.random_points(initial_points - len(surrogate.observations), rng):
+            surrogate.simulate(params, num_battles, refit=False)
+        surrogate.fit()
+
+    def calibrated():
+        report = surrogate.check_calibration(surrogate.random_points(calibration_points, rng), num_battles)
+        if verbose:
+            for metric, outside in report.items():
+                print(f"  留出检验 {METRIC_NAMES[metric]}: {outside:.0%}的留出点在预测±2σ以外")
+        return all(outside <= CALIBRATION_MAX_OUTSIDE for outside in report.values())
+
+    for iteration in range(iterations):
+        pool = surrogate.random_points(pool_size, rng)
+        uncertainty = surrogate.uncertainty(pool)
+        worst = int(np.argmax(uncertainty))
+        if uncertainty[worst] <= 1.0:
+            if verbose:
+                print(f"第{iteration + 1}轮: 全部候选点的不确定度都在容忍值以内，用留出点检验标准差")
+            # 检验未通过时留出点已并入采样集，继续主动学习
+            if calibrated():
+                return iteration
+            continue
+        if verbose:
+            print(f"第{iteration + 1}轮: 最不确定的点 {pool[worst]}（{uncertainty[worst]:.2f}倍容忍值）")
+        surrogate.simulate(pool[worst], num_battles, refit=False)
+        surrogate.fit()
+    if verbose:
+        print("轮数用完，用留出点检验标准差")
+    calibrated()
+    return iterations
+
+def main():
+    data_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DATA_PATH
+    try:
+        surrogate = BalanceSurrogate.load(data_path)
+        print(f"已读取 {len(surrogate.observations)} 个采样点: {data_path}")
+    except FileNotFoundError:
+        surrogate = BalanceSurrogate()
+
+    print(f"=== 主动学习 ===")
+    start_time = time.time()
+    active_learning(surrogate)
+    surrogate.save(data_path)
+    elapsed = time.time() - start_time
+    print(f"共 {len(surrogate.observations)} 个采样点，用时 {elapsed:.3f}秒，已保存到 {data_path}")
+
+    # 在未采样过的点上与实际模拟对比
+    print(f"\n=== 预测与模拟对比 ===")
+    rng = np.random.default_rng(12345)
+    for params in surrogate.random_points(5, rng):
+        start_time = time.perf_counter()
+        prediction, uncertain = surrogate.query(params)
+        query_time = time.perf_counter() - start_time
+        actual = simulate_point(params, 4000, seed=99)
+        flag = "，不确定" if uncertain else ""
+        print(f"{params}（查询 {query_time * 1e6:.0f}微秒{flag}）")
+        for metric, (mean, std) in prediction.items():
+            print(f"  {METRIC_NAMES[metric]}: 预测 {mean:.4f}±{1.96 * std:.4f}，模拟 {getattr(actual, metric):.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import socket
+import time
+import uuid
+from multiprocessing import Process
+
+from battle_simulator import BALANCE_CONSTANTS, BattleState, BattleStats, override_constants
+
+# ===========================================
+# 参数扫描配置
+# ===========================================
+
+DEFAULT_BATTLES_PER_UNIT = 2000       # 每个工作单元模拟的战斗场数
+DEFAULT_UNITS_PER_POINT = 4           # 每个参数组合拆分成的工作单元数
+DEFAULT_LEASE_TIMEOUT = 60.0          # 租约超时秒数，超时后重新派发
+HEARTBEAT_INTERVAL = 500              # 工作进程每模拟多少场战斗续租一次
+POLL_INTERVAL = 0.5                   # 空闲轮询间隔（秒）
+
+# 示例扫描网格
+DEFAULT_GRID = {
+    'MONSTER_HP': [13, 20, 30, 40],
+    'CARD_AB_DAMAGE': [2, 3, 4],
+    'CARD_E_COUNT': [1, 2, 3],
+}
+
+# ===========================================
+#
+# 队列目录结构（目录可放在共享文件系统上，供多台机器的工作进程使用）:
+#   manifest.json      扫描网格与参数，含扫描编号（网格、场数和种子的哈希）
+#   pending/<id>.json  待处理的工作单元，<id> 以扫描编号开头
+#   leased/<id>.<租约号>.json  已被领取的工作单元，文件修改时间即最近一次续租时间；
+#                      每次领取生成新的租约号，续租和释放只作用于自己的租约
+#   results/<id>.json  已完成单元的统计结果
+#
+# 领取和归还都通过 os.rename 完成，同一单元只会被一个工作进程领取成功。
+# 领取前先刷新待处理文件的修改时间，租约一出现就是新的，协调者不会把刚领取的单元当作超时回收。
+# 所有文件先写成 .tmp 临时文件再改名，统计和读取只看 .json 文件。
+# 同一目录重新创建其他网格的扫描时，只领取、统计和读取当前扫描编号的文件，旧扫描的结果不会混入。
+
+class FileWorkQueue:
+    """基于目录的工作队列"""
+    def __init__(self, queue_dir):
+        self.queue_dir = queue_dir
+        self.pending_dir = os.path.join(queue_dir, 'pending')
+        self.leased_dir = os.path.join(queue_dir, 'leased')
+        self.results_dir = os.path.join(queue_dir, 'results')
+        self.manifest_path = os.path.join(queue_dir, 'manifest.json')
+
+    def create(self, manifest, units):
+        """创建队列并写入全部工作单元"""
+        for directory in (self.pending_dir, self.leased_dir, self.results_dir):
+            os.makedirs(directory, exist_ok=True)
+        for unit in units:
+            _write_json_atomic(os.path.join(self.pending_dir, f"{unit['id']}.json"), unit)
+        _write_json_atomic(self.manifest_path, manifest)
+
+    def load_manifest(self):
+        with open(self.manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _names(self, directory):
+        """目录中属于当前扫描的 .json 文件名"""
+        prefix = f"{self.load_manifest()['sweep_id']}_"
+        return [name for name in _json_names(directory) if name.startswith(prefix)]
+
+    def claim(self):
+        """
+        领取一个工作单元
+
+        返回:
+        (工作单元, 租约文件名)；没有可领取的单元时返回 (None, None)
+        """
+        names = self._names(self.pending_dir)
+        random.shuffle(names)  # 减少多个工作进程争抢同一单元
+        for name in names:
+            unit_id = name[:-len('.json')]
+            lease = f"{unit_id}.{uuid.uuid4().hex}.json"
+            pending_path = os.path.join(self.pending_dir, name)
+            leased_path = os.path.join(self.leased_dir, lease)
+            try:
+                os.utime(pending_path)   # 改名后的租约带着新的修改时间出现
+                os.rename(pending_path, leased_path)
+                with open(leased_path, encoding='utf-8') as f:
+                    return json.load(f), lease
+            except FileNotFoundError:
+                continue  # 已被其他工作进程领取，或租约已被回收
+        return None, None
+
+    def heartbeat(self, lease):
+        """续租"""
+        try:
+            os.utime(os.path.join(self.leased_dir, lease))
+        except FileNotFoundError:
+            pass  # 租约已被回收，结果仍可提交
+
+    def complete(self, unit_id, result, lease):
+        """
+        提交结果并释放自己的租约
+
+        结果文件已存在时不覆盖（同一单元的结果相同）；租约超时后被其他工作进程重新领取时，
+        新租约的文件名不同，这里不会删除它
+        """
+        _write_json_atomic(os.path.join(self.results_dir, f"{unit_id}.json"), result, overwrite=False)
+        try:
+            os.remove(os.path.join(self.leased_dir, lease))
+        except FileNotFoundError:
+            pass
+
+    def reclaim_expired(self, lease_timeout):
+        """把超时未续租的单元放回待处理队列，返回重新派发的数量"""
+        reclaimed = 0
+        now = time.time()
+        for lease in self._names(self.leased_dir):
+            leased_path = os.path.join(self.leased_dir, lease)
+            name = f"{lease.split('.')[0]}.json"
+            try:
+                expired = now - os.path.getmtime(leased_path) > lease_timeout
+                if expired and not os.path.exists(os.path.join(self.results_dir, name)):
+                    os.rename(leased_path, os.path.join(self.pending_dir, name))
+                    reclaimed += 1
+                elif expired:
+                    os.remove(leased_path)
+            except FileNotFoundError:
+                continue
+        return reclaimed
+
+    def status(self):
+        """返回 (待处理, 已领取, 已完成) 的单元数"""
+        return (len(self._names(self.pending_dir)),
+                len(self._names(self.leased_dir)),
+                len(self._names(self.results_dir)))
+
+    def results(self):
+        """读取当前扫描全部已完成单元的结果"""
+        for name in self._names(self.results_dir):
+            with open(os.path.join(self.results_dir, name), encoding='utf-8') as f:
+                yield json.load(f)
+
+def _json_names(directory):
+    """目录中已写完的 .json 文件名（不含写入中的临时文件）"""
+    return [name for name in os.listdir(directory) if name.endswith('.json')]
+
+def _write_json_atomic(path, data, overwrite=True):
+    """
+    先写临时文件再改名，避免读到写了一半的文件
+
+    临时文件名含主机名和随机串，共享文件系统上多台机器的进程号相同也不会冲突；
+    overwrite=False 时目标已存在则放弃写入
+    """
+    tmp_path = f"{path}.{socket.gethostname()}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    if overwrite:
+        os.replace(tmp_path, path)
+        return
+    try:
+        os.link(tmp_path, path)   # 目标已存在时失败，不会覆盖
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(tmp_path)
+
+def sweep_id(grid, battles_per_unit, units_per_point, seed):
+    """扫描编号：网格、场数和种子相同的扫描编号相同，结果可以复用"""
+    key = json.dumps([grid, battles_per_unit, units_per_point, seed], sort_keys=True)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:12]
+
+def build_work_units(grid, battles_per_unit=DEFAULT_BATTLES_PER_UNIT,
+                     units_per_point=DEFAULT_UNITS_PER_POINT, seed=None):
+    """
+    把参数网格拆分为工作单元，每个单元带独立的随机种子
+
+    返回:
+    (扫描编号, 工作单元列表)
+    """
+    # 在建队列前检查参数名，避免拼错的参数让每个工作进程都在 override_constants 处失败、单元一直处于租出状态
+    for name in grid:
+        if name not in BALANCE_CONSTANTS:
+            raise ValueError(f"未知的数值配置: {name}")
+    if seed is None:
+        seed = random.randrange(2**31)
+
+    sweep = sweep_id(grid, battles_per_unit, units_per_point, seed)
+    names = sorted(grid)
+    units = []
+    for point_index, values in enumerate(itertools.product(*(grid[name] for name in names))):
+        params = dict(zip(names, values))
+        for part in range(units_per_point):
+            units.append({
+                'id': f"{sweep}_p{point_index:05d}_u{part:03d}",
+                'point': point_index,
+                'params': params,
+                'battles': battles_per_unit,
+                'seed': seed * 1000003 + point_index * units_per_point + part,
+            })
+    return sweep, units
+
+def run_work_unit(unit, heartbeat=None):
+    """在给定参数下模拟一个工作单元，返回可合并的统计"""
+    state = BattleState(rng=random.Random(unit['seed']))
+    stats = BattleStats()
+    with override_constants(**unit['params']):
+        for i in range(unit['battles']):
+            stats.add(*state.simulate())
+            if heartbeat is not None and (i + 1) % HEARTBEAT_INTERVAL == 0:
+                heartbeat()
+    return stats
+
+def run_worker(queue_dir, worker_id=None, exit_when_idle=True):
+    """
+    工作进程：循环领取并处理工作单元
+
+    exit_when_idle: 没有待处理和已领取的单元时退出；为False时持续等待新单元
+    """
+    if worker_id is None:
+        worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    queue = FileWorkQueue(queue_dir)
+    completed = 0
+
+    while True:
+        unit, lease = queue.claim()
+        if unit is None:
+            pending, leased, _ = queue.status()
+            if exit_when_idle and pending == 0 and leased == 0:
+                break
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        stats = run_work_unit(unit, heartbeat=lambda: queue.heartbeat(lease))
+        queue.complete(unit['id'], {
+            'id': unit['id'],
+            'point': unit['point'],
+            'params': unit['params'],
+            'worker': worker_id,
+            'stats': stats.to_dict(),
+        }, lease)
+        completed += 1
+
+    return completed
+
+def init_sweep(queue_dir, grid, battles_per_unit=DEFAULT_BATTLES_PER_UNIT,
+               units_per_point=DEFAULT_UNITS_PER_POINT, seed=None):
+    """创建扫描队列"""
+    sweep, units = build_work_units(grid, battles_per_unit, units_per_point, seed)
+    manifest = {
+        'sweep_id': sweep,
+        'grid': grid,
+        'battles_per_unit': battles_per_unit,
+        'units_per_point': units_per_point,
+        'total_units': len(units),
+    }
+    FileWorkQueue(queue_dir).create(manifest, units)
+    return manifest
+
+def coordinate(queue_dir, lease_timeout=DEFAULT_LEASE_TIMEOUT, verbose=True):
+    """协调者：等待全部单元完成，期间回收超时租约"""
+    queue = FileWorkQueue(queue_dir)
+    total = queue.load_manifest()['total_units']
+    last_done = -1
+
+    while True:
+        reclaimed = queue.reclaim_expired(lease_timeout)
+        pending, leased, done = queue.status()
+        if verbose and (reclaimed or done != last_done):
+            message = f"进度: {done}/{total} 完成, {leased} 处理中, {pending} 待处理"
+            if reclaimed:
+                message += f", 重新派发 {reclaimed} 个超时单元"
+            print(message)
+            last_done = done
+        if done >= total:
+            break
+        time.sleep(POLL_INTERVAL)
+
+def collect_results(queue_dir):
+    """合并各单元结果，返回 [(参数字典, BattleStats)]，按参数组合顺序排列"""
+    merged = {}
+    for result in FileWorkQueue(queue_dir).results():
+        point = result['point']
+        if point not in merged:
+            merged[point] = (result['params'], BattleStats())
+        merged[point][1].merge(BattleStats.from_dict(result['stats']))
+    return [merged[point] for point in sorted(merged)]
+
+def print_sweep_results(results):
+    """打印扫描结果"""
+    print(f"\n=== 参数扫描结果 ===")
+    print(f"{'参数':<56}{'场数':>8}{'胜率':>10}{'平均回合':>10}{'平均血量':>10}")
+    for params, stats in results:
+        label = ', '.join(f"{name}={value}" for name, value in params.items())
+        print(f"{label:<56}{stats.battles:>8}{stats.win_rate*100:>9.2f}%"
+              f"{stats.mean_turns:>10.2f}{stats.mean_hp:>10.2f}")
+
+def run_local(queue_dir, grid, num_workers, **kwargs):
+    """在本机启动协调者和若干工作进程完成一次扫描"""
+    init_sweep(queue_dir, grid, **kwargs)
+    workers = [Process(target=run_worker, args=(queue_dir, f"local-{i}")) for i in range(num_workers)]
+    for worker in workers:
+        worker.start()
+    coordinate(queue_dir)
+    for worker in workers:
+        worker.join()
+    return collect_results(queue_dir)
+
+def main():
+    parser = argparse.ArgumentParser(description="分布式参数扫描")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    init_parser = subparsers.add_parser('init', help="创建扫描队列")
+    init_parser.add_argument('queue_dir')
+    init_parser.add_argument('--grid', help="JSON格式的参数网格，默认使用示例网格")
+    init_parser.add_argument('--battles', type=int, default=DEFAULT_BATTLES_PER_UNIT)
+    init_parser.add_argument('--units-per-point', type=int, default=DEFAULT_UNITS_PER_POINT)
+    init_parser.add_argument('--seed', type=int)
+
+    worker_parser = subparsers.add_parser('worker', help="启动工作进程（可在任意机器上运行）")
+    worker_parser.add_argument('queue_dir')
+    worker_parser.add_argument('--wait', action='store_true', help="队列空闲时继续等待")
+
+    coordinate_parser = subparsers.add_parser('coordinate', help="等待扫描完成并回收超时租约")
+    coordinate_parser.add_argument('queue_dir')
+    coordinate_parser.add_argument('--lease-timeout', type=float, default=DEFAULT_LEASE_TIMEOUT)
+
+    collect_parser = subparsers.add_parser('collect', help="合并并打印结果")
+    collect_parser.add_argument('queue_dir')
+
+    local_parser = subparsers.add_parser('local', help="在本机完成整个扫描")
+    local_parser.add_argument('queue_dir')
+    local_parser.add_argument('--workers', type=int, default=os.cpu_count())
+    local_parser.add_argument('--grid', help="JSON格式的参数网格，默认使用示例网格")
+
+    args = parser.parse_args()
+
+    if args.command == 'init':
+        grid = json.loads(args.grid) if args.grid else DEFAULT_GRID
+        manifest = init_sweep(args.queue_dir, grid, args.battles, args.units_per_point, args.seed)
+        print(f"已创建 {manifest['total_units']} 个工作单元")
+    elif args.command == 'worker':
+        completed = run_worker(args.queue_dir, exit_when_idle=not args.wait)
+        print(f"工作进程完成 {completed} 个单元")
+    elif args.command == 'coordinate':
+        coordinate(args.queue_dir, args.lease_timeout)
+        print_sweep_results(collect_results(args.queue_dir))
+    elif args.command == 'collect':
+        print_sweep_results(collect_results(args.queue_dir))
+    elif args.command == 'local':
+        grid = json.loads(args.grid) if args.grid else DEFAULT_GRID
+        start_time = time.time()
+        print_sweep_results(run_local(args.queue_dir, grid, args.workers))
+        print(f"\n计算用时: {time.time() - start_time:.3f}秒")
+
+if __name__ == "__main__":
+    main()
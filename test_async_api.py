@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import async_api
+from async_api import AsyncCalculators
+
+class CountingExecutor(ThreadPoolExecutor):
+    """记录提交次数的线程池，worker 在 release 被设置前阻塞，保证请求在计算完成前到达"""
+    def __init__(self):
+        super().__init__(max_workers=4)
+        self.submitted = 0
+        self.release = threading.Event()
+
+    def submit(self, function, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(function, *args, **kwargs)
+
+def _blocking_worker(executor, value):
+    def worker(*args):
+        executor.release.wait(timeout=5)
+        return value
+    return worker
+
+def _run(coroutine_function):
+    executor = CountingExecutor()
+    try:
+        return asyncio.run(coroutine_function(executor)), executor
+    finally:
+        executor.release.set()
+        executor.shutdown(wait=True)
+
+def test_identical_concurrent_requests_share_one_computation(monkeypatch):
+    async def scenario(executor):
+        monkeypatch.setattr(async_api, '_exact_worker', _blocking_worker(executor, 0.25))
+        calculators = AsyncCalculators(executor=executor)
+        counts = {'A': 2, 'B': 2, 'C': 2}
+        tasks = [asyncio.ensure_future(calculators.exact_probability(counts, target))
+                 for target in ('AAB', 'ABA', 'BAA') * 4]
+        await asyncio.sleep(0.05)
+        executor.release.set()
+        results = await asyncio.gather(*tasks)
+        return calculators, results
+
+    (calculators, results), executor = _run(scenario)
+    assert executor.submitted == 1
+    assert (calculators.requests, calculators.computations) == (12, 1)
+    assert {result['probability'] for result in results} == {0.25}
+    assert [result['target'] for result in results[:3]] == ['AAB', 'ABA', 'BAA']
+
+def test_different_overrides_are_not_coalesced(monkeypatch):
+    async def scenario(executor):
+        monkeypatch.setattr(async_api, '_simulation_worker', _blocking_worker(executor, {'battles': 10}))
+        calculators = AsyncCalculators(executor=executor)
+        tasks = [asyncio.ensure_future(calculators.simulate(10, overrides))
+                 for overrides in (None, {}, {'MONSTER_HP': 30}, {'MONSTER_HP': 30}, {'MONSTER_HP': 31})]
+        await asyncio.sleep(0.05)
+        executor.release.set()
+        return await asyncio.gather(*tasks)
+
+    results, executor = _run(scenario)
+    assert executor.submitted == 3
+    assert results[2]['overrides'] == {'MONSTER_HP': 30}
+
+def test_cancelled_waiter_does_not_cancel_shared_computation(monkeypatch):
+    async def scenario(executor):
+        monkeypatch.setattr(async_api, '_exact_worker', _blocking_worker(executor, 0.5))
+        calculators = AsyncCalculators(executor=executor)
+        counts = {'A': 2, 'B': 2}
+        first = asyncio.ensure_future(calculators.exact_probability(counts, 'AB'))
+        second = asyncio.ensure_future(calculators.exact_probability(counts, 'AB'))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        executor.release.set()
+        return await second, first.cancelled()
+
+    (result, cancelled), executor = _run(scenario)
+    assert cancelled and result['probability'] == 0.5
+    assert executor.submitted == 1
+
+def test_finished_computation_is_not_reused(monkeypatch):
+    async def scenario(executor):
+        executor.release.set()
+        monkeypatch.setattr(async_api, '_exact_worker', _blocking_worker(executor, 0.5))
+        calculators = AsyncCalculators(executor=executor)
+        await calculators.exact_probability({'A': 2}, 'A')
+        await calculators.exact_probability({'A': 2}, 'A')
+        return calculators
+
+    calculators, executor = _run(scenario)
+    assert executor.submitted == calculators.computations == 2
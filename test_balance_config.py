@@ -0,0 +1,71 @@
+import os
+import shutil
+
+import pytest
+
+import balance_config
+
+openpyxl = pytest.importorskip('openpyxl')
+
+@pytest.fixture
+def workbooks(tmp_path, monkeypatch):
+    """复制两个数值表到临时目录，并统计实际解析工作簿的次数"""
+    balance_path = shutil.copy(balance_config.BALANCE_WORKBOOK, tmp_path / 'balance.xlsx')
+    effect_path = shutil.copy(balance_config.CARD_EFFECT_WORKBOOK, tmp_path / 'effects.xlsx')
+    cache_path = tmp_path / 'cache.bin'
+    parses = []
+    parse = balance_config.parse_workbooks
+
+    def counting_parse(*args):
+        parses.append(args)
+        return parse(*args)
+
+    monkeypatch.setattr(balance_config, 'parse_workbooks', counting_parse)
+
+    def load():
+        return balance_config.load_balance_config(balance_path, effect_path, cache_path)
+    return load, balance_path, cache_path, parses
+
+def test_cache_is_reused_until_workbook_content_changes(workbooks):
+    load, balance_path, _, parses = workbooks
+    config = load()
+    assert load() == config
+    assert len(parses) == 1
+
+    # 只改修改时间、内容不变时仍用缓存
+    os.utime(balance_path, ns=(0, os.stat(balance_path).st_mtime_ns + 10**9))
+    assert load() == config
+    assert len(parses) == 1
+
+    workbook = openpyxl.load_workbook(balance_path)
+    for row in workbook[balance_config.MODEL_SHEET].iter_rows():
+        if row[0].value == '玩家生命值':
+            row[1].value = config['constants']['PLAYER_MAX_HP'] + 5
+            break
+    workbook.save(balance_path)
+    changed = load()
+    assert len(parses) == 2
+    assert changed['constants']['PLAYER_MAX_HP'] == config['constants']['PLAYER_MAX_HP'] + 5
+
+def test_parser_version_or_mapping_change_invalidates_cache(workbooks, monkeypatch):
+    load, _, _, parses = workbooks
+    load()
+    monkeypatch.setattr(balance_config, 'PARSER_VERSION', balance_config.PARSER_VERSION + 1)
+    load()
+    assert len(parses) == 2
+    load()
+    assert len(parses) == 2
+
+    monkeypatch.setattr(balance_config, 'MODEL_FIELDS', {**balance_config.MODEL_FIELDS, '白板怪': 'MONSTER_HP'})
+    load()
+    assert len(parses) == 2
+    monkeypatch.setattr(balance_config, 'MODEL_FIELDS', {'玩家生命值': 'PLAYER_MAX_HP'})
+    assert 'MONSTER_HP' not in load()['constants']
+    assert len(parses) == 3
+
+def test_corrupt_cache_is_ignored(workbooks):
+    load, _, cache_path, parses = workbooks
+    config = load()
+    cache_path.write_bytes(cache_path.read_bytes()[:50])
+    assert load() == config
+    assert len(parses) == 2
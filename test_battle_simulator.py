@@ -0,0 +1,58 @@
+import pytest
+
+from battle_simulator import BattleState, ContributionStats, check_battle_state
+
+class ScriptedRng:
+    """不洗牌，random() 依次返回给定的数"""
+    def __init__(self, randoms=()):
+        self.randoms = list(randoms)
+
+    def shuffle(self, items):
+        pass
+
+    def random(self):
+        return self.randoms.pop(0)
+
+def _metrics(contributions, source):
+    return {metric: contributions.get(metric, source) for metric in ContributionStats.METRICS}
+
+def test_contributions_match_hand_computed_battles():
+    contributions = ContributionStats()
+
+    # 牌库 [D, E] 从末尾抽牌：每回合打出D和E，怪物3血三回合打死。
+    # 第1回合击晕（化劲4未遇攻击）；第2回合轻攻击3点抵消8点化劲中的3点，浪费5点；
+    # 第3回合打死怪物时再次击晕，化劲4未用上；被第1回合击晕顺延的重攻击（7点）到战斗结束未执行
+    state = BattleState(card_counts={'D': 1, 'E': 1}, rng=ScriptedRng([0.0, 0.9, 0.0]), monster_hp=3)
+    state.contributions = contributions
+    assert state.simulate() == (3, 40, True)
+
+    # 低血量（5）时A牌转为2点化劲：轻攻击3点抵消2点后剩4血，重攻击7点抵消2点后战败
+    state = BattleState(card_counts={'A': 1}, rng=ScriptedRng())
+    state.contributions = contributions
+    assert state.simulate(hp=5) == (2, -1, False)
+
+    zero = dict.fromkeys(ContributionStats.METRICS, 0)
+    assert _metrics(contributions, 'D') == {**zero, 'plays': 3, 'damage': 3, 'stuns': 2, 'stun_avoided': 7,
+                                            'battles': 1, 'wins': 1}
+    assert _metrics(contributions, 'E') == {**zero, 'plays': 3, 'armor': 12, 'prevented': 3, 'wasted': 5,
+                                            'unused': 4, 'battles': 1, 'wins': 1}
+    assert _metrics(contributions, 'A') == {**zero, 'plays': 2, 'armor': 4, 'prevented': 4,
+                                            'conversions': 2, 'battles': 1}
+    for source in ('B', 'AAB', 'AAD'):
+        assert _metrics(contributions, source) == zero
+    assert (contributions.battles, contributions.wins) == (2, 1)
+
+def test_combo_contributions_follow_play_order():
+    # 第1回合手牌 [B, A, A] 按手牌顺序打出B、A、A，不成组合；第2回合手牌 [A, A, B, A, A] 打出A、A、B触发AAB
+    contributions = ContributionStats()
+    state = BattleState(card_counts={'A': 2, 'B': 1}, rng=ScriptedRng(), monster_hp=20)
+    state.contributions = contributions
+    assert state.simulate() == (2, 37, True)
+
+    assert [contributions.get('plays', source) for source in ContributionStats.SOURCES] == [4, 2, 0, 0, 1, 0]
+    assert [contributions.get('damage', source) for source in ContributionStats.SOURCES] == [12, 6, 0, 0, 5, 0]
+    assert [contributions.get('battles', source) for source in ContributionStats.SOURCES] == [1, 1, 0, 0, 1, 0]
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_battle_state_matches_simulate_battle(seed):
+    assert check_battle_state(num_battles=500, seed=seed) == 0
@@ -0,0 +1,40 @@
+import random
+
+import numpy as np
+
+from battle_simulator import BattleState
+from battle_trace import (NO_CARD, BattleTraceWriter, battle_bounds, battle_outcomes, open_trace,
+                          record_battles, replay_battle)
+
+def test_trace_round_trip_matches_simulation(tmp_path, capsys):
+    path = tmp_path / 'trace.bin'
+    records = record_battles(path, 200, seed=3)
+
+    trace = open_trace(path)
+    assert len(trace) == records
+    battles, turns, hp, won = battle_outcomes(trace)
+    state = BattleState(rng=random.Random(3))
+    expected = [state.simulate() for _ in range(200)]
+    assert battles.tolist() == list(range(200))
+    assert list(zip(turns.tolist(), hp.tolist(), won.tolist())) == expected
+
+    # 空槽位为255，其余为合法牌编码，打出的牌都来自手牌
+    assert np.isin(trace['hand'], [0, 1, 2, 3, NO_CARD]).all()
+    for record in trace[:50]:
+        cards = [code for code in record['hand'] if code != NO_CARD]
+        assert all(code in cards for code in record['played'] if code != NO_CARD)
+
+    replay_battle(trace, 7)
+    output = capsys.readouterr().out
+    assert '第 7 场战斗回放' in output
+    assert output.count('回合: 手牌') == turns[7]
+    assert ('胜利' if won[7] else '失败') in output
+
+def test_empty_trace_yields_empty_arrays(tmp_path):
+    path = tmp_path / 'empty.bin'
+    with BattleTraceWriter(path):
+        pass
+    trace = open_trace(path)
+    starts, ends = battle_bounds(trace)
+    assert len(starts) == len(ends) == 0
+    assert all(len(column) == 0 for column in battle_outcomes(trace))
@@ -0,0 +1,38 @@
+import random
+
+from battle_simulator import override_constants
+from campaign_simulator import Encounter, build_battle_states, simulate_campaign
+
+ENCOUNTERS = [
+    Encounter("小怪", monster_hp=20, heavy_attack_damage=10),
+    Encounter("精英", monster_hp=25, heal_before=3),
+    Encounter("首领", monster_hp=30, heal_before=100, card_changes={'A': 1}),
+]
+
+def _replay(encounters, seed, max_hp):
+    """逐场手动传入血量重放同一随机数序列下的战役"""
+    states = build_battle_states(encounters, random.Random(seed))
+    hp, hp_after = max_hp, []
+    for encounter, state in zip(encounters, states):
+        hp = min(max_hp, hp + encounter.heal_before)
+        turns, hp, won = state.simulate(hp)
+        if not won:
+            break
+        hp_after.append(hp)
+    return hp_after
+
+def test_hp_carries_over_between_encounters():
+    carried = 0
+    for seed in range(20):
+        cleared, hp_after, turns = simulate_campaign(ENCOUNTERS, random.Random(seed))
+        assert hp_after == _replay(ENCOUNTERS, seed, 40)
+        assert len(turns) == cleared
+        carried += any(hp < 40 for hp in hp_after[:-1])
+    assert carried
+
+def test_player_max_hp_override_is_respected():
+    with override_constants(PLAYER_MAX_HP=12):
+        for seed in range(20):
+            cleared, hp_after, _ = simulate_campaign(ENCOUNTERS, random.Random(seed))
+            assert hp_after == _replay(ENCOUNTERS, seed, 12)
+            assert all(hp <= 12 for hp in hp_after)
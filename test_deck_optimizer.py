@@ -0,0 +1,36 @@
+from math import comb
+
+import pytest
+
+from deck_optimizer import deck_compositions, optimize_deck
+
+def test_deck_compositions_respect_bounds():
+    compositions = deck_compositions(8)
+    assert len(compositions) == comb(7, 3)
+    assert all(sum(counts.values()) == 8 and min(counts.values()) >= 1 for counts in compositions)
+    bounded = deck_compositions(8, minimums={'A': 2}, maximums={'E': 1})
+    assert bounded and all(counts['A'] >= 2 and counts['E'] <= 1 for counts in bounded)
+
+def _run(**kwargs):
+    return optimize_deck(8, monster={'monster_hp': 30}, player_hp=20, initial_battles=20,
+                         max_battles=160, seed=3, verbose=False, **kwargs)
+
+def test_optimize_deck_is_reproducible_and_ranks_survivors_first():
+    ranked = _run()
+    again = _run()
+    assert [c['counts'] for c in ranked] == [c['counts'] for c in again]
+    assert [c['stats'].to_dict() for c in ranked] == [c['stats'].to_dict() for c in again]
+
+    assert len(ranked) == comb(7, 3)
+    rounds = [c['rounds'] for c in ranked]
+    assert rounds == sorted(rounds, reverse=True)
+    assert ranked[0]['stats'].battles == 160
+
+def test_optimize_deck_targets_metric_value():
+    ranked = _run(target=0.5)
+    finalists = [c for c in ranked if c['rounds'] == ranked[0]['rounds']]
+    assert abs(ranked[0]['mean'] - 0.5) == min(abs(c['mean'] - 0.5) for c in finalists)
+
+def test_no_matching_deck_is_an_error():
+    with pytest.raises(ValueError):
+        optimize_deck(3, verbose=False)
@@ -0,0 +1,39 @@
+import itertools
+from collections import Counter
+from fractions import Fraction
+from math import comb
+
+import pytest
+
+from exact_probability import containment_curves, exact_probability_calculation
+
+def _brute_force_curve(element_counts, target):
+    elements = [element for element, count in element_counts.items() for _ in range(count)]
+    needed = Counter(target)
+    curve = []
+    for k in range(len(elements) + 1):
+        hits = sum(1 for hand in itertools.combinations(elements, k) if not needed - Counter(hand))
+        curve.append(Fraction(hits, comb(len(elements), k)))
+    return curve
+
+@pytest.mark.parametrize('element_counts', [
+    {'A': 2, 'B': 2, 'C': 2, 'D': 2, 'E': 2},
+    {'A': 3, 'B': 3, 'C': 2, 'D': 2, 'E': 2},
+])
+def test_curves_match_enumeration_at_five(element_counts):
+    curves = containment_curves(element_counts, ['AAB', 'ABC'])
+    for target in ('AAB', 'ABC'):
+        expected = exact_probability_calculation(element_counts, target, verbose=False)
+        assert curves[target][5] == pytest.approx(expected, abs=1e-12)
+
+def test_curves_match_brute_force_at_every_hand_size():
+    element_counts = {'A': 3, 'B': 2, 'C': 1, 'D': 2}
+    curves = containment_curves(element_counts, ['AAB', 'ABC', 'DD'])
+    for target, curve in curves.items():
+        assert len(curve) == sum(element_counts.values()) + 1
+        assert curve == pytest.approx([float(p) for p in _brute_force_curve(element_counts, target)], abs=1e-12)
+
+def test_reordered_targets_share_a_curve_and_missing_elements_give_zero():
+    curves = containment_curves({'A': 2, 'B': 2}, ['AAB', 'ABA', 'AC'])
+    assert curves['AAB'] is curves['ABA']
+    assert curves['AC'] == [0.0] * 5
@@ -0,0 +1,15 @@
+from math import sqrt
+
+from importance_sampling import long_fight_event, naive_estimate, importance_sampling_estimate
+
+def test_weighted_estimate_agrees_with_plain_monte_carlo():
+    # 默认数值下战斗持续3回合以上的概率约3%，普通蒙特卡罗两万场即可算准
+    event = long_fight_event(3)
+    result = importance_sampling_estimate(event, num_battles=2000, seed=0, verbose=False)
+    naive_probability, naive_relative_error = naive_estimate(event, 20000, seed=1)
+
+    assert 0.01 < naive_probability < 0.2
+    assert result['hits'] > 0 and result['relative_error'] < 0.2
+    error = sqrt((result['probability'] * result['relative_error']) ** 2 +
+                 (naive_probability * naive_relative_error) ** 2)
+    assert abs(result['probability'] - naive_probability) <= 3 * error
@@ -0,0 +1,26 @@
+import random
+
+import battle_simulator
+from battle_simulator import Monster
+from lookahead_player import COMPARISON_OVERRIDES, LookaheadPlayer, clear_transposition_tables, compare_players
+
+def test_compare_players_is_reproducible_and_lookahead_is_not_worse():
+    with battle_simulator.override_constants(**COMPARISON_OVERRIDES):
+        results = compare_players(100, depth=1, seed=0)
+        clear_transposition_tables()
+        again = compare_players(100, depth=1, seed=0)
+    assert {label: stats.to_dict() for label, stats in results.items()} == \
+           {label: stats.to_dict() for label, stats in again.items()}
+    assert results['lookahead'].battles == results['heuristic'].battles == 100
+    assert results['lookahead'].win_rate >= results['heuristic'].win_rate
+
+def test_lookahead_plays_cards_from_hand_within_limit():
+    rng = random.Random(1)
+    player = LookaheadPlayer(rng=rng)
+    monster = Monster()
+    for _ in range(20):
+        player.draw_cards()
+        played = player.choose_cards_to_play(monster)
+        assert len(played) <= battle_simulator.MAX_CARDS_PLAY_PER_TURN
+        assert all(played.count(card) == 1 and card in player.hand for card in played)
+        player.discard_hand()
@@ -0,0 +1,52 @@
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from packed_multiset import FIELD_MAX, MultisetLayout, layout_for
+from simple_probability import calculate_probability
+
+def _contains_counter(hand, target):
+    return not Counter(target) - Counter(hand)
+
+def test_packed_containment_matches_counter():
+    layout = MultisetLayout('ABCDE')
+    rng = random.Random(0)
+    for _ in range(2000):
+        hand = rng.choices('ABCDE', k=rng.randint(0, 8))
+        target = rng.choices('ABCDE', k=rng.randint(0, 4))
+        assert layout.contains(layout.pack(hand), layout.pack(target)) == _contains_counter(hand, target)
+
+def test_summed_units_equal_pack():
+    layout = MultisetLayout('ABDE')
+    hand = 'AABDEEE'
+    assert sum(layout.units(hand)) == layout.pack(hand)
+    assert layout.unpack(layout.pack(hand)) == Counter(hand)
+
+def test_full_field_does_not_borrow_from_neighbour():
+    layout = MultisetLayout('AB')
+    hand = layout.pack({'A': FIELD_MAX})
+    assert layout.contains(hand, layout.pack({'A': FIELD_MAX}))
+    assert not layout.contains(hand, layout.pack({'A': FIELD_MAX, 'B': 1}))
+    assert not layout.contains(layout.pack({'B': FIELD_MAX}), layout.pack('A'))
+
+def test_contains_array_matches_scalar():
+    layout = MultisetLayout('ABCDE')
+    rng = random.Random(1)
+    hands = [layout.pack(rng.choices('ABCDE', k=5)) for _ in range(500)]
+    target = layout.pack('AAB')
+    result = layout.contains_array(np.array(hands, dtype=np.uint64), target)
+    assert result.tolist() == [layout.contains(hand, target) for hand in hands]
+
+def test_pack_rejects_counts_above_field():
+    with pytest.raises(ValueError):
+        MultisetLayout('A').pack({'A': FIELD_MAX + 1})
+
+def test_large_element_counts_are_accepted():
+    counts = {'A': 200, 'B': 2}
+    layout = layout_for(counts, 'AAB')
+    assert layout.contains(layout.pack('AAAAB'), layout.pack('AAB'))
+    probability = calculate_probability(counts, 'AAB', simulation_count=2000,
+                                        use_table=False, rng=random.Random(0))
+    assert 0 < probability < 1
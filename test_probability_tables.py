@@ -0,0 +1,43 @@
+import itertools
+from collections import Counter
+from math import comb
+
+import pytest
+
+from exact_probability import containment_ways_by_hand_size
+from probability_tables import ProbabilityTables, build_tables
+
+CONFIGS = [
+    {'A': 2, 'B': 2, 'C': 2, 'D': 2, 'E': 2},
+    {'A': 4, 'B': 2, 'C': 3, 'D': 2, 'E': 4},
+    {'E': 3, 'C': 4, 'A': 2, 'D': 4, 'B': 3},
+]
+TARGETS = ['AAB', 'AAD', 'BCE', 'EEE', 'AAAA', 'ABCDE', 'AAF']
+
+@pytest.fixture(scope='module')
+def tables(tmp_path_factory):
+    path = tmp_path_factory.mktemp('tables') / 'tables.bin'
+    build_tables(path, min_count=2, max_count=4, hand_sizes=(5, 6))
+    return ProbabilityTables(path)
+
+@pytest.mark.parametrize('hand_size', [5, 6])
+@pytest.mark.parametrize('element_counts', CONFIGS)
+def test_containment_matches_generating_function(tables, element_counts, hand_size):
+    total_ways = comb(sum(element_counts.values()), hand_size)
+    for target in TARGETS:
+        expected = containment_ways_by_hand_size(element_counts, target)[hand_size]
+        assert tables.containment_ways(element_counts, target, hand_size) == (expected, total_ways)
+
+def test_containment_matches_brute_force(tables):
+    element_counts = CONFIGS[1]
+    elements = [element for element, count in element_counts.items() for _ in range(count)]
+    hands = [Counter(hand) for hand in itertools.combinations(elements, 5)]
+    for target in TARGETS:
+        needed = Counter(target)
+        expected = sum(all(hand[e] >= n for e, n in needed.items()) for hand in hands)
+        assert tables.containment_ways(element_counts, target) == (expected, len(hands))
+
+def test_configs_outside_table_are_not_found(tables):
+    assert tables.containment_ways({'A': 5, 'B': 2, 'C': 2, 'D': 2, 'E': 2}, 'AAB') is None
+    assert tables.containment_ways({'A': 2, 'B': 2, 'C': 2, 'D': 2}, 'AAB') is None
+    assert tables.containment_ways(CONFIGS[0], 'AAB', hand_size=7) is None
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from battle_simulator import BattleState, run_battles, run_simulation
+from quasi_monte_carlo import QuasiRandomSource, ScrambledHalton
+
+def test_halton_points_are_in_unit_cube_and_stratified():
+    points = ScrambledHalton(3, seed=0).points(0, 1024)
+    assert points.shape == (1024, 3)
+    assert ((points >= 0) & (points < 1)).all()
+    # 基数为2的第一维：前2^k个点在每个长度为2^-k的区间中各有一个
+    assert (np.bincount((points[:, 0] * 1024).astype(int), minlength=1024) == 1).all()
+
+def test_halton_scrambling_depends_on_seed():
+    assert not np.array_equal(ScrambledHalton(2, seed=0).points(0, 8), ScrambledHalton(2, seed=1).points(0, 8))
+
+def test_per_battle_source_raises_without_next_point():
+    source = QuasiRandomSource(4, seed=0, per_call=False)
+    with pytest.raises(RuntimeError):
+        source.random()
+    with pytest.raises(RuntimeError):
+        BattleState(rng=source).simulate()
+
+def test_next_point_hands_out_coordinates_then_falls_back():
+    source = QuasiRandomSource(2, seed=0, per_call=False)
+    source.next_point()
+    first = [source.random(), source.random()]
+    assert first == ScrambledHalton(2, seed=0).points(0, 1)[0].tolist()
+    assert 0 <= source.random() < 1       # 坐标用完后改用伪随机数
+    source.next_point()
+    assert source.random() == ScrambledHalton(2, seed=0).points(1, 1)[0, 0]
+
+def test_sample_uses_a_new_point_per_call():
+    source = QuasiRandomSource(5, seed=0)
+    points = ScrambledHalton(5, seed=0).points(0, 2)
+    for point in points:
+        population = list(range(10))
+        expected = population[:]
+        for i, u in enumerate(point):
+            j = i + int(u * (10 - i))
+            expected[i], expected[j] = expected[j], expected[i]
+        assert source.sample(population, 5) == expected[:5]
+
+def test_run_battles_and_run_simulation_advance_one_point_per_battle():
+    calls = []
+    source = QuasiRandomSource(16, seed=0, per_call=False)
+    next_point = source.next_point
+    source.next_point = lambda: (calls.append(1), next_point())
+    stats = run_battles(25, rng=source)
+    assert stats.battles == 25 and len(calls) == 25
+    run_simulation(10, verbose=False, rng=source)
+    assert len(calls) == 35
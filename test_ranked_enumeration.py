@@ -0,0 +1,33 @@
+import itertools
+from math import comb
+
+import pytest
+
+import ranked_enumeration
+from packed_multiset import layout_for
+from ranked_enumeration import (ContainsAny, DamageAtLeast, count_hands, rank_combination,
+                                unrank_combination)
+
+@pytest.mark.parametrize('n, k', [(1, 1), (6, 0), (7, 3), (10, 5), (12, 12)])
+def test_rank_unrank_round_trip_in_lexicographic_order(n, k):
+    for rank, combination in enumerate(itertools.combinations(range(n), k)):
+        assert rank_combination(n, combination) == rank
+        assert unrank_combination(n, k, rank) == list(combination)
+    assert rank + 1 == comb(n, k)
+
+ELEMENT_COUNTS = {'A': 3, 'B': 3, 'C': 2, 'D': 2, 'E': 3}
+
+@pytest.mark.parametrize('make_predicate', [
+    lambda layout: ContainsAny(layout, ['AAB', 'AAD']),
+    lambda layout: DamageAtLeast(layout, 9),
+])
+def test_parallel_counts_match_serial(monkeypatch, make_predicate):
+    layout = layout_for(ELEMENT_COUNTS)
+    predicate = make_predicate(layout)
+    serial = count_hands(ELEMENT_COUNTS, 5, predicate, layout, processes=1)
+
+    # 小牌库也走进程池，并让区间边界落在组合中间
+    monkeypatch.setattr(ranked_enumeration, 'PARALLEL_THRESHOLD', 0)
+    parallel = count_hands(ELEMENT_COUNTS, 5, predicate, layout, processes=2, chunk_size=97)
+    assert parallel == serial
+    assert 0 < serial[0] < serial[1] == comb(13, 5)
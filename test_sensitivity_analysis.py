@@ -0,0 +1,18 @@
+from sensitivity_analysis import METRICS, sensitivity_analysis
+
+def test_constant_without_effect_has_zero_elasticity():
+    # 进度报告间隔不参与战斗模拟：公共随机数下各场结果完全相同，弹性及其置信区间都应为0
+    results = sensitivity_analysis(constants=('PROGRESS_REPORT_INTERVAL',), num_battles=300, seed=5)
+    for metric in METRICS:
+        elasticity, low, high, reduction = results['PROGRESS_REPORT_INTERVAL'][metric]
+        assert elasticity == low == high == 0
+        # 默认数值下胜率恒为100%时各组方差都为0，方差缩减倍数无定义
+        assert reduction == float('inf') or reduction != reduction
+
+def test_monster_hp_lengthens_fights_with_paired_variance_reduction():
+    results = sensitivity_analysis(constants=('MONSTER_HP',), num_battles=300, seed=5)
+    assert repr(results) == repr(sensitivity_analysis(constants=('MONSTER_HP',), num_battles=300, seed=5))
+    elasticity, low, high, reduction = results['MONSTER_HP']['mean_turns']
+    assert 0 < low <= elasticity <= high
+    assert reduction > 1
+    assert results['MONSTER_HP']['mean_hp'][2] < 0
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import surrogate_model
+from surrogate_model import BalanceSurrogate, GaussianProcess
+
+def _noisy_samples(n, noise_std, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.random((n, 2))
+    y = np.sin(3 * X[:, 0]) + X[:, 1] + rng.normal(0, noise_std, n)
+    return X, y, np.full(n, noise_std ** 2)
+
+def test_gp_calibrated_std_covers_held_out_points():
+    X, y, noise = _noisy_samples(60, 0.05)
+    model = GaussianProcess().fit(X, y, noise)
+    assert model.calibration >= 1.0
+
+    X_test, y_test, noise_test = _noisy_samples(200, 0.05, seed=1)
+    mean, std = model.predict(X_test)
+    outside = (y_test - mean) ** 2 > 4 * (std ** 2 + noise_test)
+    assert outside.mean() <= 0.1
+
+def test_gp_noise_floor_tracks_observation_noise():
+    X, y, noise = _noisy_samples(60, 0.05)
+    quiet = GaussianProcess().fit(X, y, noise)
+    X, y, noise = _noisy_samples(60, 0.5)
+    loud = GaussianProcess().fit(X, y, noise)
+    assert 0 < quiet.noise_floor < loud.noise_floor
+
+def test_gp_refit_without_optimize_keeps_hyperparameters():
+    X, y, noise = _noisy_samples(40, 0.05)
+    model = GaussianProcess().fit(X, y, noise)
+    hyper = (model.length_scales.copy(), model.signal_variance, model.noise_multiplier)
+    X2, y2, noise2 = _noisy_samples(41, 0.05, seed=2)
+    model.fit(X2, y2, noise2, optimize=False)
+    assert np.array_equal(model.length_scales, hyper[0])
+    assert (model.signal_variance, model.noise_multiplier) == hyper[1:]
+    assert model.X.shape[0] == 41
+
+def _small_surrogate():
+    surrogate = BalanceSurrogate()
+    rng = np.random.default_rng(0)
+    for params in surrogate.random_points(8, rng):
+        surrogate.simulate(params, num_battles=50, refit=False)
+    return surrogate.fit()
+
+def test_query_answers_from_model_by_default(monkeypatch):
+    surrogate = _small_surrogate()
+    monkeypatch.setattr(surrogate_model, 'simulate_point',
+                        lambda *args, **kwargs: pytest.fail("query不应模拟"))
+    params = surrogate.random_points(1, np.random.default_rng(1))[0]
+    prediction, uncertain = surrogate.query(params)
+    assert set(prediction) == set(surrogate_model.SURROGATE_METRICS)
+    expected = any(std > surrogate.tolerance(metric) for metric, (_, std) in prediction.items())
+    assert uncertain == expected
+
+def test_query_refuses_unfitted_model_without_simulation():
+    surrogate = BalanceSurrogate()
+    params = surrogate.random_points(1, np.random.default_rng(0))[0]
+    with pytest.raises(ValueError):
+        surrogate.query(params)
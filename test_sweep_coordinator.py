@@ -0,0 +1,87 @@
+import os
+import time
+
+import pytest
+
+import sweep_coordinator
+from sweep_coordinator import FileWorkQueue, collect_results, init_sweep, run_worker
+
+def _init(queue_dir, grid=None, seed=1):
+    return init_sweep(str(queue_dir), grid or {'MONSTER_HP': [13, 20]},
+                      battles_per_unit=5, units_per_point=1, seed=seed)
+
+def _age(path, seconds):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+def test_complete_does_not_overwrite_existing_result(tmp_path):
+    _init(tmp_path)
+    queue = FileWorkQueue(str(tmp_path))
+    unit, lease = queue.claim()
+    queue.complete(unit['id'], {'id': unit['id'], 'value': 1}, lease)
+    queue.complete(unit['id'], {'id': unit['id'], 'value': 2}, lease)
+    assert [result['value'] for result in queue.results()] == [1]
+    assert queue.status() == (1, 0, 1)
+
+def test_expired_lease_is_reclaimed_and_old_owner_keeps_new_lease(tmp_path):
+    _init(tmp_path, {'MONSTER_HP': [13]})
+    queue = FileWorkQueue(str(tmp_path))
+    unit, old_lease = queue.claim()
+    _age(os.path.join(queue.leased_dir, old_lease), 120)
+    assert queue.reclaim_expired(lease_timeout=60) == 1
+    assert queue.status() == (1, 0, 0)
+
+    same_unit, new_lease = queue.claim()
+    assert same_unit['id'] == unit['id'] and new_lease != old_lease
+    queue.complete(unit['id'], {'id': unit['id']}, old_lease)
+    assert os.path.exists(os.path.join(queue.leased_dir, new_lease))
+    assert queue.reclaim_expired(lease_timeout=60) == 0
+
+def test_claim_of_long_pending_unit_is_not_reclaimed(tmp_path, monkeypatch):
+    _init(tmp_path, {'MONSTER_HP': [13]})
+    queue = FileWorkQueue(str(tmp_path))
+    for name in os.listdir(queue.pending_dir):
+        _age(os.path.join(queue.pending_dir, name), 120)
+
+    rename = os.rename
+    def rename_then_reclaim(src, dst):
+        rename(src, dst)
+        if dst.startswith(queue.leased_dir):
+            queue.reclaim_expired(lease_timeout=60)
+    monkeypatch.setattr(sweep_coordinator.os, 'rename', rename_then_reclaim)
+
+    unit, lease = queue.claim()
+    assert unit is not None
+    assert os.path.exists(os.path.join(queue.leased_dir, lease))
+
+def test_claim_survives_lease_reclaimed_before_open(tmp_path, monkeypatch):
+    _init(tmp_path, {'MONSTER_HP': [13]})
+    queue = FileWorkQueue(str(tmp_path))
+
+    rename = os.rename
+    def rename_then_reclaim(src, dst):
+        rename(src, dst)
+        if dst.startswith(queue.leased_dir):
+            monkeypatch.setattr(sweep_coordinator.os, 'rename', rename)
+            queue.reclaim_expired(lease_timeout=-1)
+    monkeypatch.setattr(sweep_coordinator.os, 'rename', rename_then_reclaim)
+
+    assert queue.claim() == (None, None)
+    assert queue.status() == (1, 0, 0)
+
+def test_reused_queue_dir_returns_only_current_sweep(tmp_path):
+    _init(tmp_path, {'CARD_AB_DAMAGE': [2, 3]})
+    run_worker(str(tmp_path), 'test')
+    _init(tmp_path, {'MONSTER_HP': [60, 80]})
+    assert FileWorkQueue(str(tmp_path)).status() == (2, 0, 0)
+
+    run_worker(str(tmp_path), 'test')
+    results = collect_results(str(tmp_path))
+    assert [params for params, _ in results] == [{'MONSTER_HP': 60}, {'MONSTER_HP': 80}]
+    assert all(stats.battles == 5 for _, stats in results)
+
+def test_init_rejects_unknown_constant_before_creating_queue(tmp_path):
+    queue_dir = tmp_path / 'queue'
+    with pytest.raises(ValueError, match='MONSTR_HP'):
+        _init(queue_dir, {'MONSTR_HP': [1]})
+    assert not queue_dir.exists()
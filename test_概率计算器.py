@@ -0,0 +1,27 @@
+import random
+import threading
+
+from 概率计算器 import 模拟批次大小, 精确计算, 蒙特卡罗模拟
+
+元素配置 = {'A': 3, 'B': 3, 'C': 2, 'D': 2, 'E': 2}
+
+def test_cancel_stops_monte_carlo_early_with_partial_estimate():
+    取消事件 = threading.Event()
+    进度 = []
+
+    def 进度回调(成功次数, 已完成次数):
+        进度.append((成功次数, 已完成次数))
+        if len(进度) == 2:
+            取消事件.set()
+
+    概率, 成功次数, _ = 蒙特卡罗模拟(元素配置, 'AAB', 模拟次数=模拟批次大小 * 10, 进度回调=进度回调,
+                            取消事件=取消事件, 随机数源=random.Random(0))
+    assert 进度[-1] == (成功次数, 2 * 模拟批次大小)
+    assert 概率 == 成功次数 / (2 * 模拟批次大小)
+    assert 0 < 概率 < 1
+
+def test_cancel_before_start_returns_empty_estimate():
+    取消事件 = threading.Event()
+    取消事件.set()
+    assert 蒙特卡罗模拟(元素配置, 'AAB', 取消事件=取消事件)[:2] == (0.0, 0)
+    assert 精确计算(元素配置, 'AAB', 取消事件=取消事件) is None
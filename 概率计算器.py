@@ -1,47 +1,68 @@
-import random
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as 等待超时
 from math import comb
 import itertools
+import threading
 import time
+from packed_multiset import layout_for
+from probability_tables import lookup_containment
+from rng_backend import default_rng
 
-def 蒙特卡罗模拟(元素配置, 目标组合, 模拟次数=100000):
+默认模拟次数 = 100000
+模拟批次大小 = 5000          # 每批模拟后汇报进度、检查是否取消
+进度刷新间隔 = 0.5           # 前台刷新进度的间隔（秒）
+常用目标组合 = ["AAB", "ABC", "AAA", "ABB", "AAD"]
+预计算数量 = 4               # 用户输入目标时在后台预先计算的组合数
+
+def 蒙特卡罗模拟(元素配置, 目标组合, 模拟次数=默认模拟次数, 进度回调=None, 取消事件=None, 随机数源=None):
     """
     使用蒙特卡罗模拟计算概率
+    
+    进度回调: 每批模拟后调用 进度回调(成功次数, 已完成次数)
+    取消事件: threading.Event，被设置后在当前批次结束时停止，按已完成的次数给出估计
+    随机数源: 需提供sample方法，默认使用rng_backend的共享缓冲随机数源
     """
     # 创建完整元素列表
     元素列表 = []
     for 元素, 数量 in 元素配置.items():
         元素列表.extend([元素] * 数量)
     
-    # 转换目标组合
-    目标计数 = Counter(目标组合)
+    # 转换目标组合（打包多重集：抽出元素的单位求和即为打包后的手牌）
+    布局 = layout_for(元素配置, 目标组合)
+    元素单位 = 布局.units(元素列表)
+    目标 = 布局.pack(目标组合)
+    保护位 = 布局.guard
+    抽样 = (随机数源 or default_rng()).sample
     成功次数 = 0
     
     # 开始模拟
     开始时间 = time.time()
-    for _ in range(模拟次数):
-        # 随机抽取5个元素
-        样本 = random.sample(元素列表, 5)
-        样本计数 = Counter(样本)
-        
-        # 检查是否包含目标组合
-        包含目标 = True
-        for 元素, 需要数量 in 目标计数.items():
-            if 样本计数.get(元素, 0) < 需要数量:
-                包含目标 = False
-                break
-        
-        if 包含目标:
-            成功次数 += 1
+    已完成次数 = 0
+    while 已完成次数 < 模拟次数:
+        if 取消事件 is not None and 取消事件.is_set():
+            break
+        本批次数 = min(模拟批次大小, 模拟次数 - 已完成次数)
+        for _ in range(本批次数):
+            # 随机抽取5个元素
+            手牌 = sum(抽样(元素单位, 5))
+            
+            # 检查是否包含目标组合
+            if ((手牌 | 保护位) - 目标) & 保护位 == 保护位:
+                成功次数 += 1
+        已完成次数 += 本批次数
+        if 进度回调 is not None:
+            进度回调(成功次数, 已完成次数)
     
     用时 = time.time() - 开始时间
-    概率 = 成功次数 / 模拟次数
+    概率 = 成功次数 / 已完成次数 if 已完成次数 else 0.0
     
     return 概率, 成功次数, 用时
 
-def 精确计算(元素配置, 目标组合):
+def 精确计算(元素配置, 目标组合, 取消事件=None):
     """
     使用精确数学方法计算概率
+    
+    取消事件: threading.Event，被设置后中止枚举并返回None（部分枚举结果不能代表概率）
     """
     # 创建完整元素列表
     元素列表 = []
@@ -49,7 +70,10 @@ def 精确计算(元素配置, 目标组合):
         元素列表.extend([元素] * 数量)
     
     总元素数 = len(元素列表)
-    目标计数 = Counter(目标组合)
+    布局 = layout_for(元素配置, 目标组合)
+    元素单位 = 布局.units(元素列表)
+    目标 = 布局.pack(目标组合)
+    保护位 = 布局.guard
     
     # 计算总的抽取方式数
     总方式数 = comb(总元素数, 5)
@@ -58,18 +82,13 @@ def 精确计算(元素配置, 目标组合):
     成功方式数 = 0
     开始时间 = time.time()
     
-    for 组合索引 in itertools.combinations(range(总元素数), 5):
-        选中元素 = [元素列表[i] for i in 组合索引]
-        选中计数 = Counter(选中元素)
+    for 序号, 组合单位 in enumerate(itertools.combinations(元素单位, 5)):
+        if 取消事件 is not None and 序号 % 模拟批次大小 == 0 and 取消事件.is_set():
+            return None
+        手牌 = sum(组合单位)
         
         # 检查是否包含目标组合
-        包含目标 = True
-        for 元素, 需要数量 in 目标计数.items():
-            if 选中计数.get(元素, 0) < 需要数量:
-                包含目标 = False
-                break
-        
-        if 包含目标:
+        if ((手牌 | 保护位) - 目标) & 保护位 == 保护位:
             成功方式数 += 1
     
     用时 = time.time() - 开始时间
@@ -77,10 +96,149 @@ def 精确计算(元素配置, 目标组合):
     
     return 概率, 成功方式数, 总方式数, 用时
 
-def 显示结果(元素配置, 目标组合, 使用精确计算=True):
+class 计算任务:
+    """一次后台计算（蒙特卡罗或精确计算）"""
+    def __init__(self, 方法, 预计算):
+        self.方法 = 方法
+        self.预计算 = 预计算
+        self.取消事件 = threading.Event()
+        self.进度 = None  # 蒙特卡罗的最新进度 (成功次数, 已完成次数)
+        self.future = None
+
+    def 记录进度(self, 成功次数, 已完成次数):
+        self.进度 = (成功次数, 已完成次数)
+
+class 后台计算器:
+    """
+    在后台线程中运行概率计算，前台可随时查看渐进结果或取消
+    
+    • 相同的查询（配置相同、目标组合字母相同）只计算一次，结果缓存复用
+    • 用户输入目标组合期间，先在后台预计算可能的目标（历史输入和常用组合）
+    • 用户真正提交查询时，尚未开始的预计算任务会被撤下，把线程让给当前查询
+    """
+    def __init__(self):
+        self.执行器 = ThreadPoolExecutor(max_workers=1)
+        self.任务 = {}
+        self.历史目标 = []
+        self.锁 = threading.Lock()
+
+    @staticmethod
+    def _键(方法, 元素配置, 目标组合):
+        return 方法, tuple(sorted(元素配置.items())), ''.join(sorted(目标组合))
+
+    def 提交(self, 方法, 元素配置, 目标组合, 预计算=False):
+        """提交计算，已有相同任务时直接复用；方法为“蒙特卡罗”或“精确”"""
+        键 = self._键(方法, 元素配置, 目标组合)
+        with self.锁:
+            任务 = self.任务.get(键)
+            if 任务 is not None and not 任务.取消事件.is_set():
+                if not 预计算:
+                    任务.预计算 = False
+                return 任务
+            
+            if not 预计算:
+                self._撤下预计算()
+            
+            任务 = 计算任务(方法, 预计算)
+            if 方法 == "蒙特卡罗":
+                任务.future = self.执行器.submit(
+                    蒙特卡罗模拟, 元素配置, 目标组合,
+                    进度回调=任务.记录进度, 取消事件=任务.取消事件)
+            else:
+                任务.future = self.执行器.submit(
+                    精确计算, 元素配置, 目标组合, 取消事件=任务.取消事件)
+            self.任务[键] = 任务
+            return 任务
+
+    def _撤下预计算(self):
+        """撤下尚未开始的预计算任务（调用方需持有锁）"""
+        for 键, 任务 in list(self.任务.items()):
+            if 任务.预计算 and 任务.future.cancel():
+                del self.任务[键]
+
+    def 预计算(self, 元素配置):
+        """根据历史输入和常用组合，在后台预先计算最可能被查询的目标"""
+        if lookup_containment(元素配置, "") is not None:
+            return  # 配置在预计算表中，查询时直接查表
+        候选 = []
+        for 目标 in self.历史目标 + 常用目标组合:
+            需求 = Counter(目标)
+            可行 = all(元素配置.get(元素, 0) >= 数量 for 元素, 数量 in 需求.items())
+            if 可行 and ''.join(sorted(目标)) not in 候选:
+                候选.append(''.join(sorted(目标)))
+        
+        for 目标 in 候选[:预计算数量]:
+            if sum(元素配置.values()) <= 15:
+                self.提交("精确", 元素配置, 目标, 预计算=True)
+        for 目标 in 候选[:预计算数量]:
+            self.提交("蒙特卡罗", 元素配置, 目标, 预计算=True)
+
+    def 记录目标(self, 目标组合):
+        if 目标组合 in self.历史目标:
+            self.历史目标.remove(目标组合)
+        self.历史目标.insert(0, 目标组合)
+
+    def 等待(self, 任务, 显示进度=True):
+        """
+        等待任务完成并显示渐进结果；按Ctrl-C取消
+        
+        返回:
+        (结果, 是否被取消)；蒙特卡罗被取消时结果为当前最佳估计，精确计算被取消时结果为None
+        """
+        被取消 = False
+        while True:
+            try:
+                结果 = 任务.future.result(timeout=进度刷新间隔)
+                break
+            except 等待超时:
+                if 显示进度 and 任务.进度 is not None:
+                    成功次数, 已完成次数 = 任务.进度
+                    print(f"\r  已模拟 {已完成次数:,} 次，当前估计: {成功次数/已完成次数:.6f}",
+                          end='', flush=True)
+            except KeyboardInterrupt:
+                print("\n正在取消，保留当前最佳估计...")
+                任务.取消事件.set()
+                被取消 = True
+        
+        if 显示进度 and 任务.进度 is not None:
+            print("\r" + " " * 60 + "\r", end='', flush=True)
+        if 被取消:
+            # 被取消的结果不完整，不再作为缓存复用
+            with self.锁:
+                for 键, 已有任务 in list(self.任务.items()):
+                    if 已有任务 is 任务:
+                        del self.任务[键]
+        return 结果, 被取消
+
+    def 关闭(self):
+        """取消全部任务并关闭后台线程"""
+        with self.锁:
+            for 任务 in self.任务.values():
+                任务.取消事件.set()
+                任务.future.cancel()
+            self.任务.clear()
+        self.执行器.shutdown(wait=False)
+
+_后台计算器 = None
+
+def 获取后台计算器():
+    """全局共享的后台计算器（首次使用时创建）"""
+    global _后台计算器
+    if _后台计算器 is None:
+        _后台计算器 = 后台计算器()
+    return _后台计算器
+
+def 显示结果(元素配置, 目标组合, 使用精确计算=True, 计算器=None, 使用预计算表=True):
     """
     显示计算结果
+    
+    配置在预计算概率表中时直接查表显示精确结果；否则在后台线程中计算，
+    期间显示渐进结果，按Ctrl-C可取消并保留当前最佳估计
     """
+    if 计算器 is None:
+        计算器 = 获取后台计算器()
+    计算器.记录目标(目标组合)
+    
     print(f"\n{'='*60}")
     print(f"概率计算结果")
     print(f"{'='*60}")
@@ -89,18 +247,38 @@ def 显示结果(元素配置, 目标组合, 使用精确计算=True):
     print(f"目标组合: {目标组合}")
     print(f"目标需求: {dict(Counter(目标组合))}")
     
+    查表结果 = lookup_containment(元素配置, 目标组合) if 使用预计算表 else None
+    if 查表结果 is not None:
+        成功方式数, 总方式数 = 查表结果
+        print(f"\n【预计算表结果】")
+        print(f"总抽取方式: {总方式数:,}")
+        print(f"成功方式数: {成功方式数:,}")
+        print(f"精确概率: {成功方式数/总方式数:.8f} ({成功方式数/总方式数*100:.6f}%)")
+        return
+    
     # 蒙特卡罗模拟
-    print(f"\n【蒙特卡罗模拟结果】")
-    模拟概率, 模拟成功数, 模拟用时 = 蒙特卡罗模拟(元素配置, 目标组合)
-    print(f"模拟次数: 100,000")
+    print(f"\n【蒙特卡罗模拟结果】（按Ctrl-C可提前结束）")
+    模拟任务 = 计算器.提交("蒙特卡罗", 元素配置, 目标组合)
+    (模拟概率, 模拟成功数, 模拟用时), 已取消 = 计算器.等待(模拟任务)
+    模拟次数 = 模拟任务.进度[1] if 模拟任务.进度 else 0
+    if 已取消:
+        print(f"已取消，以下为前 {模拟次数:,} 次模拟的估计")
+    print(f"模拟次数: {模拟次数:,}")
     print(f"成功次数: {模拟成功数:,}")
     print(f"概率: {模拟概率:.6f} ({模拟概率*100:.4f}%)")
     print(f"计算用时: {模拟用时:.3f}秒")
+    if 已取消:
+        return
     
     # 精确计算（如果启用）
     if 使用精确计算 and sum(元素配置.values()) <= 15:
         print(f"\n【精确数学计算结果】")
-        精确概率, 精确成功数, 精确总数, 精确用时 = 精确计算(元素配置, 目标组合)
+        精确任务 = 计算器.提交("精确", 元素配置, 目标组合)
+        精确结果, 已取消 = 计算器.等待(精确任务)
+        if 已取消:
+            print("精确计算已取消，请参考上方的模拟结果")
+            return
+        精确概率, 精确成功数, 精确总数, 精确用时 = 精确结果
         print(f"总抽取方式: {精确总数:,}")
         print(f"成功方式数: {精确成功数:,}")
         print(f"精确概率: {精确概率:.8f} ({精确概率*100:.6f}%)")
@@ -112,7 +290,8 @@ def 显示结果(元素配置, 目标组合, 使用精确计算=True):
         print(f"模拟结果: {模拟概率:.6f}")
         print(f"精确结果: {精确概率:.6f}")
         print(f"绝对误差: {误差:.6f}")
-        print(f"相对误差: {误差/精确概率*100:.4f}%")
+        if 精确概率 > 0:
+            print(f"相对误差: {误差/精确概率*100:.4f}%")
     else:
         if sum(元素配置.values()) > 15:
             print(f"\n注意: 元素总数超过15个，跳过精确计算以节省时间")
@@ -184,6 +363,9 @@ def 自定义分析():
             print("总元素数必须至少为5个才能抽取5个元素")
             return
         
+        # 用户输入目标组合的同时，后台预计算最可能的查询
+        获取后台计算器().预计算(配置)
+        
         目标 = input("请输入目标组合（如AAB）: ").strip().upper()
         
         if 目标 and all(c in 配置.keys() for c in 目标):
@@ -230,6 +412,8 @@ def 主菜单():
         elif 选择 == '3':
             显示使用说明()
         elif 选择 == '4':
+            if _后台计算器 is not None:
+                _后台计算器.关闭()
             print("感谢使用概率计算器！")
             break
         else:
@@ -251,6 +435,7 @@ def 显示使用说明():
    • 蒙特卡罗模拟：快速得到近似结果
    • 精确计算：数学方法得到准确结果（小规模问题）
    • 自动选择：根据问题规模自动选择计算方法
+   • 后台计算：计算过程中显示渐进结果，按Ctrl-C可提前结束并保留当前估计
 
 📊 输入格式:
    • 元素数量：每种元素在集合中的个数